@@ -0,0 +1,448 @@
+# analytics_mirror.py
+#
+# Miroir analytique local (DuckDB, fichier unique) des tables de models.py :
+#   - snapshot : copie complète, lue dans une seule transaction REPEATABLE READ (toutes les
+#     tables au même instant), transférée en paquets Arrow par curseur serveur ;
+#   - refresh : rafraîchissement par année universitaire ; les tables rattachées à une année
+#     (directement ou via maquettes_ue / maquettes_ec) ne sont recopiées que pour les années
+#     demandées, les référentiels et les étudiants sont recopiés en entier ;
+#   - query : requêtes analytiques préparées (REQUETES), exécutées sur le moteur colonne
+#     de DuckDB, sans charge sur la base de production.
+#
+#   python analytics_mirror.py snapshot
+#   python analytics_mirror.py refresh --annee 2023-2024 2024-2025
+#   python analytics_mirror.py query taux_reussite --annee 2023-2024 --csv taux.csv
+
+import os
+import time
+
+from sqlalchemy import inspect, select, delete, BigInteger, Boolean, Date, DateTime, Integer, Numeric
+from sqlalchemy.dialects import postgresql
+
+import config
+from models import (
+    Base, AnneeUniversitaire, ResultatARecalculer, DoublonEtudiantCandidat, CleCompacte
+)
+from cles_compactes import COMPACTS
+
+# Lignes par paquet Arrow / par aller-retour du curseur serveur
+BATCH_SIZE = 50_000
+
+# Tables de travail ou de stockage interne, sans intérêt analytique
+# (en mode compact, les vues de décodage portent les noms d'origine et sont copiées)
+TABLES_EXCLUES = {
+    ResultatARecalculer.__tablename__, DoublonEtudiantCandidat.__tablename__, CleCompacte.__tablename__,
+} | {m.__tablename__ for m in COMPACTS.values()}
+
+ETAT = "_miroir_etat"
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("duckdb est requis pour le miroir analytique (pip install duckdb)")
+    return duckdb
+
+
+def ouvrir_miroir(path=None, lecture_seule=True):
+    """Connexion DuckDB au fichier miroir (lecture seule : plusieurs analystes en même temps)."""
+    return _duckdb().connect(path or config.ANALYTICS_MIRROR_PATH, read_only=lecture_seule)
+
+
+# ----------------------------
+# Tables et périmètre annuel
+# ----------------------------
+def _tables_source(engine) -> list:
+    """Tables de Base.metadata présentes dans la base (tables ou vues), ordre des dépendances."""
+    insp = inspect(engine)
+    presentes = set(insp.get_table_names()) | set(insp.get_view_names())
+    return [t for t in Base.metadata.sorted_tables if t.name not in TABLES_EXCLUES and t.name in presentes]
+
+
+def _filtre_annee(table, annee_ids, _chemin=()):
+    """
+    Condition limitant la table aux années données : colonne AnneeUniversitaire_id_fk, sinon
+    première FK menant à une table annuelle (ex. resultats_ue -> maquettes_ue).
+    None : table sans année (référentiels, étudiants), recopiée en entier.
+    """
+    if "AnneeUniversitaire_id_fk" in table.c:
+        return table.c.AnneeUniversitaire_id_fk.in_(annee_ids)
+    for fk in sorted(table.foreign_keys, key=lambda f: f.parent.name):
+        parent = fk.column.table
+        if parent is table or parent in _chemin:
+            continue
+        sous = _filtre_annee(parent, annee_ids, _chemin + (table,))
+        if sous is not None:
+            return fk.parent.in_(select(fk.column).where(sous))
+    return None
+
+
+def _est_annuelle(table) -> bool:
+    return _filtre_annee(table, ["?"]) is not None
+
+
+def _compile_sql(stmt) -> str:
+    """SQL littéral : le dialecte PostgreSQL (identifiants entre guillemets) est lu tel quel par DuckDB."""
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+# ----------------------------
+# Transfert PostgreSQL -> DuckDB
+# ----------------------------
+def _arrow_schema(table):
+    import pyarrow as pa
+
+    def _type(col):
+        if isinstance(col.type, DateTime):
+            return pa.timestamp("us", tz="UTC" if col.type.timezone else None)
+        if isinstance(col.type, Date):
+            return pa.date32()
+        if isinstance(col.type, Boolean):
+            return pa.bool_()
+        if isinstance(col.type, (Integer, BigInteger)):
+            return pa.int64()
+        if isinstance(col.type, Numeric):
+            if col.type.precision:
+                return pa.decimal128(col.type.precision, col.type.scale or 0)
+            return pa.float64()
+        return pa.string()
+
+    return pa.schema([(c.name, _type(c)) for c in table.columns])
+
+
+def _creer_table(duck, table):
+    """(Re)crée la table DuckDB avec les types Arrow du modèle."""
+    duck.register("_lot", _arrow_schema(table).empty_table())
+    duck.execute(f'CREATE OR REPLACE TABLE "{table.name}" AS SELECT * FROM _lot')
+    duck.unregister("_lot")
+
+
+def _copier(src, duck, table, filtre=None, batch_size=BATCH_SIZE) -> int:
+    """Curseur serveur côté PostgreSQL, un paquet Arrow à la fois inséré dans DuckDB."""
+    import pyarrow as pa
+
+    schema = _arrow_schema(table)
+    stmt = select(table) if filtre is None else select(table).where(filtre)
+    result = src.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    n = 0
+    for rows in result.partitions(batch_size):
+        columns = list(zip(*rows))
+        lot = pa.Table.from_arrays(
+            [pa.array(columns[i], type=schema.field(i).type) for i in range(len(schema))],
+            schema=schema,
+        )
+        duck.register("_lot", lot)
+        duck.execute(f'INSERT INTO "{table.name}" SELECT * FROM _lot')
+        duck.unregister("_lot")
+        n += len(rows)
+    return n
+
+
+def _connexion_source(engine):
+    """Une seule transaction REPEATABLE READ : toutes les tables lues au même instant."""
+    return engine.connect().execution_options(isolation_level="REPEATABLE READ")
+
+
+def _noter(duck, table_name, annee_id, lignes):
+    duck.execute(f'DELETE FROM "{ETAT}" WHERE table_name = ? AND annee_id = ?', [table_name, annee_id])
+    duck.execute(f'INSERT INTO "{ETAT}" VALUES (?, ?, ?, now())', [table_name, annee_id, lignes])
+
+
+def _creer_etat(duck, remplacer=False):
+    mode = "CREATE OR REPLACE TABLE" if remplacer else "CREATE TABLE IF NOT EXISTS"
+    duck.execute(f'{mode} "{ETAT}" (table_name VARCHAR, annee_id VARCHAR, lignes BIGINT, rafraichi_le TIMESTAMP)')
+
+
+def _miroir_initialise(duck) -> bool:
+    return bool(duck.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [ETAT]
+    ).fetchone()[0])
+
+
+# ----------------------------
+# ORCHESTRATEURS
+# ----------------------------
+def snapshot(path=None, engine=None, batch_size=BATCH_SIZE) -> dict:
+    """Copie complète de toutes les tables dans le miroir (remplace son contenu). Retourne {table: lignes}."""
+    if engine is None:
+        from database_setup import engine
+    path = path or config.ANALYTICS_MIRROR_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    print(f"\n--- Miroir analytique : copie complète -> {path} ---")
+
+    t0 = time.perf_counter()
+    counts = {}
+    duck = ouvrir_miroir(path, lecture_seule=False)
+    try:
+        duck.begin()
+        _creer_etat(duck, remplacer=True)
+        with _connexion_source(engine) as src, src.begin():
+            for table in _tables_source(engine):
+                _creer_table(duck, table)
+                counts[table.name] = _copier(src, duck, table, batch_size=batch_size)
+                _noter(duck, table.name, "*", counts[table.name])
+        duck.commit()
+    except Exception:
+        duck.rollback()
+        raise
+    finally:
+        duck.close()
+
+    print(f"✅ {len(counts)} tables, {sum(counts.values())} lignes copiées ({time.perf_counter() - t0:.1f}s).")
+    return counts
+
+
+def _resoudre_annees(src, annees):
+    """Libellés (2023-2024) -> IDs ; annees=None : année(s) active(s)."""
+    a = AnneeUniversitaire.__table__
+    stmt = select(a.c.AnneeUniversitaire_id, a.c.AnneeUniversitaire_annee)
+    if annees:
+        stmt = stmt.where(a.c.AnneeUniversitaire_annee.in_(annees))
+    else:
+        stmt = stmt.where(a.c.AnneeUniversitaire_is_active.is_(True))
+    trouvees = dict(src.execute(stmt).all())
+    inconnues = set(annees or []) - set(trouvees.values())
+    if inconnues:
+        print(f"⚠️ Année(s) absente(s) de la base, ignorée(s) : {sorted(inconnues)}")
+    return trouvees
+
+
+def _annees_manquantes(src, duck):
+    """Années de la source jamais copiées dans le miroir (créées depuis la dernière copie)."""
+    deja = {r[0] for r in duck.execute("SELECT AnneeUniversitaire_id FROM annees_universitaires").fetchall()}
+    a = AnneeUniversitaire.__table__
+    return {i: lib for i, lib in src.execute(select(a.c.AnneeUniversitaire_id, a.c.AnneeUniversitaire_annee))
+            if i not in deja}
+
+
+def rafraichir(annees=None, path=None, engine=None, batch_size=BATCH_SIZE) -> dict:
+    """
+    Rafraîchit le miroir pour des années (libellés) ; annees=None : année(s) active(s) et
+    années apparues depuis la dernière copie. Copie complète si le miroir n'existe pas.
+    Le tout dans une transaction DuckDB : un lecteur ne voit jamais un miroir à moitié rafraîchi.
+    """
+    if engine is None:
+        from database_setup import engine
+    path = path or config.ANALYTICS_MIRROR_PATH
+    if not os.path.exists(path):
+        return snapshot(path, engine, batch_size)
+
+    duck = ouvrir_miroir(path, lecture_seule=False)
+    if not _miroir_initialise(duck):
+        duck.close()
+        return snapshot(path, engine, batch_size)
+
+    t0 = time.perf_counter()
+    counts = {}
+    try:
+        duck.begin()
+        with _connexion_source(engine) as src, src.begin():
+            cibles = _resoudre_annees(src, annees)
+            if annees is None:
+                cibles.update(_annees_manquantes(src, duck))
+            print(f"\n--- Miroir analytique : rafraîchissement {sorted(cibles.values()) or '(aucune année)'} ---")
+
+            tables = _tables_source(engine)
+            annuelles = [t for t in tables if _est_annuelle(t)]
+            existantes = {r[0] for r in duck.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+
+            # 1. Tables sans année : recopiées en entier
+            for table in tables:
+                if table in annuelles:
+                    continue
+                _creer_table(duck, table)
+                counts[table.name] = _copier(src, duck, table, batch_size=batch_size)
+                _noter(duck, table.name, "*", counts[table.name])
+
+            # 2. Tables annuelles : suppression des années visées (enfants d'abord, tant que les
+            #    maquettes parentes sont encore là pour résoudre le filtre), puis recopie
+            for table in annuelles:
+                if table.name not in existantes:
+                    _creer_table(duck, table)
+            ids = list(cibles)
+            if ids:
+                for table in reversed(annuelles):
+                    duck.execute(_compile_sql(delete(table).where(_filtre_annee(table, ids))))
+                for annee_id in ids:
+                    for table in annuelles:
+                        n = _copier(src, duck, table, _filtre_annee(table, [annee_id]), batch_size)
+                        _noter(duck, table.name, annee_id, n)
+                        counts[table.name] = counts.get(table.name, 0) + n
+            duck.commit()
+    except Exception:
+        duck.rollback()
+        raise
+    finally:
+        duck.close()
+
+    print(f"✅ {sum(counts.values())} lignes recopiées ({time.perf_counter() - t0:.1f}s).")
+    return counts
+
+
+# ----------------------------
+# Requêtes analytiques préparées
+# ----------------------------
+# Paramètre $annee : libellé d'année (2023-2024), NULL = toutes les années
+REQUETES = {
+    "effectifs": (
+        "Étudiants et inscriptions par année, parcours et niveau",
+        """
+        SELECT a.AnneeUniversitaire_annee AS annee, p.Parcours_code AS parcours, n.Niveau_code AS niveau,
+               count(DISTINCT i.Etudiant_id_fk) AS etudiants, count(*) AS inscriptions
+        FROM inscriptions i
+        JOIN annees_universitaires a ON a.AnneeUniversitaire_id = i.AnneeUniversitaire_id_fk
+        JOIN parcours p ON p.Parcours_id = i.Parcours_id_fk
+        JOIN semestres s ON s.Semestre_id = i.Semestre_id_fk
+        JOIN niveaux n ON n.Niveau_id = s.Niveau_id_fk
+        WHERE $annee IS NULL OR a.AnneeUniversitaire_annee = $annee
+        GROUP BY ALL
+        ORDER BY annee, parcours, niveau
+        """,
+    ),
+    "evolution_effectifs": (
+        "Étudiants inscrits par année et variation par rapport à l'année précédente",
+        """
+        SELECT annee, etudiants,
+               etudiants - lag(etudiants) OVER (ORDER BY ordre) AS variation,
+               round(100.0 * (etudiants - lag(etudiants) OVER (ORDER BY ordre))
+                     / nullif(lag(etudiants) OVER (ORDER BY ordre), 0), 1) AS variation_pct
+        FROM (
+            SELECT a.AnneeUniversitaire_annee AS annee, a.AnneeUniversitaire_ordre AS ordre,
+                   count(DISTINCT i.Etudiant_id_fk) AS etudiants
+            FROM inscriptions i
+            JOIN annees_universitaires a ON a.AnneeUniversitaire_id = i.AnneeUniversitaire_id_fk
+            GROUP BY ALL
+        )
+        QUALIFY $annee IS NULL OR annee = $annee
+        ORDER BY ordre
+        """,
+    ),
+    "taux_reussite": (
+        "Semestres validés (statut V) par année, semestre et session",
+        """
+        SELECT a.AnneeUniversitaire_annee AS annee, s.Semestre_code AS semestre,
+               se.SessionExamen_code AS session,
+               count(*) AS resultats,
+               count(*) FILTER (WHERE r.ResultatSemestre_statut_validation = 'V') AS valides,
+               round(100.0 * valides / count(*), 1) AS taux_reussite_pct,
+               round(avg(r.ResultatSemestre_moyenne_obtenue), 2) AS moyenne
+        FROM resultats_semestre r
+        JOIN annees_universitaires a ON a.AnneeUniversitaire_id = r.AnneeUniversitaire_id_fk
+        JOIN semestres s ON s.Semestre_id = r.Semestre_id_fk
+        JOIN sessions_examen se ON se.SessionExamen_id = r.SessionExamen_id_fk
+        WHERE $annee IS NULL OR a.AnneeUniversitaire_annee = $annee
+        GROUP BY ALL
+        ORDER BY annee, semestre, session
+        """,
+    ),
+    "taux_reussite_parcours": (
+        "Semestres validés par année et parcours (parcours de l'inscription au semestre)",
+        """
+        SELECT a.AnneeUniversitaire_annee AS annee, p.Parcours_code AS parcours,
+               count(*) AS resultats,
+               count(*) FILTER (WHERE r.ResultatSemestre_statut_validation = 'V') AS valides,
+               round(100.0 * valides / count(*), 1) AS taux_reussite_pct
+        FROM resultats_semestre r
+        JOIN inscriptions i ON i.Etudiant_id_fk = r.Etudiant_id_fk
+                           AND i.Semestre_id_fk = r.Semestre_id_fk
+                           AND i.AnneeUniversitaire_id_fk = r.AnneeUniversitaire_id_fk
+        JOIN annees_universitaires a ON a.AnneeUniversitaire_id = r.AnneeUniversitaire_id_fk
+        JOIN parcours p ON p.Parcours_id = i.Parcours_id_fk
+        WHERE $annee IS NULL OR a.AnneeUniversitaire_annee = $annee
+        GROUP BY ALL
+        ORDER BY annee, parcours
+        """,
+    ),
+    "repartition_sexe": (
+        "Étudiants inscrits par sexe et par année (part des femmes)",
+        """
+        SELECT a.AnneeUniversitaire_annee AS annee,
+               count(DISTINCT i.Etudiant_id_fk) FILTER (WHERE upper(e.Etudiant_sexe) LIKE 'F%') AS femmes,
+               count(DISTINCT i.Etudiant_id_fk) FILTER (WHERE upper(e.Etudiant_sexe) LIKE 'M%') AS hommes,
+               count(DISTINCT i.Etudiant_id_fk) AS etudiants,
+               round(100.0 * femmes / nullif(etudiants, 0), 1) AS part_femmes_pct
+        FROM inscriptions i
+        JOIN etudiants e ON e.Etudiant_id = i.Etudiant_id_fk
+        JOIN annees_universitaires a ON a.AnneeUniversitaire_id = i.AnneeUniversitaire_id_fk
+        WHERE $annee IS NULL OR a.AnneeUniversitaire_annee = $annee
+        GROUP BY ALL
+        ORDER BY annee
+        """,
+    ),
+    "moyennes_ec": (
+        "Moyenne, écart-type et part des notes >= 10 par EC, année et session",
+        """
+        SELECT a.AnneeUniversitaire_annee AS annee, ec.EC_code AS ec, se.SessionExamen_code AS session,
+               count(*) AS notes,
+               round(avg(n.Note_valeur), 2) AS moyenne,
+               round(stddev_samp(n.Note_valeur), 2) AS ecart_type,
+               round(100.0 * count(*) FILTER (WHERE n.Note_valeur >= 10) / count(*), 1) AS part_sup_10_pct
+        FROM notes n
+        JOIN annees_universitaires a ON a.AnneeUniversitaire_id = n.AnneeUniversitaire_id_fk
+        JOIN elements_constitutifs_catalog ec ON ec.EC_id = n.EC_id_fk
+        JOIN sessions_examen se ON se.SessionExamen_id = n.SessionExamen_id_fk
+        WHERE $annee IS NULL OR a.AnneeUniversitaire_annee = $annee
+        GROUP BY ALL
+        ORDER BY annee, ec, session
+        """,
+    ),
+}
+
+
+def requete(nom, annee=None, duck=None):
+    """Exécute une requête de REQUETES sur le miroir ; retourne un DataFrame."""
+    if nom not in REQUETES:
+        raise ValueError(f"Requête inconnue : {nom} ({', '.join(REQUETES)})")
+    fermer = duck is None
+    duck = duck or ouvrir_miroir()
+    try:
+        return duck.execute(REQUETES[nom][1], {"annee": annee}).df()
+    finally:
+        if fermer:
+            duck.close()
+
+
+def etat_miroir(duck=None):
+    """Dernier rafraîchissement de chaque table / année."""
+    fermer = duck is None
+    duck = duck or ouvrir_miroir()
+    try:
+        return duck.execute(f'SELECT * FROM "{ETAT}" ORDER BY table_name, annee_id').df()
+    finally:
+        if fermer:
+            duck.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Miroir analytique DuckDB de la base académique")
+    parser.add_argument("--miroir", default=None, help="Fichier DuckDB (défaut : config.ANALYTICS_MIRROR_PATH)")
+    sub = parser.add_subparsers(dest="commande", required=True)
+    sub.add_parser("snapshot", help="Copie complète")
+    p_refresh = sub.add_parser("refresh", help="Rafraîchissement par année")
+    p_refresh.add_argument("--annee", nargs="*", help="Années (défaut : année active + années nouvelles)")
+    p_query = sub.add_parser("query", help="Requête analytique préparée")
+    p_query.add_argument("nom", choices=sorted(REQUETES))
+    p_query.add_argument("--annee", default=None)
+    p_query.add_argument("--csv", default=None, help="Écrit le résultat dans un fichier CSV")
+    sub.add_parser("etat", help="Dernier rafraîchissement par table / année")
+    sub.add_parser("list", help="Requêtes disponibles")
+    args = parser.parse_args()
+
+    if args.commande == "snapshot":
+        snapshot(args.miroir)
+    elif args.commande == "refresh":
+        rafraichir(args.annee or None, args.miroir)
+    elif args.commande == "list":
+        for nom, (description, _) in REQUETES.items():
+            print(f"{nom:<24} {description}")
+    else:
+        with ouvrir_miroir(args.miroir) as duck:
+            df = requete(args.nom, args.annee, duck) if args.commande == "query" else etat_miroir(duck)
+        if getattr(args, "csv", None):
+            df.to_csv(args.csv, index=False)
+            print(f"✅ {len(df)} lignes -> {args.csv}")
+        else:
+            print(df.to_string(index=False))
@@ -0,0 +1,278 @@
+# archive_annee.py
+#
+# Archive et restauration d'une année universitaire en COPY binaire compressé (gzip),
+# sans repasser par les classeurs Excel de main.py (copie de test, retour arrière
+# après un import d'année raté).
+#   - tables annuelles : celles qui portent l'année (inscriptions, notes, *_historique,
+#     parcours_niveaux, maquettes_ue, jurys, trajectoires...) et, de proche en proche,
+#     celles qui en dépendent (maquettes_ec, resultats_ue, volumes_horaires...) : déduites
+#     des clés étrangères, filtrées sur l'année ;
+#   - référentiels dont elles dépendent (parcours, semestres, sessions...) : copiés en
+#     entier, sauf les étudiants (seulement ceux de l'année), pour qu'une archive se
+#     restaure dans une base vide.
+# Archive : un fichier <table>.copy.gz par table + manifest.json (ordre, colonnes, lignes),
+# tables copiées en parallèle sur un même snapshot (pg_export_snapshot) : archive cohérente.
+# Restauration : une seule transaction (database_setup.bulk_load) ; les lignes de l'année
+# sont supprimées (enfants d'abord) puis rechargées par COPY dans l'ordre des clés
+# étrangères ; les référentiels passent par une table temporaire et n'ajoutent que les
+# lignes absentes (les lignes existantes ne sont pas modifiées).
+# Tables dérivées (trajectoires, suivi_credits_cycles) : calculées sur plusieurs années, elles
+# ne sont pas archivées mais recalculées dans la transaction de restauration.
+# Non disponible en schéma compact (clés entières propres à chaque base) ; en historique
+# par plages, les *_historique (vues) ne sont pas archivés.
+#
+#   python archive_annee.py --archiver 2023-2024 [--dossier D:\archives] [--workers 4]
+#   python archive_annee.py --restaurer 2023-2024 [--dossier D:\archives]
+
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import select, union
+
+import config
+import cles_compactes
+import historique_plages
+from database_setup import engine, bulk_load
+from export_inscriptions import _compile_sql
+from models import AnneeUniversitaire, ResultatSemestre, SuiviCreditCycle, Trajectoire
+from resultats_engine import recalculer_credits_cycle
+from trajectoires import rafraichir_trajectoires
+
+# Référentiels volumineux : seules les lignes utilisées par les tables annuelles sont archivées
+RESTREINTES = {"etudiants"}
+
+# Tables dérivées, calculées sur plusieurs années (rang, années voisines, cumul de crédits) :
+# ni archivées ni rechargées, recalculées après la restauration
+DERIVEES = {Trajectoire.__tablename__, SuiviCreditCycle.__tablename__}
+
+# gzip rapide : l'archive reste dominée par le débit du COPY
+NIVEAU_COMPRESSION = 1
+
+ANNUELLE = "annuelle"
+REFERENTIEL = "referentiel"
+
+
+# ----------------------------
+# Plan : tables, filtres, ordre
+# ----------------------------
+def _plan(annee_id) -> list:
+    """
+    [(table, mode, filtre)] dans l'ordre des clés étrangères (parents d'abord).
+    filtre : condition SQLAlchemy sur la table (None : table entière).
+    """
+    tables = historique_plages.tables_a_creer(cles_compactes.tables_a_creer())  # déjà triées
+    annee_table = AnneeUniversitaire.__table__
+
+    # Tables annuelles : colonne d'année, puis dépendances de proche en proche
+    filtres = {}
+    for t in tables:
+        for fk in t.foreign_keys:
+            if fk.column.table is annee_table:
+                filtres[t] = fk.parent == annee_id
+                break
+        else:
+            for fk in t.foreign_keys:
+                parent = fk.column.table
+                if parent in filtres:
+                    filtres[t] = fk.parent.in_(select(fk.column).where(filtres[parent]))
+                    break
+
+    # Référentiels : tout ce dont dépendent les tables retenues
+    referentiels, a_voir = set(), list(filtres)
+    while a_voir:
+        for fk in a_voir.pop().foreign_keys:
+            parent = fk.column.table
+            if parent not in filtres and parent not in referentiels:
+                referentiels.add(parent)
+                a_voir.append(parent)
+
+    plan = []
+    for t in tables:
+        if t.name in DERIVEES:
+            continue
+        if t in filtres:
+            plan.append((t, ANNUELLE, filtres[t]))
+        elif t in referentiels:
+            filtre = None
+            if t.name in RESTREINTES:
+                pk = list(t.primary_key.columns)[0]
+                utilisees = [select(fk.parent).where(filtres[a])
+                             for a in filtres for fk in a.foreign_keys if fk.column.table is t]
+                filtre = pk.in_(union(*utilisees)) if utilisees else None
+            plan.append((t, REFERENTIEL, filtre))
+    return plan
+
+
+def _annee_id(annee) -> str:
+    with engine.connect() as conn:
+        annee_id = conn.execute(
+            select(AnneeUniversitaire.AnneeUniversitaire_id)
+            .where(AnneeUniversitaire.AnneeUniversitaire_annee == annee)
+        ).scalar_one_or_none()
+    if annee_id is None:
+        raise ValueError(f"Année universitaire inconnue : {annee}")
+    return annee_id
+
+
+def _verifier_schema():
+    if cles_compactes.actif():
+        raise RuntimeError("Archive par année non disponible en schéma compact (config.SCHEMA_CLES).")
+    if historique_plages.actif():
+        print("   ℹ️ Historique par plages : les *_historique ne sont pas archivés.")
+
+
+def _dossier_annee(annee, dossier=None) -> str:
+    return os.path.join(dossier or config.ARCHIVE_FOLDER_PATH, annee)
+
+
+# ----------------------------
+# Archive
+# ----------------------------
+def _copier_table(table, filtre, path, snapshot) -> int:
+    """COPY (SELECT ...) TO STDOUT en binaire, écrit au fil de l'eau dans le fichier gzip."""
+    stmt = select(*table.columns)
+    if filtre is not None:
+        stmt = stmt.where(filtre)
+    sql = f"COPY ({_compile_sql(stmt)}) TO STDOUT WITH (FORMAT binary)"
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        conn.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+        with conn.connection.cursor() as cur, gzip.open(path, "wb", compresslevel=NIVEAU_COMPRESSION) as f:
+            cur.copy_expert(sql, f)
+            return cur.rowcount
+
+
+def archiver_annee(annee, dossier=None, workers=4) -> dict:
+    """Archive une année (code, ex. '2023-2024') ; retourne le manifeste écrit."""
+    print(f"\n--- Archive de l'année {annee} ---")
+    _verifier_schema()
+    t0 = time.perf_counter()
+    annee_id = _annee_id(annee)
+    plan = _plan(annee_id)
+    dossier = _dossier_annee(annee, dossier)
+    os.makedirs(dossier, exist_ok=True)
+
+    # Transaction ouverte pendant toute la copie : son snapshot est partagé par les workers
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        snapshot = conn.exec_driver_sql("SELECT pg_export_snapshot()").scalar_one()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_copier_table, t, filtre, os.path.join(dossier, f"{t.name}.copy.gz"), snapshot)
+                for t, _, filtre in plan
+            ]
+            lignes = [f.result() for f in futures]
+
+    manifeste = {
+        "annee": annee,
+        "annee_id": annee_id,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "tables": [
+            {"table": t.name, "mode": mode, "fichier": f"{t.name}.copy.gz",
+             "colonnes": [c.name for c in t.columns], "lignes": n}
+            for (t, mode, _), n in zip(plan, lignes)
+        ],
+    }
+    with open(os.path.join(dossier, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+
+    annuelles = sum(e["lignes"] for e in manifeste["tables"] if e["mode"] == ANNUELLE)
+    print(f"✅ {len(plan)} table(s), {annuelles} ligne(s) de l'année -> {dossier} "
+          f"({time.perf_counter() - t0:.1f}s)")
+    return manifeste
+
+
+# ----------------------------
+# Restauration
+# ----------------------------
+def _etudiants_resultats(session, annee_id) -> list:
+    """Étudiants ayant des résultats semestre sur l'année (crédits de cycle à recalculer)."""
+    return session.execute(
+        select(ResultatSemestre.Etudiant_id_fk).distinct()
+        .where(ResultatSemestre.AnneeUniversitaire_id_fk == annee_id)
+    ).scalars().all()
+
+
+def _colonnes_sql(colonnes) -> str:
+    return ", ".join(f'"{c}"' for c in colonnes)
+
+
+def restaurer_annee(annee, dossier=None) -> dict:
+    """
+    Remplace les données de l'année par celles de l'archive (une transaction, tout ou rien).
+    Retourne {table: lignes chargées}.
+    """
+    print(f"\n--- Restauration de l'année {annee} ---")
+    _verifier_schema()
+    t0 = time.perf_counter()
+    dossier = _dossier_annee(annee, dossier)
+    with open(os.path.join(dossier, "manifest.json"), encoding="utf-8") as f:
+        manifeste = json.load(f)
+
+    tables = {t.name: t for t in historique_plages.tables_a_creer(cles_compactes.tables_a_creer())}
+    inconnues = [e["table"] for e in manifeste["tables"] if e["table"] not in tables]
+    if inconnues:
+        raise RuntimeError(f"Tables de l'archive absentes du schéma : {inconnues}")
+    # Archives antérieures : les tables dérivées qu'elles contiennent sont ignorées
+    entrees = [e for e in manifeste["tables"] if e["table"] not in DERIVEES]
+    annuelles = [tables[e["table"]] for e in entrees if e["mode"] == ANNUELLE]
+
+    charges = {}
+    with bulk_load(annuelles) as s:
+        # 1. Lignes actuelles de l'année, enfants d'abord (l'année peut ne pas exister encore)
+        annee_id = s.execute(
+            select(AnneeUniversitaire.AnneeUniversitaire_id)
+            .where(AnneeUniversitaire.AnneeUniversitaire_annee == annee)
+        ).scalar_one_or_none()
+        etudiants = set()
+        if annee_id is not None:
+            etudiants.update(_etudiants_resultats(s, annee_id))
+            filtres = {t: filtre for t, mode, filtre in _plan(annee_id) if mode == ANNUELLE}
+            for t in reversed(annuelles):
+                s.execute(t.delete().where(filtres[t]))
+
+        # 2. Rechargement dans l'ordre du manifeste (parents d'abord)
+        with s.connection().connection.cursor() as cur:
+            for e in entrees:
+                nom, cols = e["table"], _colonnes_sql(e["colonnes"])
+                with gzip.open(os.path.join(dossier, e["fichier"]), "rb") as f:
+                    if e["mode"] == ANNUELLE:
+                        cur.copy_expert(f'COPY "{nom}" ({cols}) FROM STDIN WITH (FORMAT binary)', f)
+                        charges[nom] = cur.rowcount
+                    else:
+                        tmp = f"_archive_{nom}"
+                        cur.execute(f'CREATE TEMP TABLE "{tmp}" (LIKE "{nom}")')
+                        cur.copy_expert(f'COPY "{tmp}" ({cols}) FROM STDIN WITH (FORMAT binary)', f)
+                        cur.execute(f'INSERT INTO "{nom}" ({cols}) SELECT {cols} FROM "{tmp}" ON CONFLICT DO NOTHING')
+                        charges[nom] = cur.rowcount
+                        cur.execute(f'DROP TABLE "{tmp}"')
+
+        # 3. Tables dérivées : les années voisines dépendent aussi de l'année restaurée
+        etudiants.update(_etudiants_resultats(s, manifeste["annee_id"]))
+        n_cyc = recalculer_credits_cycle(s, sorted(etudiants))
+        if not rafraichir_trajectoires(s, complet=True):
+            raise RuntimeError("Trajectoires non recalculées : restauration annulée.")
+        print(f"   🔁 Crédits de cycle recalculés pour {len(etudiants)} étudiant(s) ({n_cyc} ligne(s)).")
+
+    print(f"✅ Année {annee} restaurée : {sum(charges.values())} ligne(s) écrite(s) "
+          f"({time.perf_counter() - t0:.1f}s)")
+    return charges
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive / restauration d'une année universitaire (COPY binaire)")
+    groupe = parser.add_mutually_exclusive_group(required=True)
+    groupe.add_argument("--archiver", metavar="ANNEE", help="Année à archiver, ex. 2023-2024")
+    groupe.add_argument("--restaurer", metavar="ANNEE", help="Année à restaurer depuis son archive")
+    parser.add_argument("--dossier", default=None, help="Dossier des archives (défaut : config.ARCHIVE_FOLDER_PATH)")
+    parser.add_argument("--workers", type=int, default=4, help="Tables copiées en parallèle (archive)")
+    args = parser.parse_args()
+
+    if args.archiver:
+        archiver_annee(args.archiver, args.dossier, args.workers)
+    else:
+        restaurer_annee(args.restaurer, args.dossier)
@@ -0,0 +1,180 @@
+# asset_store.py
+#
+# Stockage adressé par contenu des fichiers (logos, documents...) :
+#   <racine>/objets/ab/cd/<sha256><ext>            un seul exemplaire par contenu
+#   <racine>/miniatures/<taille>/ab/<sha256>.png   calculées une fois par contenu
+#   <racine>/index.sqlite                          source -> (taille, mtime, sha256, chemin)
+# Les chemins enregistrés en base sont relatifs à la racine (séparateur "/").
+
+import hashlib
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+HASH_CHUNK = 1 << 20             # lecture par blocs de 1 Mo
+MMAP_SEUIL = 8 << 20             # au-delà (gros PDF), hachage par projection mémoire
+TAILLES_MINIATURES = (64, 256)   # côté max en pixels
+INDEX_FILE = "index.sqlite"
+INDEX_FLUSH = 5000               # entrées d'index écrites par transaction
+
+
+# ----------------------------
+# Empreintes
+# ----------------------------
+def hash_file(path) -> str:
+    """SHA-256 ; les gros fichiers sont projetés en mémoire (pas de copie dans des tampons python)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        taille = os.fstat(f.fileno()).st_size
+        if taille >= MMAP_SEUIL:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                vue = memoryview(mm)
+                try:
+                    for debut in range(0, taille, HASH_CHUNK):
+                        h.update(vue[debut:debut + HASH_CHUNK])
+                finally:
+                    vue.release()
+        else:
+            for bloc in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(bloc)
+    return h.hexdigest()
+
+
+def _shard(digest):
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+# ----------------------------
+# Store
+# ----------------------------
+class AssetStore:
+    """Store sur disque + index SQLite des sources déjà vues (ré-exécutions sans re-hachage)."""
+
+    def __init__(self, racine=None):
+        self.racine = racine or config.ASSET_STORE_PATH
+        os.makedirs(self.racine, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.racine, INDEX_FILE), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source TEXT PRIMARY KEY, taille INTEGER, mtime_ns INTEGER, sha256 TEXT, chemin TEXT)"
+        )
+        self._a_ecrire = []
+
+    def _lookup(self, src):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT taille, mtime_ns, sha256, chemin FROM sources WHERE source = ?", (src,)
+            ).fetchone()
+        return dict(zip(("taille", "mtime_ns", "sha256", "chemin"), row)) if row else None
+
+    def _record(self, src, taille, mtime_ns, digest, rel):
+        with self._lock:
+            self._a_ecrire.append((src, taille, mtime_ns, digest, rel))
+            if len(self._a_ecrire) >= INDEX_FLUSH:
+                self._flush()
+
+    def _flush(self):
+        if self._a_ecrire:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)", self._a_ecrire)
+            self._a_ecrire = []
+
+    def save_index(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.save_index()
+        self._db.close()
+
+    def abspath(self, rel):
+        return os.path.join(self.racine, *rel.split("/"))
+
+    def _copier(self, src, rel):
+        """Copie atomique (fichier temporaire + rename) si le contenu n'est pas déjà stocké."""
+        dst = self.abspath(rel)
+        if os.path.exists(dst):
+            return False
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+        return True
+
+    def ingest(self, src) -> dict:
+        """
+        Stocke un fichier source. Si taille et mtime sont ceux de l'index, rien n'est relu.
+        Retourne {source, sha256, chemin, statut} avec statut 'inchange' / 'nouveau' / 'doublon'.
+        """
+        src = os.path.abspath(src)
+        st = os.stat(src)
+        connu = self._lookup(src)
+        if connu and connu["taille"] == st.st_size and connu["mtime_ns"] == st.st_mtime_ns \
+                and os.path.exists(self.abspath(connu["chemin"])):
+            return {"source": src, "sha256": connu["sha256"], "chemin": connu["chemin"], "statut": "inchange"}
+
+        digest = hash_file(src)
+        ext = os.path.splitext(src)[1].lower()
+        rel = f"objets/{_shard(digest)}/{digest}{ext}"
+        statut = "nouveau" if self._copier(src, rel) else "doublon"
+
+        self._record(src, st.st_size, st.st_mtime_ns, digest, rel)
+        return {"source": src, "sha256": digest, "chemin": rel, "statut": statut}
+
+    def ingest_many(self, sources, workers=8) -> list:
+        """Hachage + copie en parallèle (E/S et hashlib libèrent le GIL), puis sauvegarde de l'index."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            resultats = list(pool.map(self._ingest_safe, sources))
+        self.save_index()
+        return resultats
+
+    def _ingest_safe(self, src):
+        try:
+            return self.ingest(src)
+        except OSError as e:
+            return {"source": src, "sha256": None, "chemin": None, "statut": f"erreur: {e}"}
+
+    # ----------------------------
+    # Miniatures
+    # ----------------------------
+    def miniature_path(self, digest, taille):
+        return f"miniatures/{taille}/{digest[:2]}/{digest}.png"
+
+    def miniatures(self, rel, tailles=TAILLES_MINIATURES) -> int:
+        """Calcule les miniatures manquantes d'un objet (Pillow requis) ; retourne le nombre créé."""
+        try:
+            from PIL import Image
+        except ImportError:
+            return 0
+
+        digest = os.path.basename(rel).split(".")[0]
+        manquantes = [t for t in tailles if not os.path.exists(self.abspath(self.miniature_path(digest, t)))]
+        if not manquantes:
+            return 0
+        try:
+            with Image.open(self.abspath(rel)) as img:
+                img.load()
+                for t in manquantes:
+                    mini = img.copy()
+                    mini.thumbnail((t, t))
+                    if mini.mode not in ("RGB", "RGBA"):
+                        mini = mini.convert("RGBA")
+                    dst = self.abspath(self.miniature_path(digest, t))
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    tmp = f"{dst}.{threading.get_ident()}.tmp"
+                    mini.save(tmp, format="PNG")
+                    os.replace(tmp, dst)
+        except OSError:
+            # Format non lisible par Pillow (svg...) : l'original reste utilisable
+            return 0
+        return len(manquantes)
+
+    def miniatures_many(self, rels, tailles=TAILLES_MINIATURES, workers=8) -> int:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(lambda r: self.miniatures(r, tailles), set(rels)))
@@ -0,0 +1,229 @@
+# benchmark_cles_compactes.py
+#
+# Taille des index et vitesse des jointures : schéma texte (FK String) contre schéma compact
+# (FK entières + table de correspondance, cf. cles_compactes.py). Les deux variantes sont
+# construites dans un schéma PostgreSQL jetable (bench_cles) avec les mêmes contraintes
+# d'unicité que models.py, sur des codes de longueur réaliste. Les requêtes compactes passent
+# par des vues de décodage construites comme cles_compactes._vue (jointure entite + sk) :
+# elles mesurent ce que voit l'application, requêtes identiques à la variante texte.
+#
+#   python benchmark_cles_compactes.py --etudiants 100000
+
+import argparse
+import random
+import time
+
+from sqlalchemy import text
+
+from database_setup import engine
+
+SCHEMA = "bench_cles"
+
+DDL_TEXTE = f"""
+CREATE TABLE {SCHEMA}.t_inscriptions (
+    "Inscription_id" varchar(100) PRIMARY KEY,
+    etu varchar(50) NOT NULL, annee varchar(9) NOT NULL, parc varchar(15) NOT NULL,
+    sem varchar(10) NOT NULL, mode varchar(10),
+    date_insc date NOT NULL, credits int, valide bool,
+    UNIQUE (etu, annee, parc, sem)
+);
+INSERT INTO {SCHEMA}.t_inscriptions
+SELECT 'INSC_' || upper(substr(md5(e || '-' || a || '-' || s), 1, 16)),
+       'UF' || lpad(e::text, 10, '0'),
+       'ANNE_' || lpad(a::text, 4, '0'),
+       'PARC_' || lpad((e % 300)::text, 7, '0'),
+       'SEME_' || lpad(((a - 1) * 2 + s)::text, 2, '0'),
+       'MODE_001', current_date, 30, true
+FROM generate_series(1, :n) e, generate_series(1, 2) a, generate_series(1, 2) s;
+
+CREATE TABLE {SCHEMA}.t_notes (
+    "Note_id" varchar(50) PRIMARY KEY,
+    etu varchar(50) NOT NULL, ec varchar(50) NOT NULL, annee varchar(9) NOT NULL,
+    sess varchar(8) NOT NULL, valeur numeric(5, 2) NOT NULL,
+    UNIQUE (etu, ec, annee, sess)
+);
+INSERT INTO {SCHEMA}.t_notes
+SELECT 'NOTE_' || upper(substr(md5(i.etu || i.sem || k), 1, 16)),
+       i.etu, 'EC_' || i.parc || '_' || i.sem || '_' || k, i.annee, 'SESS_1',
+       round((random() * 20)::numeric, 2)
+FROM {SCHEMA}.t_inscriptions i, generate_series(1, :ec) k;
+"""
+
+DDL_COMPACT = f"""
+CREATE TABLE {SCHEMA}.cles (
+    entite varchar(40), code varchar(100), sk int GENERATED BY DEFAULT AS IDENTITY UNIQUE,
+    PRIMARY KEY (entite, code)
+);
+INSERT INTO {SCHEMA}.cles (entite, code)
+SELECT DISTINCT 'etudiants', etu FROM {SCHEMA}.t_inscriptions
+UNION ALL SELECT DISTINCT 'annees', annee FROM {SCHEMA}.t_inscriptions
+UNION ALL SELECT DISTINCT 'parcours', parc FROM {SCHEMA}.t_inscriptions
+UNION ALL SELECT DISTINCT 'semestres', sem FROM {SCHEMA}.t_inscriptions
+UNION ALL SELECT DISTINCT 'modes', mode FROM {SCHEMA}.t_inscriptions
+UNION ALL SELECT DISTINCT 'ecs', ec FROM {SCHEMA}.t_notes
+UNION ALL SELECT DISTINCT 'sessions', sess FROM {SCHEMA}.t_notes;
+
+CREATE TABLE {SCHEMA}.c_inscriptions (
+    sk bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    "Inscription_id" varchar(100) NOT NULL UNIQUE,
+    etu int NOT NULL, annee int NOT NULL, parc int NOT NULL, sem int NOT NULL, mode int,
+    date_insc date NOT NULL, credits int, valide bool,
+    UNIQUE (etu, annee, parc, sem)
+);
+INSERT INTO {SCHEMA}.c_inscriptions ("Inscription_id", etu, annee, parc, sem, mode, date_insc, credits, valide)
+SELECT i."Inscription_id", ke.sk, ka.sk, kp.sk, ks.sk, km.sk, i.date_insc, i.credits, i.valide
+FROM {SCHEMA}.t_inscriptions i
+JOIN {SCHEMA}.cles ke ON ke.entite = 'etudiants' AND ke.code = i.etu
+JOIN {SCHEMA}.cles ka ON ka.entite = 'annees' AND ka.code = i.annee
+JOIN {SCHEMA}.cles kp ON kp.entite = 'parcours' AND kp.code = i.parc
+JOIN {SCHEMA}.cles ks ON ks.entite = 'semestres' AND ks.code = i.sem
+JOIN {SCHEMA}.cles km ON km.entite = 'modes' AND km.code = i.mode;
+
+CREATE TABLE {SCHEMA}.c_notes (
+    sk bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    "Note_id" varchar(50) NOT NULL UNIQUE,
+    etu int NOT NULL, ec int NOT NULL, annee int NOT NULL, sess int NOT NULL,
+    valeur numeric(5, 2) NOT NULL,
+    UNIQUE (etu, ec, annee, sess)
+);
+INSERT INTO {SCHEMA}.c_notes ("Note_id", etu, ec, annee, sess, valeur)
+SELECT n."Note_id", ke.sk, kc.sk, ka.sk, kx.sk, n.valeur
+FROM {SCHEMA}.t_notes n
+JOIN {SCHEMA}.cles ke ON ke.entite = 'etudiants' AND ke.code = n.etu
+JOIN {SCHEMA}.cles kc ON kc.entite = 'ecs' AND kc.code = n.ec
+JOIN {SCHEMA}.cles ka ON ka.entite = 'annees' AND ka.code = n.annee
+JOIN {SCHEMA}.cles kx ON kx.entite = 'sessions' AND kx.code = n.sess;
+
+CREATE VIEW {SCHEMA}.v_inscriptions AS
+SELECT i."Inscription_id", ke.code AS etu, ka.code AS annee, kp.code AS parc, ks.code AS sem,
+       km.code AS mode, i.date_insc, i.credits, i.valide
+FROM {SCHEMA}.c_inscriptions i
+JOIN {SCHEMA}.cles ke ON ke.entite = 'etudiants' AND ke.sk = i.etu
+JOIN {SCHEMA}.cles ka ON ka.entite = 'annees' AND ka.sk = i.annee
+JOIN {SCHEMA}.cles kp ON kp.entite = 'parcours' AND kp.sk = i.parc
+JOIN {SCHEMA}.cles ks ON ks.entite = 'semestres' AND ks.sk = i.sem
+LEFT JOIN {SCHEMA}.cles km ON km.entite = 'modes' AND km.sk = i.mode;
+
+CREATE VIEW {SCHEMA}.v_notes AS
+SELECT n."Note_id", ke.code AS etu, kc.code AS ec, ka.code AS annee, kx.code AS sess, n.valeur
+FROM {SCHEMA}.c_notes n
+JOIN {SCHEMA}.cles ke ON ke.entite = 'etudiants' AND ke.sk = n.etu
+JOIN {SCHEMA}.cles kc ON kc.entite = 'ecs' AND kc.sk = n.ec
+JOIN {SCHEMA}.cles ka ON ka.entite = 'annees' AND ka.sk = n.annee
+JOIN {SCHEMA}.cles kx ON kx.entite = 'sessions' AND kx.sk = n.sess;
+"""
+
+# Agrégat complet : moyenne des notes par (parcours, année), via l'inscription du 1er semestre de l'année
+JOINTURE_TEXTE = f"""
+SELECT i.parc, i.annee, avg(n.valeur)
+FROM {SCHEMA}.t_notes n
+JOIN {SCHEMA}.t_inscriptions i ON i.etu = n.etu AND i.annee = n.annee
+WHERE i.sem IN ('SEME_01', 'SEME_03')
+GROUP BY 1, 2
+"""
+JOINTURE_COMPACTE = f"""
+SELECT i.parc, i.annee, avg(n.valeur)
+FROM {SCHEMA}.v_notes n
+JOIN {SCHEMA}.v_inscriptions i ON i.etu = n.etu AND i.annee = n.annee
+WHERE i.sem IN ('SEME_01', 'SEME_03')
+GROUP BY 1, 2
+"""
+
+# Accès par étudiant (relevé) : notes + inscriptions d'un code étudiant donné
+RELEVE_TEXTE = f"""
+SELECT i.sem, n.ec, n.valeur
+FROM {SCHEMA}.t_inscriptions i
+JOIN {SCHEMA}.t_notes n ON n.etu = i.etu AND n.annee = i.annee
+WHERE i.etu = :etu
+"""
+RELEVE_COMPACT = f"""
+SELECT i.sem, n.ec, n.valeur
+FROM {SCHEMA}.v_inscriptions i
+JOIN {SCHEMA}.v_notes n ON n.etu = i.etu AND n.annee = i.annee
+WHERE i.etu = :etu
+"""
+
+# ----------------------------
+# Mesures
+# ----------------------------
+def _tailles(conn, tables) -> dict:
+    """(table, index, total) en Mo, index compris ceux des contraintes d'unicité."""
+    out = {}
+    for t in tables:
+        out[t] = [v / 2**20 for v in conn.execute(text(
+            f"SELECT pg_relation_size('{SCHEMA}.{t}'), pg_indexes_size('{SCHEMA}.{t}'), "
+            f"pg_total_relation_size('{SCHEMA}.{t}')"
+        )).one()]
+    return out
+
+
+def _chrono(conn, sql, params_list, repetitions) -> float:
+    """Meilleur temps (s) sur `repetitions` passes de la liste de paramètres."""
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        for params in params_list:
+            conn.execute(text(sql), params).fetchall()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur
+
+
+def benchmark(n_etudiants=100_000, n_ec=10, n_releves=1000, repetitions=3, garder=False):
+    print(f"\n--- Benchmark clés compactes : {n_etudiants} étudiants, {n_ec} EC par semestre ---")
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        t0 = time.perf_counter()
+        for stmt in DDL_TEXTE.split(";\n"):
+            if stmt.strip():
+                conn.execute(text(stmt), {"n": n_etudiants, "ec": n_ec})
+        for stmt in DDL_COMPACT.split(";\n"):
+            if stmt.strip():
+                conn.execute(text(stmt))
+        print(f"   ⏱️ Construction des deux variantes : {time.perf_counter() - t0:.1f}s")
+
+    # VACUUM hors transaction : statistiques et visibility map à jour pour les deux variantes
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for t in ("t_inscriptions", "t_notes", "cles", "c_inscriptions", "c_notes"):
+            conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.{t}"))
+
+    with engine.connect() as conn:
+        tailles = _tailles(conn, ["t_inscriptions", "t_notes", "cles", "c_inscriptions", "c_notes"])
+        etus = [{"etu": f"UF{random.randint(1, n_etudiants):010d}"} for _ in range(n_releves)]
+        temps = {
+            "jointure": (_chrono(conn, JOINTURE_TEXTE, [{}], repetitions),
+                         _chrono(conn, JOINTURE_COMPACTE, [{}], repetitions)),
+            f"{n_releves} relevés": (_chrono(conn, RELEVE_TEXTE, etus, repetitions),
+                                     _chrono(conn, RELEVE_COMPACT, etus, repetitions)),
+        }
+
+    if not garder:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"{'table':<18}{'données':>10}{'index':>10}{'total':>10}  (Mo)")
+    for t, (donnees, index, total) in tailles.items():
+        print(f"{t:<18}{donnees:>10.1f}{index:>10.1f}{total:>10.1f}")
+
+    idx_texte = tailles["t_inscriptions"][1] + tailles["t_notes"][1]
+    idx_compact = tailles["c_inscriptions"][1] + tailles["c_notes"][1] + tailles["cles"][1]
+    print(f"Index : texte {idx_texte:.1f} Mo, compact {idx_compact:.1f} Mo (correspondance comprise), "
+          f"soit {idx_texte / max(idx_compact, 1e-9):.2f}x")
+
+    print(f"{'requête':<18}{'texte':>10}{'compact':>10}  (s, meilleur de {repetitions})")
+    for nom, (t_texte, t_compact) in temps.items():
+        print(f"{nom:<18}{t_texte:>10.3f}{t_compact:>10.3f}")
+    print("✅ Benchmark terminé.")
+    return {"tailles": tailles, "temps": temps}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark schéma texte / schéma à clés compactes")
+    parser.add_argument("--etudiants", type=int, default=100_000)
+    parser.add_argument("--ec", type=int, default=10, help="EC par semestre (notes par inscription)")
+    parser.add_argument("--releves", type=int, default=1000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--garder", action="store_true", help="ne pas supprimer le schéma bench_cles")
+    args = parser.parse_args()
+
+    benchmark(args.etudiants, args.ec, args.releves, args.repetitions, args.garder)
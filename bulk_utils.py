@@ -0,0 +1,219 @@
+# bulk_utils.py
+
+import hashlib
+
+import pandas as pd
+from sqlalchemy import String, cast, func, literal, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+import config
+
+# Taille par défaut des paquets envoyés en une seule instruction INSERT
+DEFAULT_CHUNK_SIZE = 5000
+
+
+# -------------------------------
+# Génération d'ID composites stables
+# -------------------------------
+def make_key_id(prefix: str, *parts) -> str:
+    """
+    Construit un ID stable à partir d'une clé naturelle composite.
+    Ex: make_key_id("NOTE", etu, ec, annee, sess) -> 'NOTE_3F2A9C0B17D4E865'
+    Le résultat tient toujours dans un String(50), quelle que soit la longueur des parties.
+    """
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()[:16].upper()
+    return f"{prefix}_{digest}"
+
+
+def make_key_ids(prefix: str, df: pd.DataFrame, cols: list) -> pd.Series:
+    """Version DataFrame de make_key_id (une passe sur les colonnes, sans iterrows)."""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    values = zip(*(df[c].tolist() for c in cols))
+    return pd.Series([make_key_id(prefix, *v) for v in values], index=df.index, dtype=object)
+
+
+def sql_key_id(prefix: str, *parts):
+    """
+    Version SQL (PostgreSQL) de make_key_id, pour générer les mêmes ID dans un
+    INSERT ... SELECT : prefix_ || upper(substr(md5(p1 || '|' || p2 ...), 1, 16)).
+    """
+    raw = None
+    for p in parts:
+        p = func.coalesce(cast(p, String), "")
+        raw = p if raw is None else raw + literal("|") + p
+    return literal(f"{prefix}_") + func.upper(func.substr(func.md5(raw), 1, 16))
+
+
+# -------------------------------
+# Conversion DataFrame -> lignes SQL
+# -------------------------------
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Convertit un DataFrame en liste de dicts en remplaçant NaN/NaT par None."""
+    if df.empty:
+        return []
+    out = df.astype(object).where(pd.notnull(df), None)
+    return out.to_dict(orient="records")
+
+
+# -------------------------------
+# UPSERT en masse (PostgreSQL)
+# -------------------------------
+def _constraint_columns(model, constraint_name) -> list:
+    if constraint_name is None:
+        return [c.name for c in model.__table__.primary_key.columns]
+    if isinstance(constraint_name, (list, tuple)):
+        return list(constraint_name)
+    for cons in model.__table__.constraints:
+        if cons.name == constraint_name:
+            return [c.name for c in cons.columns]
+    raise ValueError(f"Contrainte '{constraint_name}' introuvable sur {model.__tablename__}")
+
+
+def bulk_upsert(bind, model, rows, constraint=None, update_cols=None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    INSERT ... ON CONFLICT (constraint) DO UPDATE par paquets.
+    - bind : Session ou Connection SQLAlchemy
+    - rows : liste de dicts ou DataFrame (colonnes = noms des colonnes du modèle)
+    - constraint : nom de la contrainte d'unicité (None = clé primaire), ou liste de colonnes
+      pour une contrainte non nommée (ex. Column(unique=True))
+    - update_cols : colonnes mises à jour en cas de conflit (None = toutes sauf la clé de conflit et la PK)
+    Ne fait pas de commit : c'est à l'appelant de valider la transaction.
+    En mode config.SCHEMA_CLES = "compact", les modèles concernés sont écrits dans leur
+    table compacte (voir cles_compactes.py) ; en mode config.HISTORY_MODE = "plages", les
+    modèles *Historique sont fusionnés dans leurs plages de validité (historique_plages.py).
+    """
+    if config.HISTORY_MODE == "plages" and len(rows):
+        from historique_plages import PLAGES, ecrire_plages
+        if model in PLAGES:
+            return ecrire_plages(bind, model, rows)
+
+    if config.SCHEMA_CLES == "compact" and len(rows):
+        from cles_compactes import COMPACTS, vers_compact
+        if model in COMPACTS:
+            model, rows, constraint, update_cols = vers_compact(bind, model, rows, constraint, update_cols)
+
+    if isinstance(rows, pd.DataFrame):
+        rows = frame_to_records(rows)
+    if not rows:
+        return 0
+
+    table = model.__table__
+    conflict_cols = _constraint_columns(model, constraint)
+    if update_cols is None:
+        pk_cols = {c.name for c in table.primary_key.columns}
+        update_cols = [c for c in rows[0].keys() if c not in conflict_cols and c not in pk_cols]
+
+    total = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = pg_insert(table).values(chunk)
+        target = {"constraint": constraint} if isinstance(constraint, str) else {"index_elements": conflict_cols}
+        if update_cols:
+            stmt = stmt.on_conflict_do_update(
+                set_={c: stmt.excluded[c] for c in update_cols}, **target
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(**target)
+        bind.execute(stmt)
+        total += len(chunk)
+
+    return total
+
+
+def bulk_upsert_changed(bind, model, rows, constraint, update_cols, key_cols,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Comme bulk_upsert, mais ne réécrit que les lignes dont une colonne de update_cols a changé
+    et retourne (RETURNING) les key_cols des lignes réellement insérées ou modifiées.
+    """
+    if config.SCHEMA_CLES == "compact" and len(rows):
+        from cles_compactes import COMPACTS, decoder, renommer_colonnes, vers_compact
+        if model in COMPACTS:
+            texte = model
+            model, rows, constraint, update_cols = vers_compact(bind, model, rows, constraint, update_cols)
+            changed = bulk_upsert_changed(bind, model, rows, constraint, update_cols,
+                                          renommer_colonnes(texte, key_cols), chunk_size)
+            return decoder(bind, texte, changed)[key_cols]
+
+    if isinstance(rows, pd.DataFrame):
+        rows = frame_to_records(rows)
+    if not rows:
+        return pd.DataFrame(columns=key_cols)
+
+    table = model.__table__
+    changed = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = pg_insert(table).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint=constraint,
+            set_={c: stmt.excluded[c] for c in update_cols},
+            where=or_(*[table.c[c].is_distinct_from(stmt.excluded[c]) for c in update_cols])
+        ).returning(*[table.c[k] for k in key_cols])
+        changed.extend(bind.execute(stmt).fetchall())
+
+    return pd.DataFrame(changed, columns=key_cols)
+
+
+# -------------------------------
+# Lignes invalides et repli par sous-paquets
+# -------------------------------
+def lignes_invalides(model, df: pd.DataFrame) -> pd.Series:
+    """
+    Motif de rejet par ligne (None : ligne écrivable) au regard des colonnes du modèle :
+    colonne obligatoire vide (ex. FK non résolue par un .map()), texte plus long que String(n).
+    """
+    motifs = pd.Series(None, index=df.index, dtype=object)
+    for col in model.__table__.columns:
+        if col.name not in df.columns:
+            continue
+        s = df[col.name]
+        if not col.nullable and col.default is None and col.server_default is None:
+            motifs = motifs.mask(motifs.isna() & s.isna(), f"{col.name} vide")
+        longueur = getattr(col.type, "length", None)
+        if isinstance(col.type, String) and longueur:
+            trop_long = s.notna() & (s.astype(object).astype(str).str.len() > longueur)
+            motifs = motifs.mask(motifs.isna() & trop_long, f"{col.name} > {longueur} caractères")
+    return motifs
+
+
+def separer_lignes_invalides(model, df: pd.DataFrame):
+    """(lignes écrivables, lignes rejetées + colonne _motif)."""
+    motifs = lignes_invalides(model, df)
+    ko = motifs.notna()
+    return df[~ko], df[ko].assign(_motif=motifs[ko])
+
+
+def erreur_de_donnees(e) -> bool:
+    """Erreur propre aux lignes écrites (SQLSTATE 22 : donnée invalide, 23 : contrainte)."""
+    orig = getattr(e, "orig", None) or e
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None) or ""
+    return code[:2] in ("22", "23")
+
+
+def message_erreur(e) -> str:
+    return str(getattr(e, "orig", None) or e).strip().splitlines()[0][:200]
+
+
+def ecrire_avec_repli(ecrire, df: pd.DataFrame):
+    """
+    ecrire(df) écrit et valide un paquet dans sa propre transaction (annulée s'il échoue).
+    Un paquet rejeté pour ses données est coupé en deux, récursivement jusqu'à la ligne :
+    une ligne fautive n'emporte qu'elle-même. Les autres erreurs (connexion...) remontent.
+    Retourne (lignes écrites, lignes rejetées + _motif).
+    """
+    try:
+        ecrire(df)
+        return len(df), df.iloc[0:0].assign(_motif=None)
+    except Exception as e:
+        if not erreur_de_donnees(e):
+            raise
+        if len(df) <= 1:
+            return 0, df.assign(_motif=message_erreur(e))
+        milieu = len(df) // 2
+        n1, r1 = ecrire_avec_repli(ecrire, df.iloc[:milieu])
+        n2, r2 = ecrire_avec_repli(ecrire, df.iloc[milieu:])
+        return n1 + n2, pd.concat([r1, r2])
@@ -0,0 +1,447 @@
+# charges_enseignement.py
+#
+# Charges d'enseignement : import en masse + calcul vectorisé.
+#
+# Import (classeur config.CHARGES_FILE_PATH, une feuille par type de données) :
+#   - "enseignants"  : enseignant_matricule, enseignant_nom, enseignant_statut (PERM / VAC),
+#                      composante_code (affectation), autres colonnes enseignant_* facultatives ;
+#   - "volumes"      : anneeuniversitaire_annee, parcours_code, [ue_code,] ec_code, puis une
+#                      colonne d'heures par type d'enseignement (cm, td, tp) ;
+#   - "attributions" : anneeuniversitaire_annee, parcours_code, [ue_code,] ec_code,
+#                      enseignant_matricule, type (CM / TD / TP), [heures].
+#     Heures vides : reste du volume théorique (EC, type) réparti à parts égales.
+#     Le classeur fait foi pour les EC qu'il cite : leurs attributions absentes sont supprimées.
+#
+# Calcul (calculer_charges) : trois lectures, puis pandas uniquement
+#   - écarts par EC de maquette et type : heures attribuées / volume théorique (SUR, SOUS...) ;
+#   - charges par enseignant, composante (du parcours) et année : CM / TD / TP, équivalent TD ;
+#   - services par enseignant et année : équivalent TD / service statutaire.
+#
+#   python charges_enseignement.py --import
+#   python charges_enseignement.py --annee 2024-2025 --rapport charges_2024-2025.xlsx
+
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+import config
+from models import (
+    Enseignant, VolumeHoraire, AttributionEnseignant, TypeEnseignement,
+    MaquetteEC, MaquetteUE, UniteEnseignement, ElementConstitutif,
+    Parcours, Mention, Composante, AnneeUniversitaire
+)
+from metadata_import import safe_string
+from bulk_utils import bulk_upsert, make_key_ids
+
+# Heures équivalent TD par heure de chaque type
+COEF_EQTD = {"CM": 1.5, "TD": 1.0, "TP": 2 / 3}
+
+# Service annuel dû (heures équivalent TD) par statut ; pas de service pour les vacataires
+SERVICE_STATUTAIRE = {"PERM": 192.0}
+
+# Écart toléré (heures) entre heures attribuées et volume théorique
+TOLERANCE_HEURES = 0.5
+
+MAQ_KEYS = ["anneeuniversitaire_annee", "parcours_code", "ec_code"]
+
+
+# ----------------------------
+# Lecture / résolution
+# ----------------------------
+def _lire_feuilles(path):
+    sheets = pd.read_excel(path, sheet_name=None)
+    out = {}
+    for nom, df in sheets.items():
+        df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(" ", "_")
+        out[nom.strip().lower()] = df
+    return out
+
+
+def _normaliser_cles(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for c in MAQ_KEYS + ["ue_code", "enseignant_matricule", "type"]:
+        if c in df.columns:
+            df[c] = df[c].astype(object).map(lambda v: safe_string(str(v)) if pd.notna(v) else None)
+    for c in ["ec_code", "ue_code", "type"]:
+        if c in df.columns:
+            df[c] = df[c].str.upper()
+    return df
+
+
+def _get_maquettes_ec(session) -> pd.DataFrame:
+    """(année, parcours, UE, EC) -> MaquetteEC_id."""
+    stmt = (
+        select(AnneeUniversitaire.AnneeUniversitaire_annee.label("anneeuniversitaire_annee"),
+               Parcours.Parcours_code.label("parcours_code"),
+               UniteEnseignement.UE_code.label("ue_code"),
+               ElementConstitutif.EC_code.label("ec_code"),
+               MaquetteEC.MaquetteEC_id.label("MaquetteEC_id_fk"))
+        .select_from(MaquetteEC)
+        .join(MaquetteUE, MaquetteEC.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+        .join(AnneeUniversitaire, MaquetteUE.AnneeUniversitaire_id_fk == AnneeUniversitaire.AnneeUniversitaire_id)
+        .join(Parcours, MaquetteUE.Parcours_id_fk == Parcours.Parcours_id)
+        .join(UniteEnseignement, MaquetteUE.UE_id_fk == UniteEnseignement.UE_id)
+        .join(ElementConstitutif, MaquetteEC.EC_id_fk == ElementConstitutif.EC_id)
+    )
+    return _normaliser_cles(pd.read_sql(stmt, session.connection()))
+
+
+def _get_type_mapping(session):
+    return {c.upper(): i for c, i in session.query(TypeEnseignement.TypeEnseignement_code,
+                                                   TypeEnseignement.TypeEnseignement_id)}
+
+
+def _get_composante_mapping(session):
+    return {c: i for c, i in session.query(Composante.Composante_code, Composante.Composante_id)}
+
+
+def _get_enseignant_mapping(session):
+    return {m: i for m, i in session.query(Enseignant.Enseignant_matricule, Enseignant.Enseignant_id)
+            if m is not None}
+
+
+def _resoudre_maquette_ec(df: pd.DataFrame, maq: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute MaquetteEC_id_fk (clé : année, parcours, EC, + UE si la colonne est fournie)
+    et _ambigu (EC présent dans plusieurs UE du parcours sans ue_code pour trancher).
+    """
+    keys = MAQ_KEYS + (["ue_code"] if "ue_code" in df.columns else [])
+    dup = maq.duplicated(subset=keys, keep=False)
+    uniques = maq.loc[~dup, keys + ["MaquetteEC_id_fk"]]
+    ambigus = maq.loc[dup, keys].drop_duplicates().assign(_ambigu=True)
+    out = df.merge(uniques, on=keys, how="left").merge(ambigus, on=keys, how="left")
+    out["_ambigu"] = out["_ambigu"].eq(True)
+    return out
+
+
+def _rejets(df, checks, colonnes):
+    """Motif de rejet (le premier trouvé) ; retourne (lignes valides, rejets)."""
+    df = df.copy()
+    df["motif_rejet"] = np.select([m for m, _ in checks], [lbl for _, lbl in checks], default="")
+    rejets = df.loc[df["motif_rejet"] != "", [c for c in colonnes if c in df.columns] + ["motif_rejet"]]
+    return df.loc[df["motif_rejet"] == ""], rejets
+
+
+def _afficher_rejets(nom, rejets):
+    if not rejets.empty:
+        print(f"⚠️ [{nom}] {len(rejets)} ligne(s) rejetée(s) :")
+        print(rejets["motif_rejet"].value_counts().to_string())
+
+
+# ----------------------------
+# Frames des trois tables
+# ----------------------------
+def _enseignants_frame(df: pd.DataFrame, comp_map) -> tuple:
+    df = _normaliser_cles(df)
+    if "enseignant_statut" in df.columns:
+        df["enseignant_statut"] = df["enseignant_statut"].astype(object).map(safe_string).str.upper()
+    comp = df["composante_code"].map(safe_string) if "composante_code" in df.columns else pd.Series(None, index=df.index)
+    df["Composante_id_affectation_fk"] = comp.map(comp_map)
+
+    checks = [
+        (df.get("enseignant_matricule", pd.Series(None, index=df.index)).isna(), "MATRICULE_MANQUANT"),
+        (df.get("enseignant_nom", pd.Series(None, index=df.index)).isna(), "NOM_MANQUANT"),
+        (~df.get("enseignant_statut", pd.Series(None, index=df.index)).isin(["PERM", "VAC"]), "STATUT_INVALIDE"),
+        (comp.notna() & df["Composante_id_affectation_fk"].isna(), "COMPOSANTE_INCONNUE"),
+    ]
+    ok, rejets = _rejets(df, checks, ["enseignant_matricule", "enseignant_nom", "composante_code"])
+    ok = ok.drop_duplicates(subset=["enseignant_matricule"], keep="last")
+
+    # Colonnes enseignant_* du fichier qui existent dans le modèle (Enseignant_grade, Enseignant_mail...)
+    modele = {c.name.lower(): c.name for c in Enseignant.__table__.columns}
+    cols = {modele[c]: ok[c].map(safe_string) for c in ok.columns if c in modele}
+    rows = pd.DataFrame(cols, index=ok.index)
+    rows["Composante_id_affectation_fk"] = ok["Composante_id_affectation_fk"]
+    rows.insert(0, "Enseignant_id", make_key_ids("ENSE", ok, ["enseignant_matricule"]))
+    return rows.reset_index(drop=True), rejets
+
+
+def _volumes_frame(df: pd.DataFrame, maq, type_map) -> tuple:
+    df = _normaliser_cles(df)
+    type_cols = [c for c in df.columns if c.upper() in type_map]
+    if not type_cols or not set(MAQ_KEYS) <= set(df.columns):
+        print(f"⚠️ [VOLUMES] Colonnes attendues : {MAQ_KEYS} + une colonne par type ({sorted(type_map)}).")
+        return None, pd.DataFrame()
+    id_vars = MAQ_KEYS + (["ue_code"] if "ue_code" in df.columns else [])
+    long_df = df.melt(id_vars=id_vars, value_vars=type_cols, var_name="type", value_name="heures_brutes")
+    long_df["type"] = long_df["type"].str.upper()
+    long_df = long_df.loc[long_df["heures_brutes"].notna()]
+
+    long_df = _resoudre_maquette_ec(long_df, maq)
+    heures = pd.to_numeric(long_df["heures_brutes"].astype(str).str.replace(",", ".", regex=False),
+                           errors="coerce")
+    long_df["Volume_heures"] = heures.round(2)
+    long_df["TypeEnseignement_id_fk"] = long_df["type"].map(type_map)
+
+    checks = [
+        (long_df["_ambigu"], "EC_AMBIGU"),
+        (long_df["MaquetteEC_id_fk"].isna(), "MAQUETTE_EC_INCONNUE"),
+        (heures.isna(), "HEURES_NON_NUMERIQUES"),
+        (heures < 0, "HEURES_NEGATIVES"),
+    ]
+    ok, rejets = _rejets(long_df, checks, id_vars + ["type", "heures_brutes"])
+    keys = ["MaquetteEC_id_fk", "TypeEnseignement_id_fk"]
+    rows = ok.drop_duplicates(subset=keys, keep="last")[keys + ["Volume_heures"]].copy()
+    rows.insert(0, "Volume_id", make_key_ids("VOLH", rows, keys))
+    return rows.reset_index(drop=True), rejets
+
+
+def _attributions_frame(df: pd.DataFrame, maq, type_map, ens_map) -> tuple:
+    df = _normaliser_cles(df)
+    manquantes = [c for c in MAQ_KEYS + ["enseignant_matricule", "type"] if c not in df.columns]
+    if manquantes:
+        print(f"⚠️ [ATTRIBUTIONS] Colonnes absentes : {manquantes}")
+        return None, pd.DataFrame()
+
+    df = _resoudre_maquette_ec(df, maq)
+    df["Enseignant_id_fk"] = df["enseignant_matricule"].map(ens_map)
+    df["TypeEnseignement_id_fk"] = df["type"].map(type_map)
+    brutes = df["heures"] if "heures" in df.columns else pd.Series(np.nan, index=df.index)
+    heures = pd.to_numeric(brutes.astype(str).str.replace(",", ".", regex=False), errors="coerce")
+    df["Attribution_heures"] = heures.round(2)
+
+    checks = [
+        (df["_ambigu"], "EC_AMBIGU"),
+        (df["MaquetteEC_id_fk"].isna(), "MAQUETTE_EC_INCONNUE"),
+        (df["Enseignant_id_fk"].isna(), "ENSEIGNANT_INCONNU"),
+        (df["TypeEnseignement_id_fk"].isna(), "TYPE_INCONNU"),
+        (brutes.notna() & heures.isna(), "HEURES_NON_NUMERIQUES"),
+        (heures < 0, "HEURES_NEGATIVES"),
+    ]
+    ok, rejets = _rejets(df, checks, MAQ_KEYS + ["enseignant_matricule", "type", "heures"])
+    keys = ["MaquetteEC_id_fk", "Enseignant_id_fk", "TypeEnseignement_id_fk"]
+    rows = ok.drop_duplicates(subset=keys, keep="last")[keys + ["Attribution_heures"]].copy()
+    rows.insert(0, "Attribution_id", make_key_ids("ATTR", rows, keys))
+    return rows.reset_index(drop=True), rejets
+
+
+def _supprimer_attributions_absentes(session, rows) -> int:
+    """Attributions des EC cités par le classeur mais absentes de celui-ci."""
+    t = AttributionEnseignant.__table__
+    ecs = rows["MaquetteEC_id_fk"].unique().tolist()
+    gardes = set(rows["Attribution_id"])
+    existantes = [i for (i,) in session.execute(
+        select(t.c.Attribution_id).where(t.c.MaquetteEC_id_fk.in_(ecs)))]
+    obsoletes = [i for i in existantes if i not in gardes]
+    if obsoletes:
+        session.execute(delete(t).where(t.c.Attribution_id.in_(obsoletes)))
+    return len(obsoletes)
+
+
+# ----------------------------
+# ORCHESTRATEUR (import)
+# ----------------------------
+def import_charges_enseignement(session: Session, path=None) -> dict:
+    """Import des feuilles enseignants / volumes / attributions du classeur (celles présentes)."""
+    print("\n--- Importation Enseignants, Volumes horaires et Attributions ---")
+    path = path or config.CHARGES_FILE_PATH
+    try:
+        feuilles = _lire_feuilles(path)
+    except Exception as e:
+        print(f"❌ ERREUR lecture du classeur des charges {path} : {e}")
+        return {}
+
+    stats = {}
+    try:
+        type_map = _get_type_mapping(session)
+        if "enseignants" in feuilles:
+            rows, rejets = _enseignants_frame(feuilles["enseignants"], _get_composante_mapping(session))
+            _afficher_rejets("ENSEIGNANTS", rejets)
+            stats["enseignants"] = bulk_upsert(session, Enseignant, rows)
+
+        maq = _get_maquettes_ec(session)
+        if "volumes" in feuilles:
+            rows, rejets = _volumes_frame(feuilles["volumes"], maq, type_map)
+            _afficher_rejets("VOLUMES", rejets)
+            stats["volumes"] = bulk_upsert(session, VolumeHoraire, rows) if rows is not None else 0
+
+        if "attributions" in feuilles:
+            rows, rejets = _attributions_frame(feuilles["attributions"], maq, type_map,
+                                               _get_enseignant_mapping(session))
+            _afficher_rejets("ATTRIBUTIONS", rejets)
+            if rows is not None and not rows.empty:
+                stats["attributions_supprimees"] = _supprimer_attributions_absentes(session, rows)
+                stats["attributions"] = bulk_upsert(session, AttributionEnseignant, rows)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [CHARGES] Erreur d'insertion en masse : {e}")
+        return {}
+
+    print(f"✅ Charges d'enseignement importées : {stats}")
+    return stats
+
+
+# ----------------------------
+# Calcul vectorisé
+# ----------------------------
+def load_charges_data(session: Session, annee=None) -> dict:
+    """Volumes, attributions et contexte des EC de maquette (une requête chacun)."""
+    maq_stmt = (
+        select(MaquetteEC.MaquetteEC_id.label("MaquetteEC_id_fk"),
+               AnneeUniversitaire.AnneeUniversitaire_annee.label("annee"),
+               Composante.Composante_code, Parcours.Parcours_code, ElementConstitutif.EC_code)
+        .select_from(MaquetteEC)
+        .join(MaquetteUE, MaquetteEC.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+        .join(AnneeUniversitaire, MaquetteUE.AnneeUniversitaire_id_fk == AnneeUniversitaire.AnneeUniversitaire_id)
+        .join(Parcours, MaquetteUE.Parcours_id_fk == Parcours.Parcours_id)
+        .join(Mention, Parcours.Mention_id_fk == Mention.Mention_id)
+        .join(Composante, Mention.Composante_id_fk == Composante.Composante_id)
+        .join(ElementConstitutif, MaquetteEC.EC_id_fk == ElementConstitutif.EC_id)
+    )
+    if annee is not None:
+        maq_stmt = maq_stmt.where(AnneeUniversitaire.AnneeUniversitaire_annee == annee)
+    ecs = maq_stmt.with_only_columns(MaquetteEC.MaquetteEC_id).scalar_subquery()
+
+    vol_stmt = (
+        select(VolumeHoraire.MaquetteEC_id_fk, TypeEnseignement.TypeEnseignement_code.label("type"),
+               VolumeHoraire.Volume_heures)
+        .join(TypeEnseignement, VolumeHoraire.TypeEnseignement_id_fk == TypeEnseignement.TypeEnseignement_id)
+    )
+    att_stmt = (
+        select(AttributionEnseignant.MaquetteEC_id_fk, AttributionEnseignant.Enseignant_id_fk,
+               TypeEnseignement.TypeEnseignement_code.label("type"), AttributionEnseignant.Attribution_heures,
+               Enseignant.Enseignant_matricule, Enseignant.Enseignant_nom, Enseignant.Enseignant_prenoms,
+               Enseignant.Enseignant_statut)
+        .join(TypeEnseignement, AttributionEnseignant.TypeEnseignement_id_fk == TypeEnseignement.TypeEnseignement_id)
+        .join(Enseignant, AttributionEnseignant.Enseignant_id_fk == Enseignant.Enseignant_id)
+    )
+    if annee is not None:
+        vol_stmt = vol_stmt.where(VolumeHoraire.MaquetteEC_id_fk.in_(ecs))
+        att_stmt = att_stmt.where(AttributionEnseignant.MaquetteEC_id_fk.in_(ecs))
+
+    conn = session.connection()
+    volumes = pd.read_sql(vol_stmt, conn)
+    volumes["Volume_heures"] = volumes["Volume_heures"].astype(float)
+    attributions = pd.read_sql(att_stmt, conn)
+    attributions["Attribution_heures"] = attributions["Attribution_heures"].astype(float)
+    return {"maquettes": pd.read_sql(maq_stmt, conn), "volumes": volumes, "attributions": attributions}
+
+
+def repartir_heures(attributions: pd.DataFrame, volumes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Heures effectives de chaque attribution : heures saisies, sinon reste du volume
+    (EC, type) après les heures saisies, réparti à parts égales entre les attributions sans heures.
+    """
+    k = ["MaquetteEC_id_fk", "type"]
+    a = attributions.merge(volumes, on=k, how="left")
+    a["Volume_heures"] = a["Volume_heures"].fillna(0.0)
+    groupes = [a[c] for c in k]
+    saisies = a["Attribution_heures"].groupby(groupes).transform("sum")
+    sans_heures = a["Attribution_heures"].isna().groupby(groupes).transform("sum")
+    reste = (a["Volume_heures"] - saisies).clip(lower=0)
+    a["heures"] = a["Attribution_heures"].fillna(reste / sans_heures.where(sans_heures > 0))
+    return a
+
+
+def ecarts_par_ec(a: pd.DataFrame, volumes: pd.DataFrame, maquettes: pd.DataFrame) -> pd.DataFrame:
+    """Heures attribuées / volume théorique par (EC de maquette, type), avec statut."""
+    k = ["MaquetteEC_id_fk", "type"]
+    attribuees = a.groupby(k, as_index=False).agg(heures_attribuees=("heures", "sum"),
+                                                  enseignants=("Enseignant_id_fk", "nunique"))
+    e = volumes.merge(attribuees, on=k, how="outer")
+    e = e.fillna({"Volume_heures": 0.0, "heures_attribuees": 0.0, "enseignants": 0})
+    e["enseignants"] = e["enseignants"].astype(int)
+    e["ecart"] = (e["heures_attribuees"] - e["Volume_heures"]).round(2)
+    e["statut"] = np.select(
+        [(e["heures_attribuees"] == 0) & (e["Volume_heures"] > 0),
+         (e["Volume_heures"] == 0) & (e["heures_attribuees"] > 0),
+         e["ecart"] > TOLERANCE_HEURES,
+         e["ecart"] < -TOLERANCE_HEURES],
+        ["NON_ATTRIBUE", "SANS_VOLUME", "SUR_ATTRIBUE", "SOUS_ATTRIBUE"], default="OK"
+    )
+    return maquettes.merge(e, on="MaquetteEC_id_fk").sort_values(
+        ["annee", "Composante_code", "Parcours_code", "EC_code", "type"]).reset_index(drop=True)
+
+
+def charges_par_enseignant(a: pd.DataFrame, ecarts: pd.DataFrame, maquettes: pd.DataFrame) -> pd.DataFrame:
+    """Heures CM / TD / TP, équivalent TD et volume théorique couvert, par enseignant, composante et année."""
+    k = ["MaquetteEC_id_fk", "type"]
+    a = a.merge(maquettes[["MaquetteEC_id_fk", "annee", "Composante_code"]], on="MaquetteEC_id_fk") \
+         .merge(ecarts[k + ["statut"]], on=k, how="left")
+    a["eq_td"] = a["heures"] * a["type"].map(COEF_EQTD).fillna(1.0)
+    a["ec_sur"] = a["statut"].eq("SUR_ATTRIBUE")
+    a["ec_sous"] = a["statut"].eq("SOUS_ATTRIBUE")
+
+    index = ["Enseignant_id_fk", "Enseignant_matricule", "Enseignant_nom", "Enseignant_prenoms",
+             "Enseignant_statut", "Composante_code", "annee"]
+    a[index] = a[index].astype(object).fillna("")
+    par_type = a.pivot_table(index=index, columns="type", values="heures", aggfunc="sum", fill_value=0.0)
+    par_type = par_type.reindex(columns=sorted(set(par_type.columns) | set(COEF_EQTD)), fill_value=0.0)
+    par_type.columns = [f"heures_{c.lower()}" for c in par_type.columns]
+    totaux = a.groupby(index).agg(
+        heures_total=("heures", "sum"), eq_td=("eq_td", "sum"),
+        volume_theorique=("Volume_heures", "sum"),
+        ec_sur_attribues=("ec_sur", "sum"), ec_sous_attribues=("ec_sous", "sum"),
+    )
+    return par_type.join(totaux).round(2).reset_index()
+
+
+def services_par_enseignant(charges: pd.DataFrame) -> pd.DataFrame:
+    """Équivalent TD annuel (toutes composantes) face au service statutaire."""
+    index = ["Enseignant_id_fk", "Enseignant_matricule", "Enseignant_nom", "Enseignant_statut", "annee"]
+    s = charges.groupby(index, as_index=False)["eq_td"].sum()
+    s["service_du"] = s["Enseignant_statut"].map(SERVICE_STATUTAIRE)
+    s["ecart_service"] = (s["eq_td"] - s["service_du"]).round(2)
+    s["statut_service"] = np.select(
+        [s["service_du"].isna(), s["ecart_service"] > TOLERANCE_HEURES, s["ecart_service"] < -TOLERANCE_HEURES],
+        ["", "HEURES_COMPLEMENTAIRES", "SOUS_SERVICE"], default="OK"
+    )
+    return s.sort_values(["annee", "Enseignant_nom"]).reset_index(drop=True)
+
+
+def calculer_charges(session: Session, annee=None, rapport=None) -> dict:
+    """
+    Recalcul complet (toute l'université, ou une année) des charges d'enseignement.
+    Retourne {"ecarts", "charges", "services"} ; rapport : classeur Excel (une feuille chacun).
+    """
+    print(f"\n--- Calcul des charges d'enseignement ({annee or 'toutes années'}) ---")
+    t0 = time.perf_counter()
+    data = load_charges_data(session, annee)
+    t_lecture = time.perf_counter() - t0
+
+    a = repartir_heures(data["attributions"], data["volumes"])
+    ecarts = ecarts_par_ec(a, data["volumes"], data["maquettes"])
+    charges = charges_par_enseignant(a, ecarts, data["maquettes"])
+    services = services_par_enseignant(charges)
+
+    print(f"   ⏱️ Lecture : {t_lecture:.2f}s | calcul : {time.perf_counter() - t0 - t_lecture:.2f}s "
+          f"({len(a)} attributions, {len(ecarts)} couples EC / type)")
+    if not ecarts.empty:
+        print("   " + ecarts["statut"].value_counts().to_string().replace("\n", " | "))
+    n_hc = int((services["statut_service"] == "HEURES_COMPLEMENTAIRES").sum())
+    n_ss = int((services["statut_service"] == "SOUS_SERVICE").sum())
+    print(f"✅ {len(charges)} lignes enseignant / composante / année ; "
+          f"{n_hc} en heures complémentaires, {n_ss} en sous-service.")
+
+    resultats = {"ecarts": ecarts, "charges": charges, "services": services}
+    if rapport:
+        with pd.ExcelWriter(rapport) as writer:
+            for nom, df in resultats.items():
+                df.to_excel(writer, sheet_name=nom, index=False)
+        print(f"   📄 Rapport écrit : {rapport}")
+    return resultats
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Charges d'enseignement : import et calcul")
+    parser.add_argument("--import", dest="importer", action="store_true",
+                        help="Importe d'abord le classeur (défaut : config.CHARGES_FILE_PATH)")
+    parser.add_argument("--fichier", default=None)
+    parser.add_argument("--annee", default=None, help="Année universitaire (défaut : toutes)")
+    parser.add_argument("--rapport", default=None, help="Classeur Excel de sortie")
+    args = parser.parse_args()
+
+    session = get_session()
+    try:
+        if args.importer:
+            import_charges_enseignement(session, args.fichier)
+        calculer_charges(session, args.annee, args.rapport)
+    finally:
+        session.close()
@@ -0,0 +1,315 @@
+# cles_compactes.py
+#
+# Mode de schéma "compact" (config.SCHEMA_CLES = "compact") pour les tables volumineuses
+# (inscriptions, notes, resultats_ue, resultats_semestre) :
+#   - stockage dans *_compact(e)s avec des clés entières (Etudiant_sk, Parcours_sk...) ;
+#     l'ID texte de la ligne (Inscription_id, Note_id...) reste une clé métier unique ;
+#   - cles_compactes : correspondance (table cible, code texte) <-> entier ;
+#   - les noms d'origine deviennent des vues qui redonnent les codes texte : toutes les
+#     lectures (ORM, pd.read_sql, COPY) restent inchangées ;
+#   - les écritures en masse (bulk_upsert, bulk_upsert_changed, mettre_a_jour_en_masse,
+#     supprimer_en_masse) sont redirigées vers les tables compactes après encodage des codes.
+# Le mode se choisit à la création de la base (init_db). Les écritures ORM unitaires
+# (session.add / merge) sur ces quatre modèles ne sont pas prises en charge.
+# Intégrité : les FK des tables compactes visent cles_compactes ; un trigger sur chaque
+# table cible (etudiants, parcours...) y retire le code supprimé ou renommé, ce que la FK
+# refuse tant qu'une ligne compacte l'utilise (creer_restrictions).
+
+import threading
+
+import pandas as pd
+from sqlalchemy import bindparam, delete, inspect, literal, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import config
+from models import (
+    Base, CleCompacte,
+    Inscription, Note, ResultatUE, ResultatSemestre,
+    InscriptionCompacte, NoteCompacte, ResultatUECompact, ResultatSemestreCompact
+)
+from bulk_utils import DEFAULT_CHUNK_SIZE, frame_to_records
+
+# Modèle texte -> modèle compact
+COMPACTS = {
+    Inscription: InscriptionCompacte,
+    Note: NoteCompacte,
+    ResultatUE: ResultatUECompact,
+    ResultatSemestre: ResultatSemestreCompact,
+}
+
+# Correspondances déjà résolues (un code garde sa clé pour toujours) : {entite: {code: sk}}
+_codes = {}
+_sks = {}
+_lock = threading.Lock()
+
+
+def actif() -> bool:
+    return config.SCHEMA_CLES == "compact"
+
+
+def colonnes_cles(model) -> dict:
+    """{colonne FK texte: (colonne entière, table cible)} ; ex. Etudiant_id_fk -> (Etudiant_sk, etudiants)."""
+    out = {}
+    for col in model.__table__.columns:
+        for fk in col.foreign_keys:
+            out[col.name] = (col.name.replace("_id_fk", "_sk"), fk.column.table.name)
+    return out
+
+
+def cle_metier(model) -> str:
+    return model.__table__.primary_key.columns.values()[0].name
+
+
+# ----------------------------
+# Correspondance code <-> clé entière
+# ----------------------------
+def _engine(bind):
+    return bind.get_bind() if isinstance(bind, Session) else bind.engine
+
+
+def _resoudre_codes(bind, entite, codes) -> dict:
+    """
+    {code: sk} pour l'entité. Les codes jamais vus reçoivent une clé dans une transaction
+    séparée, validée aussitôt (un rollback de l'appelant ne rend pas le cache faux).
+    Seuls les codes présents dans la table cible sont enregistrés (contrôle de la FK texte
+    à l'attribution ; les suppressions ensuite sont contrôlées par creer_restrictions).
+    """
+    with _lock:
+        connus = _codes.setdefault(entite, {})
+        manquants = [c for c in codes if c not in connus]
+    if not manquants:
+        return connus
+
+    cible = Base.metadata.tables[entite]
+    pk = cible.primary_key.columns.values()[0]
+    k = CleCompacte.__table__
+    trouves = []
+    with _engine(bind).begin() as conn:
+        for start in range(0, len(manquants), DEFAULT_CHUNK_SIZE):
+            chunk = manquants[start:start + DEFAULT_CHUNK_SIZE]
+            conn.execute(
+                pg_insert(k).from_select(
+                    ["CleCompacte_entite", "CleCompacte_code"],
+                    select(literal(entite), pk).where(pk.in_(chunk))
+                ).on_conflict_do_nothing()
+            )
+            trouves.extend(conn.execute(
+                select(k.c.CleCompacte_code, k.c.CleCompacte_sk)
+                .where(k.c.CleCompacte_entite == entite, k.c.CleCompacte_code.in_(chunk))
+            ).all())
+
+    with _lock:
+        connus.update(trouves)
+        _sks.setdefault(entite, {}).update((sk, code) for code, sk in trouves)
+        inconnus = [c for c in manquants if c not in connus]
+    if inconnus:
+        raise ValueError(f"{len(inconnus)} code(s) absent(s) de {entite} : {inconnus[:5]}")
+    return connus
+
+
+def _resoudre_sks(bind, entite, sks) -> dict:
+    with _lock:
+        connus = _sks.setdefault(entite, {})
+        manquants = [s for s in sks if s not in connus]
+    if manquants:
+        k = CleCompacte.__table__
+        with _engine(bind).connect() as conn:
+            trouves = conn.execute(
+                select(k.c.CleCompacte_sk, k.c.CleCompacte_code).where(k.c.CleCompacte_sk.in_(manquants))
+            ).all()
+        with _lock:
+            connus.update(trouves)
+            _codes.setdefault(entite, {}).update((code, sk) for sk, code in trouves)
+    return connus
+
+
+def encoder(bind, model, rows: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes FK texte -> colonnes entières (vectorisé : un dict par entité, puis .map)."""
+    out = rows.copy()
+    for col, (sk_col, entite) in colonnes_cles(model).items():
+        if col not in out.columns:
+            continue
+        table = _resoudre_codes(bind, entite, out[col].dropna().unique().tolist())
+        out[col] = out[col].map(table).astype("Int64")
+        out = out.rename(columns={col: sk_col})
+    return out
+
+
+def decoder(bind, model, rows: pd.DataFrame) -> pd.DataFrame:
+    """Inverse d'encoder : colonnes entières -> codes texte."""
+    out = rows.copy()
+    for col, (sk_col, entite) in colonnes_cles(model).items():
+        if sk_col not in out.columns:
+            continue
+        sks = [int(s) for s in out[sk_col].dropna().unique()]
+        table = _resoudre_sks(bind, entite, sks)
+        out[sk_col] = out[sk_col].map(table)
+        out = out.rename(columns={sk_col: col})
+    return out
+
+
+# ----------------------------
+# Redirection des écritures en masse
+# ----------------------------
+def renommer_colonnes(model, cols) -> list:
+    renommage = {col: sk_col for col, (sk_col, _) in colonnes_cles(model).items()}
+    return [renommage.get(c, c) for c in cols]
+
+
+def vers_compact(bind, model, rows, constraint=None, update_cols=None):
+    """
+    Traduit un appel bulk_upsert* sur un modèle texte : (modèle compact, lignes encodées,
+    contrainte compacte, colonnes à mettre à jour). constraint=None (clé primaire texte)
+    devient un conflit sur la clé métier ; la clé métier n'est jamais réécrite.
+    """
+    if not isinstance(rows, pd.DataFrame):
+        rows = pd.DataFrame(rows)
+    rows = encoder(bind, model, rows)
+
+    if constraint is None:
+        constraint = [cle_metier(model)]
+    elif isinstance(constraint, str):
+        constraint = f"{constraint}_sk"
+    else:
+        constraint = renommer_colonnes(model, constraint)
+
+    if update_cols is None:
+        compact = COMPACTS[model].__table__
+        conflit = set(constraint) if isinstance(constraint, list) else {
+            c.name for cons in compact.constraints if cons.name == constraint for c in cons.columns
+        }
+        update_cols = [c for c in rows.columns if c not in conflit and c != cle_metier(model)]
+    else:
+        update_cols = renommer_colonnes(model, update_cols)
+
+    return COMPACTS[model], rows, constraint, update_cols
+
+
+def mettre_a_jour_en_masse(session: Session, model, mappings: list) -> int:
+    """
+    bulk_update_mappings par clé primaire ; en mode compact, UPDATE de la table compacte
+    par clé métier (les vues de décodage ne sont pas modifiables).
+    """
+    if not mappings:
+        return 0
+    if not (actif() and model in COMPACTS):
+        session.bulk_update_mappings(model, mappings)
+        return len(mappings)
+
+    cle = cle_metier(model)
+    frame = encoder(session, model, pd.DataFrame(mappings))
+    table = COMPACTS[model].__table__
+    cols = [c for c in frame.columns if c != cle]
+    stmt = (
+        update(table)
+        .where(table.c[cle] == bindparam("b_cle"))
+        .values({c: bindparam(f"b_{c}") for c in cols})
+    )
+    params = [{"b_cle": r[cle], **{f"b_{c}": r[c] for c in cols}} for r in frame_to_records(frame)]
+    for start in range(0, len(params), DEFAULT_CHUNK_SIZE):
+        session.execute(stmt, params[start:start + DEFAULT_CHUNK_SIZE])
+    return len(params)
+
+
+def supprimer_en_masse(session: Session, model, ids) -> int:
+    """DELETE par clé primaire texte ; en mode compact, dans la table compacte (clé métier)."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    table = COMPACTS[model].__table__ if actif() and model in COMPACTS else model.__table__
+    col = table.c[cle_metier(model)]
+    for start in range(0, len(ids), DEFAULT_CHUNK_SIZE):
+        session.execute(delete(table).where(col.in_(ids[start:start + DEFAULT_CHUNK_SIZE])))
+    return len(ids)
+
+
+# ----------------------------
+# Création du schéma
+# ----------------------------
+def tables_a_creer() -> list:
+    """Tables de Base.metadata pour create_all selon le mode (texte : sans les tables compactes)."""
+    compactes = {c.__table__ for c in COMPACTS.values()} | {CleCompacte.__table__}
+    textes = {m.__table__ for m in COMPACTS}
+    exclues = textes if actif() else compactes
+    return [t for t in Base.metadata.sorted_tables if t not in exclues]
+
+
+def _vue(model):
+    """SELECT de décodage : mêmes noms et même ordre de colonnes que la table texte."""
+    compact = COMPACTS[model].__table__
+    k = CleCompacte.__table__
+    fk = colonnes_cles(model)
+    source, cols = compact, []
+    for col in model.__table__.columns:
+        if col.name not in fk:
+            cols.append(compact.c[col.name])
+            continue
+        sk_col, entite = fk[col.name]
+        alias = k.alias(f"k_{sk_col.lower()}")
+        # Prédicat d'entité : un filtre sur le code texte de la vue passe par la PK (entite, code)
+        source = source.join(
+            alias,
+            (alias.c.CleCompacte_entite == literal(entite)) & (alias.c.CleCompacte_sk == compact.c[sk_col]),
+            isouter=col.nullable,
+        )
+        cols.append(alias.c.CleCompacte_code.label(col.name))
+    return select(*cols).select_from(source)
+
+
+# ----------------------------
+# Intégrité référentielle des tables cibles
+# ----------------------------
+FONCTION_RESTRICTION = "cles_compactes_restreindre"
+
+# Supprime la correspondance du code : refusé (23503) par les FK des tables compactes s'il est utilisé
+_SQL_RESTRICTION = f"""
+CREATE OR REPLACE FUNCTION {FONCTION_RESTRICTION}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM cles_compactes
+    WHERE "CleCompacte_entite" = TG_TABLE_NAME AND "CleCompacte_code" = to_jsonb(OLD) ->> TG_ARGV[0];
+    RETURN CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END;
+END $$;
+"""
+
+
+def _tables_cibles() -> list:
+    return sorted({entite for model in COMPACTS for _, entite in colonnes_cles(model).values()})
+
+
+def creer_restrictions(engine) -> int:
+    """
+    Triggers BEFORE DELETE / UPDATE de la clé sur chaque table cible (idempotent).
+    Un code retiré reste dans le cache du processus qui l'avait résolu : supprimer un
+    référentiel hors des imports en cours.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(_SQL_RESTRICTION))
+        cibles = _tables_cibles()
+        for nom in cibles:
+            pk = Base.metadata.tables[nom].primary_key.columns.values()[0].name
+            conn.execute(text(f'DROP TRIGGER IF EXISTS trg_cles_compactes ON "{nom}"'))
+            conn.execute(text(f'DROP TRIGGER IF EXISTS trg_cles_compactes_maj ON "{nom}"'))
+            conn.execute(text(
+                f'CREATE TRIGGER trg_cles_compactes BEFORE DELETE ON "{nom}" '
+                f"FOR EACH ROW EXECUTE FUNCTION {FONCTION_RESTRICTION}('{pk}')"
+            ))
+            conn.execute(text(
+                f'CREATE TRIGGER trg_cles_compactes_maj BEFORE UPDATE OF "{pk}" ON "{nom}" '
+                f'FOR EACH ROW WHEN (OLD."{pk}" IS DISTINCT FROM NEW."{pk}") '
+                f"EXECUTE FUNCTION {FONCTION_RESTRICTION}('{pk}')"
+            ))
+    return len(cibles)
+
+
+def creer_vues(engine):
+    """Vues inscriptions / notes / resultats_* au-dessus des tables compactes."""
+    existantes = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for model in COMPACTS:
+            nom = model.__tablename__
+            if nom in existantes:
+                raise RuntimeError(f"La table '{nom}' existe déjà : base créée en mode texte.")
+            sql = _vue(model).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            conn.execute(text(f'CREATE OR REPLACE VIEW "{nom}" AS {sql}'))
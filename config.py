@@ -16,11 +16,88 @@ INSTITUTION_FILE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWER
 
 METADATA_FILE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\Composante_Mention_Parcours_2025.xlsx"
 INSCRIPTION_FILE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\sortie_nettoyage\_UFALLTIME_DATAS.xlsx"
+# (peut aussi désigner un dossier de classeurs ou un motif glob, ex. r"...\inscriptions\*.xlsx" :
+#  un classeur par année / institution, lus dans l'ordre des noms de fichiers)
+
+# 📝 Dossier des feuilles de délibération (une colonne par EC, un fichier ou une feuille par parcours/semestre)
+NOTES_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\notes"
+
+# 📚 Maquettes : une ligne par EC (année, parcours, semestre, UE, crédits, EC, coefficient)
+MAQUETTES_FILE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\Maquettes.xlsx"
+
+# 👩‍🏫 Charges d'enseignement : feuilles "enseignants", "volumes" (une colonne d'heures par type)
+# et "attributions" (charges_enseignement.py)
+CHARGES_FILE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\Charges_Enseignement.xlsx"
+
+# 🔎 Rapport d'anomalies des sources (validation_sources.py) ; écrit en .csv s'il est volumineux
+VALIDATION_REPORT_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\anomalies_sources.xlsx"
+# ----------------------------------------
+
+# --- Validation des sources avant import ---
+# "rapport"  : contrôle des classeurs et rapport d'anomalies, l'import continue
+# "bloquant" : l'import s'arrête si une anomalie de gravité ERREUR est trouvée
+# None       : pas de validation (défaut : la validation relit tous les classeurs, à activer
+#              après un changement des sources ; sinon python validation_sources.py)
+VALIDATION_SOURCES = None
+
+# --- Mode d'ingestion des inscriptions ---
+# "sync"  : session psycopg2 unique (chemin historique)
+# "async" : lecture et écritures COPY/UPSERT en parallèle sur un pool asyncpg
+# "threads" : pipeline producteur/consommateurs (threads + pool psycopg2), historiques inclus
+# "shards" : un processus par classeur (dossier / motif glob), fusion des étudiants, historiques inclus
+INGESTION_MODE = "sync"
+
+# Pipeline "threads" : paquets en attente dans la file, et threads d'écriture
+# (chacun garde une connexion du pool : rester <= pool_size + max_overflow du moteur)
+PIPELINE_QUEUE_DEPTH = 4
+PIPELINE_CONSUMERS = 3
+
+# Mode "shards" : processus de lecture / écriture (None = nombre de cœurs)
+SHARD_WORKERS = None
+
+# Étapes de main.py exécutées en mode chargement en masse (database_setup.bulk_load) :
+# transaction unique, synchronous_commit=off, contraintes DEFERRABLE vérifiées à la fin
+# "metadata", "inscriptions" (mode "sync"), "historiques", "documents", "notes"
+BULK_LOAD_STAGES = set()
+# Suspendre puis reconstruire les index secondaires des tables chargées
+BULK_LOAD_REBUILD_INDEXES = False
+# ----------------------------------------
+
+# --- Schéma des tables volumineuses (choisi à la création de la base) ---
+# "texte"   : inscriptions / notes / resultats_* avec clés et FK texte (schéma historique)
+# "compact" : stockage en clés entières + vues de décodage du même nom (cles_compactes.py)
+SCHEMA_CLES = "texte"
+
+# --- Stockage des *_historique (choisi à la création de la base) ---
+# "annuel" : une ligne par entité et par année
+# "plages" : une ligne par période de validité, nouvelle ligne si code / libellé change
+#            + vues du même nom, une ligne par année (historique_plages.py)
+HISTORY_MODE = "annuel"
+
+# --- Journal des modifications (journal_modifications.py) ---
+# True : triggers de capture sur etudiants, inscriptions, parcours et *_historique, posés par
+# init_db ; chaque exécution de main.py est un run identifié dans le journal
+JOURNAL_MODIFICATIONS = False
 # ----------------------------------------
 
 # --- Chemins vers les dossiers de ressources statiques ---
 # 🖼️ Nouveau chemin pour le dossier des logos
 LOGO_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\db_sco\logo"
+
+# 🪪 Scans des étudiants : sous-dossiers photos/, cin/, bacc/ ; fichiers nommés <Etudiant_id>.<ext>
+DOCUMENTS_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\db_sco\documents"
+
+# 🗄️ Store adressé par contenu (logos, documents) : objets/ab/cd/<sha256>.ext + miniatures
+ASSET_STORE_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\db_sco\assets"
+
+# 📤 Dossier des extraits annuels (export_inscriptions.py)
+EXPORT_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\exports"
+
+# 🗃️ Archives annuelles en COPY binaire (archive_annee.py) : un sous-dossier par année
+ARCHIVE_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\archives"
+
+# 🦆 Miroir analytique DuckDB (analytics_mirror.py), copié sur le poste de l'analyste
+ANALYTICS_MIRROR_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY\analytics\miroir_scolarite.duckdb"
 # ----------------------------------------
 
 # --- URLs de Connexion (avec correction d'encodage) ---
@@ -29,5 +106,8 @@ LOGO_FOLDER_PATH = r"C:\Users\OCELOU\Desktop\UF_DSE_DRIVE\UF_datasets\POWERQUERY
 # URL pour la BDD cible
 DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?client_encoding=utf8"
 
+# URL asynchrone (asyncpg) pour le mode d'ingestion asyncio
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
 # URL pour la BDD par défaut (utile pour la création de la BDD cible)
 DEFAULT_DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/postgres?client_encoding=utf8"
\ No newline at end of file
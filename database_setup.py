@@ -1,12 +1,18 @@
 # database_setup.py
 
 import sys
-from sqlalchemy import create_engine
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
 
 import config
 from models import Base
+from cles_compactes import tables_a_creer, creer_vues, creer_restrictions
+import historique_plages
+import suivi_notes  # noqa: F401  (active le marquage des notes modifiées sur toutes les sessions)
+import journal_modifications  # noqa: F401  (pose le run d'import courant sur toutes les connexions)
 
 # --- Initialisation du moteur et de la session ---
 
@@ -26,6 +32,96 @@ def get_session():
     return SessionLocal()
 
 
+# --- Mode chargement en masse ---
+
+def _index_secondaires(conn, tables) -> list:
+    """(nom, définition) des index non uniques des tables (ni clé primaire, ni contrainte)."""
+    defs = []
+    for table in tables:
+        nom = getattr(table, "__tablename__", None) or getattr(table, "name", table)
+        defs.extend(conn.execute(text("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(:t) AND NOT x.indisunique AND NOT x.indisprimary
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        """), {"t": f'"{nom}"'}).all())
+    return defs
+
+
+@contextmanager
+def bulk_load(tables=(), rebuild_indexes=None):
+    """
+    Session de chargement en masse, sur une connexion dédiée et une transaction unique :
+      - synchronous_commit = off (pas d'attente du disque au COMMIT) ;
+      - autoflush et expire_on_commit désactivés ;
+      - clés étrangères (DEFERRABLE INITIALLY IMMEDIATE, cf. models.py) différées, vérifiées
+        au COMMIT final ; les contraintes d'unicité restent immédiates (arbitres ON CONFLICT) ;
+      - rebuild_indexes (défaut : config.BULK_LOAD_REBUILD_INDEXES) : index secondaires des
+        tables supprimés pendant le chargement et reconstruits à la sortie (DDL transactionnel :
+        restaurés tels quels en cas d'erreur).
+    Les session.commit() de l'importeur valident des points de sauvegarde ; tout est écrit
+    (ou annulé) au COMMIT final. Incompatible avec config.SCHEMA_CLES = "compact", dont la
+    résolution des clés lit la base hors de la transaction.
+    """
+    if config.SCHEMA_CLES == "compact":
+        raise RuntimeError("bulk_load n'est pas disponible en schéma compact (config.SCHEMA_CLES).")
+    if rebuild_indexes is None:
+        rebuild_indexes = config.BULK_LOAD_REBUILD_INDEXES
+
+    conn = engine.connect()
+    trans = conn.begin()
+    session = SessionLocal(bind=conn, autoflush=False, expire_on_commit=False,
+                           join_transaction_mode="create_savepoint")
+    try:
+        conn.execute(text("SET LOCAL synchronous_commit = off"))
+        conn.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+        index_defs = _index_secondaires(conn, tables) if rebuild_indexes else []
+        for nom, _ in index_defs:
+            conn.execute(text(f'DROP INDEX "{nom}"'))
+        if index_defs:
+            print(f"   🧱 {len(index_defs)} index secondaire(s) suspendu(s) pendant le chargement.")
+
+        yield session
+
+        session.commit()
+        conn.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+        for _, definition in index_defs:
+            conn.execute(text(definition))
+        trans.commit()
+    except Exception:
+        trans.rollback()
+        raise
+    finally:
+        session.close()
+        conn.close()
+
+
+def session_etape(etape, session, tables=()):
+    """
+    Contexte d'une étape de main.py : bulk_load si l'étape figure dans
+    config.BULK_LOAD_STAGES, sinon la session courante telle quelle.
+    """
+    if etape in config.BULK_LOAD_STAGES and config.SCHEMA_CLES != "compact":
+        print(f"   ⚡ Étape '{etape}' en mode chargement en masse.")
+        session.commit()  # aucun verrou gardé par la session courante pendant la transaction dédiée
+        return bulk_load(tables)
+    return nullcontext(session)
+
+
+def _differer_cles_etrangeres(conn) -> int:
+    """Bases créées avant le passage des FK en DEFERRABLE : contraintes modifiées sur place."""
+    noms = [t.name for t in Base.metadata.sorted_tables]
+    fks = conn.execute(text("""
+        SELECT c.conrelid::regclass::text, c.conname
+        FROM pg_constraint c
+        WHERE c.contype = 'f' AND NOT c.condeferrable
+          AND c.conrelid = ANY (SELECT to_regclass(quote_ident(n)) FROM unnest(CAST(:noms AS text[])) n)
+    """), {"noms": noms}).all()
+    for table, nom in fks:
+        conn.execute(text(f'ALTER TABLE {table} ALTER CONSTRAINT "{nom}" DEFERRABLE INITIALLY IMMEDIATE'))
+    return len(fks)
+
+
 def init_db():
     """Crée la base de données et les tables si elles n'existent pas."""
     print("--- 1. Initialisation de la Base de Données ---")
@@ -45,7 +141,20 @@ def init_db():
     # 2. Création des tables
     print("Création des tables (si elles n'existent pas)...")
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=engine, tables=historique_plages.tables_a_creer(tables_a_creer()))
+        if config.SCHEMA_CLES == "compact":
+            creer_vues(engine)
+            n = creer_restrictions(engine)
+            print(f"Schéma compact : vues de décodage créées, {n} table(s) cible(s) protégée(s).")
+        if config.HISTORY_MODE == "plages":
+            historique_plages.creer_vues(engine)
+            print("Historique par plages : vues annuelles créées.")
+        if config.JOURNAL_MODIFICATIONS:
+            journal_modifications.installer_journal(engine)
+        with engine.begin() as conn:
+            n = _differer_cles_etrangeres(conn)
+        if n:
+            print(f"{n} clé(s) étrangère(s) rendue(s) DEFERRABLE (chargement en masse).")
         print("Tables créées/vérifiées.")
     except Exception as e:
         print(f"❌ ERREUR: Impossible de créer les tables. Détail: {e}")
@@ -0,0 +1,166 @@
+# documents_etudiants.py
+#
+# Scans des étudiants (photo, CIN, relevé du bac) dans le store adressé par contenu.
+# Dossier source (config.DOCUMENTS_FOLDER_PATH), un sous-dossier par type de document,
+# fichiers nommés d'après l'Etudiant_id (sous-dossiers libres, ex. par année) :
+#   photos/2023/ETU0001234.jpg   cin/ETU0001234.pdf   bacc/ETU0001234.pdf
+
+import os
+from functools import lru_cache
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import config
+from models import Etudiant
+from asset_store import AssetStore
+from bulk_utils import DEFAULT_CHUNK_SIZE, frame_to_records
+from repository import invalider_cache
+
+# Sous-dossier -> colonne du modèle Etudiant
+DOCUMENT_TYPES = {
+    "photos": "Etudiant_photo_profil_path",
+    "cin": "Etudiant_scan_cin_path",
+    "bacc": "Etudiant_scan_releves_notes_bacc_path",
+}
+EXTENSIONS_DOCUMENT = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp", ".pdf"}
+
+# Miniatures rendues à la demande et gardées en mémoire (octets PNG)
+MINIATURES_CACHE = 4096
+TAILLE_MINIATURE = 256
+
+
+# ----------------------------
+# Scan des dossiers
+# ----------------------------
+def _iter_fichiers(dossier):
+    """Parcours récursif (os.scandir) : produit (Etudiant_id, chemin)."""
+    pile = [dossier]
+    while pile:
+        with os.scandir(pile.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pile.append(entry.path)
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() in EXTENSIONS_DOCUMENT and not entry.name.startswith("~$"):
+                    yield stem.strip(), entry.path
+
+
+def scanner_documents(racine) -> pd.DataFrame:
+    """Un tableau (type, colonne, Etudiant_id, source) pour tous les sous-dossiers connus."""
+    lignes = []
+    for sous_dossier, colonne in DOCUMENT_TYPES.items():
+        dossier = os.path.join(racine, sous_dossier)
+        if not os.path.isdir(dossier):
+            continue
+        lignes.extend((sous_dossier, colonne, eid, path) for eid, path in _iter_fichiers(dossier))
+    return pd.DataFrame(lignes, columns=["type", "colonne", "Etudiant_id", "source"])
+
+
+# ----------------------------
+# Miniatures paresseuses
+# ----------------------------
+@lru_cache(maxsize=None)
+def _store(racine) -> AssetStore:
+    """Store partagé par racine, ouvert au premier appel (une connexion SQLite, pas une par miniature)."""
+    return AssetStore(racine)
+
+
+@lru_cache(maxsize=MINIATURES_CACHE)
+def _miniature_png(store, rel, taille):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    digest = os.path.basename(rel).split(".")[0]
+    mini = store.abspath(store.miniature_path(digest, taille))
+    if not os.path.exists(mini) and store.miniatures(rel, (taille,)) == 0:
+        return None
+    with open(mini, "rb") as f:
+        return f.read()
+
+
+def miniature_document(rel, taille=TAILLE_MINIATURE, racine=None, store=None):
+    """
+    Miniature PNG (octets) d'un document stocké, créée sur disque au premier appel
+    puis servie depuis un cache LRU borné. None pour les formats non image (PDF).
+    store : AssetStore de l'appelant (défaut : store partagé de la racine).
+    """
+    if not rel or rel.lower().endswith(".pdf"):
+        return None
+    return _miniature_png(store or _store(racine or config.ASSET_STORE_PATH), rel, taille)
+
+
+def miniatures_cache_info():
+    return _miniature_png.cache_info()
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def import_documents_etudiants(session: Session, racine=None, workers=16):
+    """
+    Ingestion des scans : hachage (mmap pour les gros PDF) + copie dédupliquée sur un
+    pool de threads, puis mise à jour en masse des colonnes de chemin des étudiants
+    (uniquement les valeurs qui changent). Les miniatures ne sont pas calculées ici.
+    """
+    print("\n--- Importation Documents Étudiants ---")
+    racine = racine or config.DOCUMENTS_FOLDER_PATH
+    if not os.path.isdir(racine):
+        print(f"⚠️ Dossier des documents introuvable : {racine}")
+        return None
+
+    docs = scanner_documents(racine)
+    if docs.empty:
+        print("⚠️ Aucun document trouvé.")
+        return None
+
+    existants = pd.read_sql(
+        select(Etudiant.Etudiant_id, *[getattr(Etudiant, c) for c in DOCUMENT_TYPES.values()]),
+        session.connection()
+    ).set_index("Etudiant_id")
+
+    inconnus = ~docs["Etudiant_id"].isin(existants.index)
+    if inconnus.any():
+        print(f"   ℹ️ {int(inconnus.sum())} document(s) sans étudiant correspondant ignoré(s).")
+    docs = docs.loc[~inconnus]
+
+    store = AssetStore()
+    try:
+        resultats = pd.DataFrame(store.ingest_many(docs["source"].tolist(), workers=workers))
+    finally:
+        store.close()
+    docs = docs.assign(source=docs["source"].map(os.path.abspath)).merge(resultats, on="source")
+
+    erreurs = docs["chemin"].isna()
+    for r in docs.loc[erreurs].itertuples():
+        print(f"❌ [DOCUMENT] {r.source} : {r.statut}")
+    docs = docs.loc[~erreurs]
+
+    # Plusieurs fichiers pour un même (étudiant, type) : le dernier trié par chemin l'emporte
+    docs = docs.sort_values("source").drop_duplicates(["Etudiant_id", "colonne"], keep="last")
+    cible = docs.pivot(index="Etudiant_id", columns="colonne", values="chemin")
+
+    actuel = existants.reindex(index=cible.index, columns=cible.columns)
+    change = (cible.notna() & (cible != actuel)).any(axis=1)
+    maj = cible.loc[change].where(cible.loc[change].notna(), actuel.loc[change]).reset_index()
+
+    rows = frame_to_records(maj)
+    try:
+        for start in range(0, len(rows), DEFAULT_CHUNK_SIZE):
+            session.bulk_update_mappings(Etudiant, rows[start:start + DEFAULT_CHUNK_SIZE])
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [DOCUMENT] Erreur de mise à jour des étudiants : {e}")
+        return None
+
+    if rows:
+        invalider_cache("etudiants")
+
+    print(f"✅ {len(resultats)} documents traités {resultats['statut'].value_counts().to_dict()}, "
+          f"{len(rows)} étudiant(s) mis à jour.")
+    return docs
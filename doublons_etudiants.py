@@ -0,0 +1,251 @@
+# doublons_etudiants.py
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Etudiant, DoublonEtudiantCandidat
+from bulk_utils import bulk_upsert
+
+# Clés de blocage : deux étudiants ne sont comparés que s'ils partagent au moins une clé
+CLES_BLOCAGE = ["CIN", "BACC", "NOM_NAISSANCE", "NOM_PRENOM"]
+
+# Au-delà de cette taille un bloc n'est pas discriminant (nom très courant sans autre info) :
+# il est ignoré, ce qui borne le nombre de paires par étudiant (coût quasi linéaire).
+TAILLE_MAX_BLOC = 50
+
+# Poids des champs dans le score ; un champ absent d'un des deux côtés est neutre
+POIDS = {"cin": 0.30, "bacc": 0.20, "naissance": 0.20, "nom": 0.15, "prenoms": 0.15}
+# Part minimale des poids renseignée des deux côtés pour un score plein (sinon score réduit d'autant)
+COUVERTURE_MIN = 0.5
+# Score minimal d'une paire pour être proposée à la revue
+SEUIL_CANDIDAT = 0.70
+
+LONGUEUR_PHONETIQUE = 8
+
+# Réécritures phonétiques (appliquées dans l'ordre, sur des noms en majuscules sans accents)
+_PHONETIQUE = [
+    (r"PH", "F"),
+    (r"QU|CK|Q|C(?![EIY])", "K"),
+    (r"C", "S"),
+    (r"Z", "S"),
+    (r"W", "V"),
+    (r"Y", "I"),
+    (r"H", ""),
+]
+
+
+# ----------------------------
+# Normalisation vectorisée
+# ----------------------------
+def _normaliser(s: pd.Series) -> pd.Series:
+    """Majuscules, sans accents, lettres seulement, espaces simples. Vide -> NA."""
+    s = (
+        s.astype("string").str.upper()
+         .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+         .str.replace(r"[^A-Z ]", " ", regex=True)
+         .str.replace(r"\s+", " ", regex=True).str.strip()
+    )
+    return s.where(s != "")
+
+
+def _phonetique(s: pd.Series) -> pd.Series:
+    """Code phonétique : première lettre + consonnes, lettres répétées fusionnées, tronqué."""
+    # object : moteur re de Python (références arrière, assertions)
+    s = s.astype(object).str.replace(" ", "", regex=False)
+    for pattern, repl in _PHONETIQUE:
+        s = s.str.replace(pattern, repl, regex=True)
+    code = s.str[:1] + s.str[1:].str.replace(r"[AEIOU]", "", regex=True)
+    code = code.str.replace(r"(.)\1+", r"\1", regex=True).str[:LONGUEUR_PHONETIQUE]
+    return code.where(code != "").astype("string")
+
+
+def _chiffres(s: pd.Series, longueur_min: int) -> pd.Series:
+    s = s.astype("string").str.replace(r"\D", "", regex=True)
+    return s.where(s.str.len() >= longueur_min)
+
+
+def preparer_etudiants(etu: pd.DataFrame) -> pd.DataFrame:
+    """Attributs normalisés de comparaison, une ligne par étudiant (colonnes du modèle Etudiant en entrée)."""
+    out = pd.DataFrame({"id": etu["Etudiant_id"].astype(str).values})
+    out["nom"] = _normaliser(etu["Etudiant_nom"]).values
+    out["prenoms"] = _normaliser(etu["Etudiant_prenoms"]).values
+    out["nom_phon"] = _phonetique(out["nom"])
+    out["prenom1_phon"] = _phonetique(out["prenoms"].str.split(" ").str[0])
+    out["naissance"] = pd.to_datetime(etu["Etudiant_naissance_date"], errors="coerce").values
+    out["cin"] = _chiffres(etu["Etudiant_cin"], 8).values
+
+    bacc_num = etu["Etudiant_bacc_numero"].astype("string").str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+    bacc_an = pd.to_numeric(etu["Etudiant_bacc_annee"], errors="coerce").astype("Int64").astype("string")
+    bacc = (bacc_num + "/" + bacc_an).values
+    out["bacc"] = pd.Series(bacc, dtype="string").where(pd.Series(bacc_num.values).str.len() > 0)
+    return out
+
+
+# ----------------------------
+# Blocage
+# ----------------------------
+def _cles(att: pd.DataFrame) -> dict:
+    naissance = pd.Series(att["naissance"]).dt.strftime("%Y%m%d").astype("string")
+    return {
+        "CIN": att["cin"],
+        "BACC": att["bacc"],
+        "NOM_NAISSANCE": att["nom_phon"] + "|" + naissance,
+        "NOM_PRENOM": att["nom_phon"] + "|" + att["prenom1_phon"],
+    }
+
+
+def _paires_bloc(ids: pd.Series, cle: pd.Series, motif: str, taille_max: int):
+    """Paires (id_a < id_b) partageant la même valeur de clé, blocs trop grands exclus."""
+    b = pd.DataFrame({"id": ids, "cle": cle}).dropna()
+    taille = b.groupby("cle")["id"].transform("size")
+    ignores = b.loc[taille > taille_max, "cle"].nunique()
+    b = b[(taille > 1) & (taille <= taille_max)]
+
+    p = b.merge(b, on="cle", suffixes=("_a", "_b"))
+    p = p.loc[p["id_a"] < p["id_b"], ["id_a", "id_b"]]
+    p["motif"] = motif
+    return p, ignores
+
+
+def generer_paires(att: pd.DataFrame, taille_max: int = TAILLE_MAX_BLOC) -> pd.DataFrame:
+    """Union des paires de toutes les clés de blocage ; motifs = clés partagées (ex. 'CIN,NOM_NAISSANCE')."""
+    frames = []
+    for bit, (motif, cle) in enumerate(_cles(att).items()):
+        p, ignores = _paires_bloc(att["id"], cle, motif, taille_max)
+        if ignores:
+            print(f"   ℹ️ [{motif}] {ignores} bloc(s) de plus de {taille_max} étudiants ignoré(s).")
+        frames.append(p.assign(masque=1 << bit).drop(columns="motif"))
+
+    # Une paire n'apparaît qu'une fois par clé : la somme des bits vaut leur union
+    paires = pd.concat(frames, ignore_index=True).groupby(["id_a", "id_b"], sort=False)["masque"].sum()
+    libelles = {m: ",".join(c for i, c in enumerate(CLES_BLOCAGE) if m >> i & 1)
+                for m in range(1 << len(CLES_BLOCAGE))}
+    return pd.DataFrame({
+        "id_a": paires.index.get_level_values(0),
+        "id_b": paires.index.get_level_values(1),
+        "motif": paires.map(libelles).values,
+    })
+
+
+# ----------------------------
+# Score vectorisé
+# ----------------------------
+def _egal(a, b):
+    """1.0 si égaux, 0.0 sinon, NaN si l'un des deux manque."""
+    sim = (a == b).astype(float)
+    return sim.where(a.notna() & b.notna())
+
+
+def scorer_paires(paires: pd.DataFrame, att: pd.DataFrame) -> pd.DataFrame:
+    """Ajoute une similarité par champ puis le score pondéré (0..1) à chaque paire."""
+    att = att.set_index("id")
+    a = att.reindex(paires["id_a"]).reset_index(drop=True)
+    b = att.reindex(paires["id_b"]).reset_index(drop=True)
+
+    sims = pd.DataFrame(index=paires.index)
+    sims["cin"] = _egal(a["cin"], b["cin"]).values
+    sims["bacc"] = _egal(a["bacc"], b["bacc"]).values
+
+    # Naissance : jour/mois inversés ou même année seulement comptent partiellement
+    na, nb = a["naissance"], b["naissance"]
+    inverse = (na.dt.year == nb.dt.year) & (na.dt.month == nb.dt.day) & (na.dt.day == nb.dt.month)
+    sim_n = np.select([na == nb, inverse, na.dt.year == nb.dt.year], [1.0, 0.7, 0.3], default=0.0)
+    sims["naissance"] = pd.Series(sim_n).where((na.notna() & nb.notna()).values).values
+
+    sims["nom"] = np.select(
+        [(a["nom"] == b["nom"]).fillna(False), (a["nom_phon"] == b["nom_phon"]).fillna(False)],
+        [1.0, 0.8], default=0.0)
+    sims["nom"] = sims["nom"].where((a["nom"].notna() & b["nom"].notna()).values)
+
+    sims["prenoms"] = np.select(
+        [(a["prenoms"] == b["prenoms"]).fillna(False), (a["prenom1_phon"] == b["prenom1_phon"]).fillna(False)],
+        [1.0, 0.7], default=0.0)
+    sims["prenoms"] = sims["prenoms"].where((a["prenoms"].notna() & b["prenoms"].notna()).values)
+
+    poids = pd.Series(POIDS)
+    renseigne = sims[poids.index].notna().mul(poids).sum(axis=1)
+    pondere = sims[poids.index].fillna(0).mul(poids).sum(axis=1)
+    moyenne = (pondere / renseigne.where(renseigne > 0)).fillna(0)
+
+    out = paires.copy()
+    out["score"] = (moyenne * (renseigne / COUVERTURE_MIN).clip(upper=1)).round(3)
+    return pd.concat([out, sims.add_prefix("sim_")], axis=1)
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def _load_etudiants(session: Session) -> pd.DataFrame:
+    stmt = select(
+        Etudiant.Etudiant_id, Etudiant.Etudiant_nom, Etudiant.Etudiant_prenoms,
+        Etudiant.Etudiant_naissance_date, Etudiant.Etudiant_cin,
+        Etudiant.Etudiant_bacc_numero, Etudiant.Etudiant_bacc_annee
+    )
+    return pd.read_sql(stmt, session.connection())
+
+
+def detecter_candidats(etu: pd.DataFrame, seuil: float = SEUIL_CANDIDAT,
+                       taille_max: int = TAILLE_MAX_BLOC) -> pd.DataFrame:
+    """Blocage + score sur un DataFrame d'étudiants ; retourne les paires au-dessus du seuil."""
+    att = preparer_etudiants(etu)
+    paires = generer_paires(att, taille_max)
+    if paires.empty:
+        return paires.assign(score=pd.Series(dtype=float))
+    scores = scorer_paires(paires, att)
+    return scores[scores["score"] >= seuil].sort_values("score", ascending=False).reset_index(drop=True)
+
+
+def detecter_doublons_etudiants(session: Session, seuil: float = SEUIL_CANDIDAT):
+    """
+    Détecte les étudiants probablement identiques sous plusieurs Etudiant_id et écrit
+    les paires candidates dans doublons_etudiants_candidats (revue manuelle).
+    Une paire déjà revue garde son statut ; seuls score, motifs et date sont mis à jour.
+    """
+    print("\n--- Détection des doublons d'étudiants ---")
+
+    etu = _load_etudiants(session)
+    candidats = detecter_candidats(etu, seuil)
+    print(f"🔎 {len(etu)} étudiants, {len(candidats)} paire(s) candidate(s) (score ≥ {seuil}).")
+
+    if candidats.empty:
+        return candidats
+
+    rows = pd.DataFrame({
+        "Etudiant_id_a": candidats["id_a"],
+        "Etudiant_id_b": candidats["id_b"],
+        "DoublonEtudiantCandidat_score": candidats["score"],
+        "DoublonEtudiantCandidat_motifs": candidats["motif"],
+        "DoublonEtudiantCandidat_statut": "A_VERIFIER",
+        "DoublonEtudiantCandidat_date_detection": date.today(),
+    })
+    try:
+        bulk_upsert(session, DoublonEtudiantCandidat, rows,
+                    update_cols=["DoublonEtudiantCandidat_score", "DoublonEtudiantCandidat_motifs",
+                                 "DoublonEtudiantCandidat_date_detection"])
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [DOUBLONS] Erreur d'écriture des candidats : {e}")
+        return None
+
+    print("✅ Candidats écrits dans doublons_etudiants_candidats.")
+    return candidats
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Détection des doublons d'étudiants")
+    parser.add_argument("--seuil", type=float, default=SEUIL_CANDIDAT)
+    args = parser.parse_args()
+
+    db = get_session()
+    try:
+        detecter_doublons_etudiants(db, seuil=args.seuil)
+    finally:
+        db.close()
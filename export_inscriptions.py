@@ -0,0 +1,212 @@
+# export_inscriptions.py
+#
+# Extraits annuels Étudiants x Inscriptions x Parcours x Semestres, écrits en flux :
+# - CSV : COPY (SELECT ...) TO STDOUT directement dans le fichier ;
+# - Parquet : curseur côté serveur, un row group par paquet de lignes.
+# La mémoire utilisée ne dépend pas du volume exporté.
+#
+#   python export_inscriptions.py --annee 2022-2023 2023-2024 --format parquet --workers 2
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import select, Boolean, Date, Integer, Numeric
+from sqlalchemy.dialects import postgresql
+
+import config
+from database_setup import engine
+from models import (
+    Etudiant, Inscription, Parcours, Semestre, AnneeUniversitaire,
+    Mention, Composante, Institution, ModeInscription
+)
+
+# Lignes par row group Parquet / par aller-retour du curseur serveur
+BATCH_SIZE = 50_000
+
+# Colonnes exportées (l'ordre est celui du fichier)
+EXPORT_COLUMNS = [
+    AnneeUniversitaire.AnneeUniversitaire_annee,
+    Institution.Institution_code,
+    Composante.Composante_code,
+    Mention.Mention_code,
+    Parcours.Parcours_code,
+    Parcours.Parcours_label,
+    Semestre.Semestre_code,
+    Semestre.Semestre_numero,
+    ModeInscription.ModeInscription_code,
+    Inscription.Inscription_id,
+    Inscription.Inscription_date,
+    Inscription.Inscription_credit_acquis_semestre,
+    Inscription.Inscription_is_semestre_valide,
+    Etudiant.Etudiant_id,
+    Etudiant.Etudiant_numero_inscription,
+    Etudiant.Etudiant_nom,
+    Etudiant.Etudiant_prenoms,
+    Etudiant.Etudiant_sexe,
+    Etudiant.Etudiant_naissance_date,
+    Etudiant.Etudiant_naissance_lieu,
+    Etudiant.Etudiant_nationalite,
+    Etudiant.Etudiant_bacc_annee,
+    Etudiant.Etudiant_bacc_serie,
+    Etudiant.Etudiant_bacc_mention,
+]
+
+
+# ----------------------------
+# Requête
+# ----------------------------
+def build_export_query(annee=None, institution=None):
+    """Jointure Inscription -> Etudiant / Parcours / Semestre / Année (/ Institution), filtrée."""
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .select_from(Inscription)
+        .join(Etudiant, Inscription.Etudiant_id_fk == Etudiant.Etudiant_id)
+        .join(AnneeUniversitaire, Inscription.AnneeUniversitaire_id_fk == AnneeUniversitaire.AnneeUniversitaire_id)
+        .join(Parcours, Inscription.Parcours_id_fk == Parcours.Parcours_id)
+        .join(Semestre, Inscription.Semestre_id_fk == Semestre.Semestre_id)
+        .join(Mention, Parcours.Mention_id_fk == Mention.Mention_id)
+        .join(Composante, Mention.Composante_id_fk == Composante.Composante_id)
+        .join(Institution, Composante.Institution_id_fk == Institution.Institution_id)
+        .outerjoin(ModeInscription, Inscription.ModeInscription_id_fk == ModeInscription.ModeInscription_id)
+        .order_by(Parcours.Parcours_code, Semestre.Semestre_code, Inscription.Inscription_id)
+    )
+    if annee:
+        stmt = stmt.where(AnneeUniversitaire.AnneeUniversitaire_annee == annee)
+    if institution:
+        stmt = stmt.where(Institution.Institution_code == institution)
+    return stmt
+
+
+def _compile_sql(stmt) -> str:
+    """SQL littéral (COPY n'accepte pas de paramètres liés)."""
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _export_path(dossier, annee, institution, fmt):
+    parts = ["inscriptions", annee or "toutes_annees"]
+    if institution:
+        parts.append(institution)
+    return os.path.join(dossier, "_".join(parts) + f".{fmt}")
+
+
+# ----------------------------
+# Écrivains
+# ----------------------------
+def _export_csv(stmt, path) -> int:
+    """COPY ... TO STDOUT : PostgreSQL produit le CSV, psycopg2 l'écrit au fil de l'eau."""
+    sql = f"COPY ({_compile_sql(stmt)}) TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')"
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur, open(path, "w", encoding="utf-8", newline="") as f:
+            cur.copy_expert(sql, f)
+            n = cur.rowcount
+        raw.commit()
+    finally:
+        raw.close()
+    return n
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    def _type(col):
+        if isinstance(col.type, Date):
+            return pa.date32()
+        if isinstance(col.type, Boolean):
+            return pa.bool_()
+        if isinstance(col.type, Integer):
+            return pa.int64()
+        if isinstance(col.type, Numeric):
+            return pa.float64()
+        return pa.string()
+
+    return pa.schema([(c.key, _type(c)) for c in EXPORT_COLUMNS])
+
+
+def _export_parquet(stmt, path, batch_size=BATCH_SIZE) -> int:
+    """Curseur serveur (stream_results) : un paquet en mémoire à la fois, écrit en row group."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow est requis pour l'export Parquet (pip install pyarrow)")
+
+    schema = _arrow_schema()
+    names = schema.names
+    n = 0
+    with engine.connect() as conn, pq.ParquetWriter(path, schema, compression="snappy") as writer:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for rows in result.partitions(batch_size):
+            columns = list(zip(*rows))
+            batch = pa.Table.from_arrays(
+                [pa.array(columns[i], type=schema.field(i).type) for i in range(len(names))],
+                schema=schema,
+            )
+            writer.write_table(batch)
+            n += len(rows)
+    return n
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def exporter_inscriptions(annee=None, institution=None, fmt="parquet", dossier=None,
+                          batch_size=BATCH_SIZE) -> dict:
+    """Exporte un extrait (année et/ou institution) ; retourne {fichier, lignes, secondes}."""
+    dossier = dossier or config.EXPORT_FOLDER_PATH
+    os.makedirs(dossier, exist_ok=True)
+    path = _export_path(dossier, annee, institution, fmt)
+    stmt = build_export_query(annee, institution)
+
+    t0 = time.perf_counter()
+    if fmt == "csv":
+        n = _export_csv(stmt, path)
+    elif fmt == "parquet":
+        n = _export_parquet(stmt, path, batch_size)
+    else:
+        raise ValueError(f"Format d'export inconnu : {fmt} (csv / parquet)")
+    return {"fichier": path, "lignes": n, "secondes": time.perf_counter() - t0}
+
+
+def _annees_disponibles():
+    with engine.connect() as conn:
+        return [a for (a,) in conn.execute(
+            select(AnneeUniversitaire.AnneeUniversitaire_annee).order_by(AnneeUniversitaire.AnneeUniversitaire_ordre)
+        )]
+
+
+def exporter_annees(annees=None, institution=None, fmt="parquet", dossier=None, workers=2) -> list:
+    """
+    Un fichier par année, plusieurs années en parallèle (une connexion par année en cours).
+    annees=None : toutes les années de la table annees_universitaires.
+    """
+    annees = annees or _annees_disponibles()
+    print(f"\n--- Export des inscriptions ({fmt}) : {len(annees)} année(s), {workers} en parallèle ---")
+
+    rapports = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(exporter_inscriptions, a, institution, fmt, dossier): a for a in annees}
+        for fut in as_completed(futures):
+            annee = futures[fut]
+            try:
+                r = fut.result()
+                rapports.append(r)
+                print(f"   ✅ {annee} : {r['lignes']} lignes -> {r['fichier']} ({r['secondes']:.1f}s)")
+            except Exception as e:
+                print(f"   ❌ {annee} : {e}")
+    return rapports
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export des étudiants / inscriptions (CSV ou Parquet)")
+    parser.add_argument("--annee", nargs="*", help="Années universitaires (défaut : toutes)")
+    parser.add_argument("--institution", help="Code institution")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="parquet")
+    parser.add_argument("--dossier", default=None, help="Dossier de sortie (défaut : config.EXPORT_FOLDER_PATH)")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    exporter_annees(args.annee, args.institution, args.format, args.dossier, args.workers)
@@ -1,8 +1,9 @@
 import pandas as pd
 from sqlalchemy.orm import Session
+from repository import invalider_cache
 from models import (
     Cycle, Niveau, Semestre, ModeInscription,
-    SessionExamen, TypeFormation, AnneeUniversitaire
+    SessionExamen, TypeFormation, TypeEnseignement, AnneeUniversitaire
 )
 
 # -------------------------------
@@ -12,7 +13,7 @@ def _generate_id(prefix: str, index: int) -> str:
     length_map = {
         'INST': 4, 'DOMA': 2, 'COMP': 4, 'MENT': 6, 'PARC': 7,
         'CYCL': 1, 'NIVE': 2, 'SEME': 2, 'SESS': 1,
-        'TYPE': 2, 'ANNE': 4, 'MODE': 3,
+        'TYPE': 2, 'ANNE': 4, 'MODE': 3, 'TENS': 2,
     }
 
     format_length = length_map[prefix]
@@ -117,6 +118,15 @@ def import_fixed_references(session: Session, start_year=2021, end_year=2026):
             TypeFormation_description=d
         ))
 
+    # 5 bis. Types d'enseignement (volumes horaires, attributions)
+    types_enseignement = [('CM', 'Cours Magistral'), ('TD', 'Travaux Dirigés'), ('TP', 'Travaux Pratiques')]
+    for i, (c, l) in enumerate(types_enseignement, start=1):
+        session.merge(TypeEnseignement(
+            TypeEnseignement_id=_generate_id("TENS", i),
+            TypeEnseignement_code=c,
+            TypeEnseignement_label=l
+        ))
+
     # 6. Années universitaires
     for i, a in enumerate(_generate_annee_data(start_year, end_year), start=1):
         session.merge(AnneeUniversitaire(
@@ -127,4 +137,5 @@ def import_fixed_references(session: Session, start_year=2021, end_year=2026):
         ))
 
     session.commit()
+    invalider_cache("structure")
     print("✅ Données fixes importées.")
@@ -0,0 +1,243 @@
+# historique_plages.py
+#
+# Mode d'historique "plages" (config.HISTORY_MODE = "plages") pour institutions_historique,
+# composantes_historique, mentions_historique et parcours_historique :
+#   - stockage dans *_historique_plages : une ligne par période de validité, bornes
+#     AnneeUniversitaire_ordre incluses ; des années consécutives avec les mêmes valeurs
+#     (code, libellé...) tiennent en une seule ligne ;
+#   - les noms d'origine deviennent des vues qui redonnent une ligne par année : les
+#     lectures existantes restent inchangées ;
+#   - bulk_upsert sur un modèle historique est redirigé vers ecrire_plages, qui fusionne
+#     les années reçues avec les plages en base et n'écrit que les plages modifiées ;
+#   - historique_a / libelle_a : valeurs en vigueur une année donnée (dans les deux modes).
+# Le mode se choisit à la création de la base (init_db).
+
+import pandas as pd
+from sqlalchemy import delete, inspect, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+
+import config
+from models import (
+    AnneeUniversitaire,
+    InstitutionHistorique, ComposanteHistorique, MentionHistorique, ParcoursHistorique,
+    InstitutionHistoriquePlage, ComposanteHistoriquePlage, MentionHistoriquePlage, ParcoursHistoriquePlage
+)
+from bulk_utils import DEFAULT_CHUNK_SIZE, bulk_upsert, frame_to_records
+
+# Modèle annuel -> modèle par plages
+PLAGES = {
+    InstitutionHistorique: InstitutionHistoriquePlage,
+    ComposanteHistorique: ComposanteHistoriquePlage,
+    MentionHistorique: MentionHistoriquePlage,
+    ParcoursHistorique: ParcoursHistoriquePlage,
+}
+
+ANNEE = "AnneeUniversitaire_id_fk"
+DEBUT = "AnneeUniversitaire_debut_ordre"
+FIN = "AnneeUniversitaire_fin_ordre"
+
+
+def actif() -> bool:
+    return config.HISTORY_MODE == "plages"
+
+
+def colonne_entite(model) -> str:
+    """FK de l'entité historisée (Institution_id_fk, Parcours_id_fk...)."""
+    return next(c.name for c in model.__table__.primary_key.columns if c.name != ANNEE)
+
+
+def colonnes_valeurs(model) -> list:
+    return [c.name for c in model.__table__.columns if not c.primary_key]
+
+
+def colonne_libelle(model) -> str:
+    return next(c for c in colonnes_valeurs(model) if c.endswith(("_nom_historique", "_label_historique")))
+
+
+# ----------------------------
+# Années <-> plages
+# ----------------------------
+def _annees(bind) -> pd.DataFrame:
+    """(ID d'année, ordre, rang) ; deux années sont consécutives si leurs rangs se suivent."""
+    a = AnneeUniversitaire.__table__
+    rows = bind.execute(
+        select(a.c.AnneeUniversitaire_id, a.c.AnneeUniversitaire_ordre).order_by(a.c.AnneeUniversitaire_ordre)
+    ).all()
+    df = pd.DataFrame(rows, columns=[ANNEE, "ordre"])
+    df["rang"] = range(len(df))
+    return df
+
+
+def compresser(annuel: pd.DataFrame, ent_col, val_cols, annees) -> pd.DataFrame:
+    """
+    Lignes (entité, année, valeurs) -> plages : une nouvelle plage commence à chaque
+    changement d'entité ou de valeurs, et après une année sans ligne pour l'entité.
+    """
+    df = annuel.merge(annees, on=ANNEE).sort_values([ent_col, "rang"]).reset_index(drop=True)
+    if df.empty:
+        return pd.DataFrame(columns=[ent_col, DEBUT, FIN] + val_cols)
+    valeurs = df[val_cols].astype(object).where(df[val_cols].notna(), "\x00").astype(str).agg("\x1f".join, axis=1)
+    suite = (
+        df[ent_col].eq(df[ent_col].shift())
+        & df["rang"].eq(df["rang"].shift() + 1)
+        & valeurs.eq(valeurs.shift())
+    )
+    plage = (~suite).cumsum()
+    out = df.groupby(plage, sort=False).agg(
+        **{ent_col: (ent_col, "first"), DEBUT: ("ordre", "min"), FIN: ("ordre", "max")},
+        **{c: (c, "first") for c in val_cols},
+    )
+    return out.reset_index(drop=True)
+
+
+def deplier(plages: pd.DataFrame, ent_col, val_cols, annees) -> pd.DataFrame:
+    """Inverse de compresser : une ligne par (entité, année) couverte par une plage."""
+    if plages.empty:
+        return pd.DataFrame(columns=[ent_col, ANNEE] + val_cols)
+    df = plages.merge(annees[[ANNEE, "ordre"]], how="cross")
+    df = df[(df["ordre"] >= df[DEBUT]) & (df["ordre"] <= df[FIN])]
+    return df[[ent_col, ANNEE] + val_cols].reset_index(drop=True)
+
+
+def _cles_plages(df, cols) -> set:
+    return {tuple(r) for r in df[cols].astype(object).where(df[cols].notna(), None).itertuples(index=False)}
+
+
+# ----------------------------
+# Écriture (redirection de bulk_upsert)
+# ----------------------------
+def diff_plages(model, existantes: pd.DataFrame, rows: pd.DataFrame, annees) -> tuple:
+    """
+    Plages à supprimer [(entité, début)] et à insérer (DataFrame) pour intégrer les lignes
+    annuelles rows aux plages existantes des mêmes entités.
+    """
+    ent_col, val_cols = colonne_entite(model), colonnes_valeurs(model)
+    fournies = [c for c in val_cols if c in rows.columns]
+    cles = [ent_col, ANNEE]
+
+    nouveau = rows.drop_duplicates(subset=cles, keep="last").set_index(cles)
+    annuel = deplier(existantes, ent_col, val_cols, annees).set_index(cles)
+    annuel = annuel.reindex(annuel.index.union(nouveau.index)).reindex(columns=val_cols).astype(object)
+    annuel.loc[nouveau.index, fournies] = nouveau[fournies].astype(object)
+    cibles = compresser(annuel.reset_index(), ent_col, val_cols, annees)
+
+    cols = [ent_col, DEBUT, FIN] + val_cols
+    avant, apres = _cles_plages(existantes, cols), _cles_plages(cibles, cols)
+    a_supprimer = sorted((p[0], p[1]) for p in avant - apres)
+    a_inserer = pd.DataFrame(sorted(apres - avant, key=lambda p: (p[0], p[1])), columns=cols)
+    return a_supprimer, a_inserer
+
+
+def ecrire_plages(bind, model, rows) -> int:
+    """
+    Équivalent de bulk_upsert(model, rows) en mode plages : les lignes annuelles reçues
+    remplacent celles des mêmes (entité, année), colonnes absentes conservées ; seules les
+    plages qui changent sont supprimées / insérées (réimport sans changement : aucune écriture).
+    Verrou consultatif par table jusqu'à la fin de la transaction (écrivains concurrents
+    du pipeline).
+    """
+    if not isinstance(rows, pd.DataFrame):
+        rows = pd.DataFrame(rows)
+    if rows.empty:
+        return 0
+    plage_model = PLAGES[model]
+    table = plage_model.__table__
+    ent_col = colonne_entite(model)
+
+    bind.execute(text("SELECT pg_advisory_xact_lock(hashtext(:t))"), {"t": table.name})
+    annees = _annees(bind)
+
+    entites = rows[ent_col].dropna().unique().tolist()
+    existantes = []
+    for start in range(0, len(entites), DEFAULT_CHUNK_SIZE):
+        existantes.extend(bind.execute(
+            select(table).where(table.c[ent_col].in_(entites[start:start + DEFAULT_CHUNK_SIZE]))
+        ).mappings().all())
+    existantes = pd.DataFrame(existantes, columns=[c.name for c in table.columns])
+
+    a_supprimer, a_inserer = diff_plages(model, existantes, rows, annees)
+
+    pk = tuple_(table.c[ent_col], table.c[DEBUT])
+    for start in range(0, len(a_supprimer), DEFAULT_CHUNK_SIZE):
+        bind.execute(delete(table).where(pk.in_(a_supprimer[start:start + DEFAULT_CHUNK_SIZE])))
+    bulk_upsert(bind, plage_model, frame_to_records(a_inserer))
+    return len(rows.drop_duplicates(subset=[ent_col, ANNEE]))
+
+
+# ----------------------------
+# Lecture "en vigueur l'année X"
+# ----------------------------
+def _ordre(bind, annee) -> int:
+    """Ordre d'une année désignée par son libellé (2023-2024) ou son ID."""
+    a = AnneeUniversitaire.__table__
+    ordre = bind.execute(
+        select(a.c.AnneeUniversitaire_ordre)
+        .where((a.c.AnneeUniversitaire_annee == annee) | (a.c.AnneeUniversitaire_id == annee))
+    ).scalar()
+    if ordre is None:
+        raise ValueError(f"Année universitaire inconnue : {annee}")
+    return ordre
+
+
+def historique_a(bind, model, annee, entites=None) -> dict:
+    """
+    {ID entité: {colonne: valeur}} en vigueur l'année donnée, pour toutes les entités ou
+    la liste fournie. Mode plages : parcours de la clé primaire (entité, début <= ordre)
+    puis contrôle de la fin ; mode annuel : lecture directe de la ligne de l'année.
+    """
+    ent_col, val_cols = colonne_entite(model), colonnes_valeurs(model)
+    if actif():
+        t = PLAGES[model].__table__
+        o = _ordre(bind, annee)
+        stmt = select(t.c[ent_col], *[t.c[c] for c in val_cols]).where(t.c[DEBUT] <= o, t.c[FIN] >= o)
+    else:
+        t = model.__table__
+        a = AnneeUniversitaire.__table__
+        stmt = (
+            select(t.c[ent_col], *[t.c[c] for c in val_cols])
+            .join(a, a.c.AnneeUniversitaire_id == t.c[ANNEE])
+            .where((a.c.AnneeUniversitaire_annee == annee) | (a.c.AnneeUniversitaire_id == annee))
+        )
+    if entites is not None:
+        stmt = stmt.where(t.c[ent_col].in_(list(entites)))
+    return {r[ent_col]: {c: r[c] for c in val_cols} for r in bind.execute(stmt).mappings()}
+
+
+def libelle_a(bind, model, entite_id, annee):
+    """Libellé (nom / label historique) d'une entité l'année donnée ; None si absent."""
+    valeurs = historique_a(bind, model, annee, [entite_id]).get(entite_id)
+    return valeurs[colonne_libelle(model)] if valeurs else None
+
+
+# ----------------------------
+# Création du schéma
+# ----------------------------
+def tables_a_creer(tables) -> list:
+    """Filtre une liste de tables pour create_all selon le mode (annuel : sans les tables de plages)."""
+    plages = {m.__table__ for m in PLAGES.values()}
+    annuelles = {m.__table__ for m in PLAGES}
+    exclues = annuelles if actif() else plages
+    return [t for t in tables if t not in exclues]
+
+
+def _vue(model):
+    """Une ligne par (entité, année couverte) : mêmes noms et ordre de colonnes que la table annuelle."""
+    p = PLAGES[model].__table__
+    a = AnneeUniversitaire.__table__
+    cols = [a.c.AnneeUniversitaire_id.label(ANNEE) if c.name == ANNEE else p.c[c.name]
+            for c in model.__table__.columns]
+    return select(*cols).select_from(
+        p.join(a, a.c.AnneeUniversitaire_ordre.between(p.c[DEBUT], p.c[FIN]))
+    )
+
+
+def creer_vues(engine):
+    """Vues *_historique au-dessus des tables de plages."""
+    existantes = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for model in PLAGES:
+            nom = model.__tablename__
+            if nom in existantes:
+                raise RuntimeError(f"La table '{nom}' existe déjà : base créée en mode d'historique annuel.")
+            sql = _vue(model).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            conn.execute(text(f'CREATE OR REPLACE VIEW "{nom}" AS {sql}'))
@@ -1,7 +1,7 @@
+import os
 import pandas as pd
 import sys
 from sqlalchemy.orm import Session
-from tqdm import tqdm
 
 import config
 from models import (
@@ -9,33 +9,77 @@ from models import (
     InstitutionHistorique, ComposanteHistorique, MentionHistorique, ParcoursHistorique
 )
 from metadata_import import safe_string
+from bulk_utils import bulk_upsert
+from inscriptions_import import lister_sources
 
-def _load_excel_distinct(columns_needed):
+def _load_excel_distinct(columns_needed, path=None):
     """
-    Charge le fichier Excel en ne gardant que les colonnes nécessaires (incluant l'année)
-    et retourne un DataFrame nettoyé.
+    Charge le(s) fichier(s) Excel en ne gardant que les colonnes nécessaires (incluant l'année)
+    et retourne un DataFrame nettoyé. path : classeur, dossier ou motif glob.
     """
     try:
-        df_empty = pd.read_excel(config.INSCRIPTION_FILE_PATH, nrows=0)
-        file_cols = [c.lower().replace(' ', '_') for c in df_empty.columns]
-        
-        cols_to_load = [col for col in columns_needed if col in file_cols]
-        
-        # Ajout de la colonne année qui est toujours nécessaire
-        if 'anneeuniversitaire_annee' not in cols_to_load and 'anneeuniversitaire_annee' in file_cols:
-            cols_to_load.append('anneeuniversitaire_annee')
-
-        print(f"   📊 Colonnes chargées pour l'historique : {cols_to_load}")
-
-        df = pd.read_excel(config.INSCRIPTION_FILE_PATH, usecols=lambda x: x.lower().replace(' ', '_') in cols_to_load)
-        df.columns = df.columns.str.lower().str.replace(' ', '_')
-        
+        frames = []
+        for fichier in lister_sources(path or config.INSCRIPTION_FILE_PATH):
+            df_empty = pd.read_excel(fichier, nrows=0)
+            file_cols = [c.lower().replace(' ', '_') for c in df_empty.columns]
+
+            cols_to_load = [col for col in columns_needed if col in file_cols]
+
+            # Ajout de la colonne année qui est toujours nécessaire
+            if 'anneeuniversitaire_annee' not in cols_to_load and 'anneeuniversitaire_annee' in file_cols:
+                cols_to_load.append('anneeuniversitaire_annee')
+
+            print(f"   📊 Colonnes chargées pour l'historique ({os.path.basename(fichier)}) : {cols_to_load}")
+
+            df = pd.read_excel(fichier, usecols=lambda x: x.lower().replace(' ', '_') in cols_to_load)
+            df.columns = df.columns.str.lower().str.replace(' ', '_')
+            frames.append(df)
+
+        df = pd.concat(frames, ignore_index=True)
         df = df.where(pd.notnull(df), None)
         return df
     except Exception as e:
         print(f"⚠️ Impossible de lire le fichier Excel pour l'historique : {e}")
         return None
 
+# Définition des entités historisées
+# 'canonical_label_attr' cible le bon champ dans models.py
+ENTITIES_CONFIG = [
+    {
+        'type': 'INST', 'code_col': 'institution_code', 
+        'map_id': 'INST_ID', 'map_obj': 'INST_OBJ', 
+        'orm_class': InstitutionHistorique, 'fk_field': 'Institution_id_fk', 
+        'label_field': 'Institution_nom_historique', 'code_hist_field': 'Institution_code_historique',
+        'label_source_col': 'institution_nom', # Priorité Excel
+        'canonical_label_attr': 'Institution_nom' # Fallback DB
+    },
+    {
+        'type': 'COMP', 'code_col': 'composante_code', 
+        'map_id': 'COMP_ID', 'map_obj': 'COMP_OBJ', 
+        'orm_class': ComposanteHistorique, 'fk_field': 'Composante_id_fk', 
+        'label_field': 'Composante_label_historique', 'code_hist_field': 'Composante_code_historique',
+        'label_source_col': None, 
+        'canonical_label_attr': 'Composante_label' # <-- CORRECTION : Nom exact dans models.py
+    },
+    {
+        'type': 'MENT', 'code_col': 'mention_code', 
+        'map_id': 'MENT_ID', 'map_obj': 'MENT_OBJ', 
+        'orm_class': MentionHistorique, 'fk_field': 'Mention_id_fk', 
+        'label_field': 'Mention_label_historique', 'code_hist_field': 'Mention_code_historique',
+        'label_source_col': None,
+        'canonical_label_attr': 'Mention_label' # <-- CORRECTION : Nom exact dans models.py
+    },
+    {
+        'type': 'PARC', 'code_col': 'parcours_code', 
+        'map_id': 'PARC_ID', 'map_obj': 'PARC_OBJ', 
+        'orm_class': ParcoursHistorique, 'fk_field': 'Parcours_id_fk', 
+        'label_field': 'Parcours_label_historique', 'code_hist_field': 'Parcours_code_historique',
+        'label_source_col': None,
+        'canonical_label_attr': 'Parcours_label' # <-- CORRECTION : Nom exact dans models.py
+    }
+]
+
+
 def _get_mappings(session: Session):
     """
     Récupère les mappings ID (Code -> ID) et les objets canoniques (Code -> Objet ORM)
@@ -57,7 +101,46 @@ def _get_mappings(session: Session):
     }
 
 
-def import_history_from_excel(session: Session):
+def _add_mention_code(df: pd.DataFrame) -> pd.DataFrame:
+    """mention_code = composante_code + '_' + mention_abbreviation (calcul par colonne)."""
+    comp = df['composante_code'].map(safe_string) if 'composante_code' in df.columns else None
+    abbr = df['mention_abbreviation'].map(safe_string) if 'mention_abbreviation' in df.columns else None
+    if comp is None or abbr is None:
+        df['mention_code'] = None
+        return df
+    ok = comp.notna() & (comp.astype(str) != '') & abbr.notna() & (abbr.astype(str) != '')
+    df['mention_code'] = (comp.astype(str) + '_' + abbr.astype(str)).where(ok, None)
+    return df
+
+
+def _history_frame(sub_df: pd.DataFrame, ent: dict, maps: dict) -> pd.DataFrame:
+    """
+    Mêmes lignes que la boucle de import_history_from_excel pour une entité,
+    calculées par colonne (colonnes du modèle historique).
+    """
+    code_col = ent['code_col']
+    codes = sub_df[code_col].map(safe_string)
+    annee_id = sub_df['anneeuniversitaire_annee'].astype(str).map(maps['ANNE_ID'])
+    entity_id = codes.map(maps[ent['map_id']])
+    keep = annee_id.notna() & entity_id.notna()
+
+    # Libellé : Excel (si configuré) > libellé canonique en base > NON_DEFINI
+    canonical = {c: getattr(o, ent['canonical_label_attr'], None) for c, o in maps[ent['map_obj']].items()}
+    label = codes.map(canonical)
+    if ent['label_source_col'] and ent['label_source_col'] in sub_df.columns:
+        excel = sub_df[ent['label_source_col']].map(safe_string)
+        label = excel.where(excel.notna() & (excel.astype(str) != ''), label)
+    label = label.where(label.notna() & (label.astype(str) != ''), "NON_DEFINI")
+
+    return pd.DataFrame({
+        'AnneeUniversitaire_id_fk': annee_id[keep],
+        ent['fk_field']: entity_id[keep],
+        ent['label_field']: label[keep],
+        ent['code_hist_field']: codes[keep],
+    }).reset_index(drop=True)
+
+
+def import_history_from_excel(session: Session, path=None):
     """
     Importe les données historiques en se basant sur le fichier Excel d'inscription.
     Utilise les libellés des tables de référence canoniques (les plus récents) 
@@ -73,123 +156,32 @@ def import_history_from_excel(session: Session):
         'parcours_code' 
     ]
 
-    df = _load_excel_distinct(cols_to_load_for_df)
+    df = _load_excel_distinct(cols_to_load_for_df, path)
     if df is None or df.empty:
         print("⚠️ Fichier vide ou illisible pour l'historique.")
         return
 
     # 2. Préparation du DataFrame : Génération des codes
     # Le code de la mention est une concaténation
-    df['mention_code'] = df.apply(
-        lambda row: f"{safe_string(row['composante_code'])}_{safe_string(row['mention_abbreviation'])}" 
-                    if safe_string(row['composante_code']) and safe_string(row['mention_abbreviation'])
-                    else None, 
-        axis=1
-    )
+    df = _add_mention_code(df)
 
     # 3. Mappings (incluant les objets canoniques pour le lookup de label)
     print("   🔄 Chargement des références depuis la base de données...")
     maps = _get_mappings(session)
 
-    # 4. Définition des entités à traiter
-    # Ajout de 'canonical_label_attr' pour cibler le bon champ dans models.py
-    entities_config = [
-        {
-            'type': 'INST', 'code_col': 'institution_code', 
-            'map_id': 'INST_ID', 'map_obj': 'INST_OBJ', 
-            'orm_class': InstitutionHistorique, 'fk_field': 'Institution_id_fk', 
-            'label_field': 'Institution_nom_historique', 'code_hist_field': 'Institution_code_historique',
-            'label_source_col': 'institution_nom', # Priorité Excel
-            'canonical_label_attr': 'Institution_nom' # Fallback DB
-        },
-        {
-            'type': 'COMP', 'code_col': 'composante_code', 
-            'map_id': 'COMP_ID', 'map_obj': 'COMP_OBJ', 
-            'orm_class': ComposanteHistorique, 'fk_field': 'Composante_id_fk', 
-            'label_field': 'Composante_label_historique', 'code_hist_field': 'Composante_code_historique',
-            'label_source_col': None, 
-            'canonical_label_attr': 'Composante_label' # <-- CORRECTION : Nom exact dans models.py
-        },
-        {
-            'type': 'MENT', 'code_col': 'mention_code', 
-            'map_id': 'MENT_ID', 'map_obj': 'MENT_OBJ', 
-            'orm_class': MentionHistorique, 'fk_field': 'Mention_id_fk', 
-            'label_field': 'Mention_label_historique', 'code_hist_field': 'Mention_code_historique',
-            'label_source_col': None,
-            'canonical_label_attr': 'Mention_label' # <-- CORRECTION : Nom exact dans models.py
-        },
-        {
-            'type': 'PARC', 'code_col': 'parcours_code', 
-            'map_id': 'PARC_ID', 'map_obj': 'PARC_OBJ', 
-            'orm_class': ParcoursHistorique, 'fk_field': 'Parcours_id_fk', 
-            'label_field': 'Parcours_label_historique', 'code_hist_field': 'Parcours_code_historique',
-            'label_source_col': None,
-            'canonical_label_attr': 'Parcours_label' # <-- CORRECTION : Nom exact dans models.py
-        }
-    ]
-
-    # 5. Boucle de traitement par entité
-    for ent in entities_config:
+    # 4. Une ligne par (entité, année), calculée par colonne puis écrite en masse
+    #    (en mode config.HISTORY_MODE = "plages", fusionnée dans les plages de validité)
+    for ent in ENTITIES_CONFIG:
         print(f"   ↳ Traitement historique : {ent['type']}...")
-        
-        code_col = ent['code_col']
-        
-        # Sélection des colonnes nécessaires pour le regroupement
-        cols_group = ['anneeuniversitaire_annee', code_col]
-        
-        # On ajoute la colonne du label source si elle est définie
-        cols_select = cols_group[:]
-        if ent['label_source_col']:
-            cols_select.append(ent['label_source_col'])
-        
-        # Nettoyage
+
+        cols_group = ['anneeuniversitaire_annee', ent['code_col']]
+        cols_select = cols_group + [c for c in [ent['label_source_col']] if c and c in df.columns]
         sub_df = df[cols_select].drop_duplicates(subset=cols_group).dropna(subset=cols_group)
 
-        count = 0
-        updated = 0
-        
-        for _, row in tqdm(sub_df.iterrows(), total=len(sub_df), desc=f"   {ent['type']}-Histo"):
-            annee_val = str(row['anneeuniversitaire_annee'])
-            code_val = safe_string(row[code_col])
-            
-            # 1. Résolution des IDs (doit exister dans les tables de référence)
-            annee_id = maps['ANNE_ID'].get(annee_val)
-            entity_id = maps[ent['map_id']].get(code_val)
-            
-            if annee_id and entity_id:
-                
-                label_val = "NON_DEFINI" # Valeur par défaut
-                
-                # A. Essai via Excel (si configuré et présent)
-                if ent['label_source_col'] and ent['label_source_col'] in row:
-                    val_excel = safe_string(row[ent['label_source_col']])
-                    if val_excel:
-                        label_val = val_excel
-                
-                # B. Essai via DB (Lookup sur l'objet canonique) si Excel a échoué ou n'est pas configuré
-                if label_val == "NON_DEFINI" or label_val is None:
-                    canonical_obj = maps[ent['map_obj']].get(code_val)
-                    if canonical_obj:
-                        # On récupère l'attribut spécifique défini dans la config
-                        target_attr = ent.get('canonical_label_attr')
-                        db_label = getattr(canonical_obj, target_attr, None)
-                        if db_label:
-                            label_val = db_label
-                    else:
-                        label_val = f"{ent['type']}_CODE_INCONNU_EN_BASE"
-
-                # 3. Création objet historique
-                hist_obj = ent['orm_class'](
-                    AnneeUniversitaire_id_fk=annee_id,
-                    **{
-                        ent['fk_field']: entity_id,
-                        ent['label_field']: label_val,
-                        ent['code_hist_field']: code_val
-                    }
-                )
-                session.merge(hist_obj)
-                count += 1
-        
+        frame = _history_frame(sub_df, ent, maps).drop_duplicates(
+            subset=['AnneeUniversitaire_id_fk', ent['fk_field']])
+        count = bulk_upsert(session, ent['orm_class'], frame)
+
         session.commit()
         print(f"      ✅ {count} entrées insérées/mises à jour pour {ent['type']}.")
 
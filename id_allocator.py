@@ -0,0 +1,114 @@
+# id_allocator.py
+#
+# Attribution des identifiants "PREFIXE_000123" des tables de structure (INST, COMP, DOMA,
+# MENT, PARC) par séquences PostgreSQL, une par préfixe :
+#   - un code déjà en base garde son ID, quel que soit l'ordre des lignes du fichier source ;
+#   - les nouveaux codes reçoivent un bloc de numéros en un seul aller-retour (nextval) ;
+#   - nextval est atomique et hors transaction : deux imports concurrents n'obtiennent
+#     jamais le même numéro (au pire des trous dans la numérotation).
+
+import pandas as pd
+from sqlalchemy import BigInteger, cast, func, select, text
+from sqlalchemy.orm import Session
+
+from bulk_utils import bulk_upsert
+from fixed_references import _generate_id
+
+SEQUENCE_PREFIX = "seq_ids_"
+
+
+class IdAllocator:
+    """Distribue des blocs d'IDs par préfixe et résout les clés naturelles en IDs stables."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._prets = set()
+
+    @staticmethod
+    def sequence_name(prefix):
+        return f"{SEQUENCE_PREFIX}{prefix.lower()}"
+
+    # ----------------------------
+    # Séquences
+    # ----------------------------
+    def _preparer(self, prefix, model):
+        """
+        Crée la séquence au premier usage et la recale au-dessus du plus grand numéro
+        existant (IDs posés par l'ancien compteur). Verrou consultatif : deux imports
+        qui démarrent ensemble ne recalent pas la séquence l'un par-dessus l'autre.
+        """
+        if prefix in self._prets:
+            return
+        seq = self.sequence_name(prefix)
+        id_col = model.__table__.primary_key.columns.values()[0]
+        conn = self.session.connection()
+
+        # Verrou de transaction : relâché au commit, une fois la séquence créée et recalée visible
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:seq))"), {"seq": seq})
+        conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {seq} MINVALUE 1 START 1"))
+        max_existant = conn.execute(select(func.max(
+            cast(func.substring(id_col, f"^{prefix}_([0-9]+)$"), BigInteger)
+        ))).scalar()
+        if max_existant:
+            conn.execute(text(
+                f"SELECT setval('{seq}', GREATEST(:m, (SELECT CASE WHEN is_called "
+                f"THEN last_value ELSE 0 END FROM {seq})), true)"
+            ), {"m": max_existant})
+        self._prets.add(prefix)
+
+    def allouer(self, prefix, model, n) -> list:
+        """Réserve n numéros consécutifs dans l'ordre de la séquence (un seul aller-retour)."""
+        if n <= 0:
+            return []
+        self._preparer(prefix, model)
+        res = self.session.execute(
+            text("SELECT nextval(CAST(:seq AS regclass)) FROM generate_series(1, :n)"),
+            {"seq": self.sequence_name(prefix), "n": int(n)}
+        )
+        return sorted(r[0] for r in res)
+
+    # ----------------------------
+    # Clés naturelles -> IDs
+    # ----------------------------
+    def charger_ids(self, model, cles) -> pd.DataFrame:
+        """Correspondance existante (cles..., id) lue en une requête."""
+        table = model.__table__
+        id_col = table.primary_key.columns.values()[0].name
+        return pd.read_sql(
+            select(*[table.c[c] for c in cles], table.c[id_col]),
+            self.session.connection()
+        )
+
+    def _joindre(self, rows, existants, cles, id_col) -> pd.Series:
+        joint = rows[cles].reset_index(drop=True).merge(existants, on=cles, how="left")
+        return pd.Series(joint[id_col].to_numpy(dtype=object), index=rows.index, name=id_col)
+
+    def assigner_ids(self, model, prefix, rows: pd.DataFrame, cles) -> pd.Series:
+        """
+        IDs alignés sur rows (colonnes = noms du modèle) : ID en base pour les clés connues,
+        numéros neufs (un bloc) pour les autres. Les clés doivent être non nulles.
+        """
+        id_col = model.__table__.primary_key.columns.values()[0].name
+        ids = self._joindre(rows, self.charger_ids(model, cles), cles, id_col)
+
+        nouveaux = rows.loc[ids.isna(), cles].drop_duplicates()
+        if not nouveaux.empty:
+            nums = self.allouer(prefix, model, len(nouveaux))
+            nouveaux = nouveaux.assign(**{id_col: [_generate_id(prefix, n) for n in nums]})
+            ids = ids.fillna(self._joindre(rows, nouveaux, cles, id_col))
+        return ids
+
+    def upsert(self, model, prefix, rows: pd.DataFrame, cles, constraint=None) -> pd.DataFrame:
+        """
+        Assigne les IDs, écrit par INSERT ... ON CONFLICT sur la clé naturelle (l'ID n'est
+        jamais réécrit), puis relit les IDs gagnants : si un import concurrent a inséré la
+        même clé entre-temps, c'est son ID qui est retourné. Pas de commit.
+        """
+        id_col = model.__table__.primary_key.columns.values()[0].name
+        if rows.empty:
+            return rows.assign(**{id_col: pd.Series(dtype=object)})
+
+        rows = rows.drop_duplicates(subset=cles, keep="last")
+        rows = rows.assign(**{id_col: self.assigner_ids(model, prefix, rows, cles)})
+        bulk_upsert(self.session, model, rows, constraint=constraint or cles)
+        return rows.assign(**{id_col: self._joindre(rows, self.charger_ids(model, cles), cles, id_col)})
@@ -1,3 +1,6 @@
+import glob
+import os
+
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
@@ -11,6 +14,32 @@ from models import (
     Parcours, Semestre, AnneeUniversitaire, ModeInscription
 )
 from metadata_import import safe_string
+from bulk_utils import bulk_upsert, frame_to_records, separer_lignes_invalides, ecrire_avec_repli
+from repository import invalider_cache
+
+# Taille des paquets de lignes pour les chemins d'import en flux (async, pipeline)
+CHUNK_SIZE = 5000
+
+# Codes à faible cardinalité, standardisés puis stockés en category
+CODE_COLS = [
+    "parcours_code", "niveau_code", "semestre_numero",
+    "modeinscription_label", "institution_code",
+    "composante_code", "domaine_code",
+    "mention_abbreviation", "anneeuniversitaire_annee"
+]
+# Une colonne texte est convertie en category si (modalités distinctes) <= ratio * (lignes) :
+# seuil bas, les textes presque uniques (noms, prénoms, CIN) restent en object
+TEXT_CATEGORY_RATIO = 0.05
+
+# Colonnes source -> colonnes du modèle Etudiant (mêmes champs que _import_etudiants)
+ETUDIANT_COLS = [
+    "etudiant_id", "etudiant_numero_inscription", "etudiant_nom", "etudiant_prenoms",
+    "etudiant_sexe", "etudiant_naissance_date", "etudiant_naissance_lieu",
+    "etudiant_nationalite", "etudiant_bacc_annee", "etudiant_bacc_numero",
+    "etudiant_bacc_serie", "etudiant_bacc_centre", "etudiant_bacc_mention",
+    "etudiant_telephone", "etudiant_mail", "etudiant_cin", "etudiant_cin_date",
+    "etudiant_cin_lieu",
+]
 
 def _clean_date(value):
     """Convertit les NaT, nan, None, '' en None. Retourne date python si valide."""
@@ -29,35 +58,115 @@ def _clean_date(value):
     except:
         return None
 
+# ----------------------------
+# Sources : un classeur, un dossier de classeurs ou un motif glob
+# ----------------------------
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def lister_sources(source) -> list:
+    """
+    Classeurs à importer, triés par nom (ex. un par année et par institution).
+    - fichier : [fichier]
+    - dossier : classeurs du dossier (fichiers temporaires ~$ ignorés)
+    - motif glob : ex. r"...\inscriptions\*_2023.xlsx" ou "**/*.xlsx"
+    """
+    if os.path.isdir(source):
+        fichiers = [os.path.join(source, f) for f in os.listdir(source)]
+    elif any(ch in source for ch in "*?["):
+        fichiers = glob.glob(source, recursive=True)
+    else:
+        return [source]
+    return sorted(
+        f for f in fichiers
+        if os.path.isfile(f) and f.lower().endswith(EXCEL_EXTENSIONS)
+        and not os.path.basename(f).startswith("~$")
+    )
+
+
 # ----------------------------
 # Load + clean Excel
 # ----------------------------
-def _load_and_clean_inscriptions():
+def _load_and_clean_inscriptions(path=None):
     import config
 
     try:
-        df = pd.read_excel(config.INSCRIPTION_FILE_PATH)
+        frames = []
+        for f in lister_sources(path or config.INSCRIPTION_FILE_PATH):
+            raw = pd.read_excel(f)
+            raw.columns = raw.columns.str.lower().str.replace(" ", "_")
+            frames.append(raw)
+        df = pd.concat(frames, ignore_index=True)
     except:
         print("❌ ERREUR lecture fichier inscriptions.")
         return None
 
+    return _clean_inscriptions_frame(df)
+
+
+def _iter_excel_chunks(path, chunksize=CHUNK_SIZE):
+    """
+    Lecture en flux de la première feuille de chaque classeur de `path` (openpyxl
+    read_only) : produit des DataFrames de `chunksize` lignes sans charger tout le fichier.
+    Les classeurs d'un dossier / motif glob sont lus l'un après l'autre, dans l'ordre.
+    """
+    from openpyxl import load_workbook
+
+    for fichier in lister_sources(path):
+        wb = load_workbook(fichier, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h) for h in next(rows)]
+            buf = []
+            for r in rows:
+                buf.append(r)
+                if len(buf) >= chunksize:
+                    yield pd.DataFrame(buf, columns=header)
+                    buf = []
+            if buf:
+                yield pd.DataFrame(buf, columns=header)
+        finally:
+            wb.close()
+
+
+def _downcast_numeric(s: pd.Series) -> pd.Series:
+    """Entiers -> plus petit type entier nullable (Int8..Int64), sinon float32."""
+    n = pd.to_numeric(s, errors="coerce")
+    valid = n.dropna()
+    if valid.empty or (valid % 1 == 0).all():
+        lo, hi = (valid.min(), valid.max()) if not valid.empty else (0, 0)
+        for t in ("Int8", "Int16", "Int32", "Int64"):
+            info = np.iinfo(t.lower())
+            if info.min <= lo and hi <= info.max:
+                return n.astype(t)
+    return n.astype("float32")
+
+
+def _clean_inscriptions_frame(df: pd.DataFrame):
+    """
+    Nettoyage ligne à ligne : applicable au fichier entier comme à un paquet de lignes.
+    Le DataFrame produit est compact : codes en category, numériques réduits,
+    dates en datetime64 (NaT), autres textes en chaînes Arrow si pyarrow est installé. La conversion NaN/NaT -> None se fait à l'écriture
+    (_etudiants_frame / _inscriptions_frame).
+    """
     df.columns = df.columns.str.lower().str.replace(" ", "_")
-    df = df.where(pd.notnull(df), None)
 
     # Dates
     for c in ["etudiant_naissance_date", "etudiant_cin_date"]:
         if c in df.columns:
-            df[c] = pd.to_datetime(df[c], errors="coerce", dayfirst=True).dt.date
+            df[c] = pd.to_datetime(df[c], errors="coerce", dayfirst=True)
+
+    # Numériques
+    if "etudiant_bacc_annee" in df.columns:
+        df["etudiant_bacc_annee"] = _downcast_numeric(df["etudiant_bacc_annee"])
+    # Les codes / identifiants numériques gardent leur type : leur texte écrit en base n'est pas modifié
+    keep = set(CODE_COLS + ETUDIANT_COLS + ["inscription_code"])
+    for c in df.select_dtypes(include="number").columns:
+        if c not in keep:
+            df[c] = _downcast_numeric(df[c])
 
     # Standardisation codes
-    cols = [
-        "parcours_code", "niveau_code", "semestre_numero",
-        "modeinscription_label", "institution_code",
-        "composante_code", "domaine_code",
-        "mention_abbreviation", "etudiant_id",
-        "anneeuniversitaire_annee"
-    ]
-    for c in cols:
+    for c in CODE_COLS + ["etudiant_id"]:
         if c in df.columns:
             df[c] = df[c].astype(str).apply(safe_string)
             df[c] = df[c].replace(["None", "nan", ""], None)
@@ -81,75 +190,125 @@ def _load_and_clean_inscriptions():
         None: "CLAS"
     })
 
+    # Codes à faible cardinalité : une chaîne par modalité au lieu d'une par cellule
+    for c in CODE_COLS + ["code_semestre_cle", "code_mode_inscription"]:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+
+    # Autres textes très répétés (sexe, nationalité, série du bac, lieux...) : même traitement
+    for c in df.select_dtypes(include=["object", "string"]).columns:
+        if c in ("etudiant_id", "inscription_code"):
+            continue
+        if len(df) and df[c].nunique(dropna=True) <= TEXT_CATEGORY_RATIO * len(df):
+            df[c] = df[c].astype("category")
+
+    # Textes presque uniques (identifiants, CIN, noms...) : chaînes Arrow contiguës au lieu
+    # d'un objet python par cellule ; manquants en NaN comme en object
+    texte = _dtype_texte()
+    if texte is not None:
+        for c in df.select_dtypes(include="object").columns:
+            if pd.api.types.infer_dtype(df[c], skipna=True) == "string":
+                df[c] = df[c].astype(texte)
+
     return df
 
 
+def _dtype_texte():
+    """Chaînes Arrow (pyarrow facultatif) ; None : les textes restent en object."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype("pyarrow", na_value=np.nan)
+
+
 # ----------------------------
 # Import Etudiants
 # ----------------------------
-def _import_etudiants(session: Session, df: pd.DataFrame):
+def _import_etudiants(session: Session, df: pd.DataFrame) -> set:
+    """Retourne les Etudiant_id non écrits (lignes invalides ou en erreur)."""
     print("\n--- Importation Étudiants ---")
 
-    dfe = df.drop_duplicates(subset=["etudiant_id"]).dropna(subset=["etudiant_id"])
-
-    for _, row in tqdm(dfe.iterrows(), total=len(dfe), desc="Étudiants"):
-        
-        # --- CORRECTION APPLIQUÉE ICI ---
-        # Si la date est NaT (valeur manquante de Pandas), on la remplace par None
-        
-        naissance_date = _clean_date(row["etudiant_naissance_date"])
-        cin_date = row.get("etudiant_cin_date")
-        
-        # Vérifiez si NaT est présent pour Etudiant_naissance_date (après _clean_date)
-        # et Etudiant_cin_date (avant ou après nettoyage si c'est une date brute)
-        
-        naissance_date_val = None if pd.isna(naissance_date) else naissance_date
-        cin_date_val = None if pd.isna(cin_date) else cin_date
-        
-        # Le champ Etudiant_bacc_annee, même si numérique, est sécurisé contre NaN
-        bacc_annee_val = row.get("etudiant_bacc_annee")
-        if pd.isna(bacc_annee_val):
-             bacc_annee_val = None # Assurer la conversion de NaN en None pour les chiffres aussi.
+    # Valeurs converties à la frontière d'écriture (NaT/NaN -> None, dates python, textes)
+    dfe, rejets = separer_lignes_invalides(Etudiant, _etudiants_frame(df))
+    _signaler_rejets("ETUDIANT", [rejets], "Etudiant_id")
+    non_ecrits = set(rejets["Etudiant_id"])
 
+    for row in tqdm(frame_to_records(dfe), total=len(dfe), desc="Étudiants"):
         try:
-            session.merge(Etudiant(
-                Etudiant_id=safe_string(row["etudiant_id"]),
-                Etudiant_numero_inscription=safe_string(row.get("etudiant_numero_inscription")),
-                Etudiant_nom=safe_string(row["etudiant_nom"]),
-                Etudiant_prenoms=safe_string(row.get("etudiant_prenoms")),
-                Etudiant_sexe=safe_string(row.get("etudiant_sexe", "A")),
-                
-                # --- UTILISATION DES VALEURS CORRIGÉES ---
-                Etudiant_naissance_date = naissance_date_val,
-                
-                Etudiant_naissance_lieu=safe_string(row.get("etudiant_naissance_lieu")),
-                Etudiant_nationalite=safe_string(row.get("etudiant_nationalite")),
-                
-                # Correction pour Etudiant_bacc_annee
-                Etudiant_bacc_annee=bacc_annee_val, 
-                
-                Etudiant_bacc_numero=safe_string(row.get("etudiant_bacc_numero")),
-                Etudiant_bacc_serie=safe_string(row.get("etudiant_bacc_serie")),
-                Etudiant_bacc_centre=safe_string(row.get("etudiant_bacc_centre")),
-                Etudiant_bacc_mention=safe_string(row.get("etudiant_bacc_mention")),
-                Etudiant_telephone=safe_string(row.get("etudiant_telephone")),
-                Etudiant_mail=safe_string(row.get("etudiant_mail")),
-                Etudiant_cin=safe_string(row.get("etudiant_cin")),
-                
-                # --- UTILISATION DES VALEURS CORRIGÉES ---
-                Etudiant_cin_date=cin_date_val, 
-                
-                Etudiant_cin_lieu=safe_string(row.get("etudiant_cin_lieu"))
-            ))
-
+            session.merge(Etudiant(**row))
             session.commit()
 
         except Exception as e:
             session.rollback()
-            print(f"❌ [ETUDIANT] Erreur d'insertion pour l'étudiant {row['etudiant_id']}: {e}")
-            # Si vous utilisez tqdm, vous pouvez ajouter une gestion des erreurs plus détaillée ici.
+            non_ecrits.add(row["Etudiant_id"])
+            print(f"❌ [ETUDIANT] Erreur d'insertion pour l'étudiant {row['Etudiant_id']}: {e}")
 
     print("✅ Étudiants importés.")
+    return non_ecrits
+
+# ----------------------------
+# Frontière d'écriture (DataFrame -> colonnes du modèle)
+# ----------------------------
+def _to_text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def _etudiants_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mêmes valeurs que _import_etudiants, calculées par colonne :
+    une ligne par etudiant_id (première occurrence), colonnes du modèle Etudiant.
+    """
+    dfe = df.drop_duplicates(subset=["etudiant_id"]).dropna(subset=["etudiant_id"])
+    out = pd.DataFrame(index=dfe.index)
+
+    for src in ETUDIANT_COLS:
+        dst = "Etudiant_" + src[len("etudiant_"):]
+        if src not in dfe.columns:
+            out[dst] = "A" if src == "etudiant_sexe" else None
+        elif src in ("etudiant_naissance_date", "etudiant_cin_date"):
+            d = pd.to_datetime(dfe[src], errors="coerce")
+            out[dst] = d.dt.date.astype(object).where(d.notna(), None)
+        elif src == "etudiant_bacc_annee":
+            n = pd.to_numeric(dfe[src], errors="coerce")
+            out[dst] = n.astype("Int64").astype(object).where(n.notna(), None)
+        else:
+            out[dst] = dfe[src].astype(object).map(_to_text)
+
+    # Lignes sans Etudiant_nom conservées : chaque chemin d'écriture les écarte et les signale
+    return out.reset_index(drop=True)
+
+
+def _inscriptions_frame(df: pd.DataFrame, parc_map, sem_map, annee_map, mode_map) -> pd.DataFrame:
+    """Mêmes valeurs que _import_inscriptions_details, calculées par colonne."""
+    df = df.dropna(subset=["etudiant_id", "code_semestre_cle",
+                           "parcours_code", "anneeuniversitaire_annee",
+                           "inscription_code"])
+    return pd.DataFrame({
+        "Inscription_id": df["inscription_code"].astype(object).map(_to_text),
+        "Etudiant_id_fk": df["etudiant_id"],
+        "Parcours_id_fk": df["parcours_code"].astype(object).map(parc_map),
+        "Semestre_id_fk": df["code_semestre_cle"].astype(object).map(sem_map),
+        "AnneeUniversitaire_id_fk": df["anneeuniversitaire_annee"].astype(str).map(annee_map),
+        "ModeInscription_id_fk": df["code_mode_inscription"].astype(object).map(mode_map),
+        "Inscription_date": datetime.now().date(),
+    }).reset_index(drop=True)
+
+
+def _signaler_rejets(nom, rejets, cle) -> int:
+    """Lignes non écrites (colonne _motif) : nombre par motif et premiers identifiants."""
+    rejets = [r for r in rejets if len(r)]
+    if not rejets:
+        return 0
+    df = pd.concat(rejets, ignore_index=True)
+    print(f"⚠️ [{nom}] {len(df)} ligne(s) non écrite(s) :")
+    for motif, g in list(df.groupby("_motif", sort=False))[:10]:
+        exemples = ", ".join(g[cle].astype(str).head(5))
+        print(f"   - {motif} : {len(g)} ({exemples}{', ...' if len(g) > 5 else ''})")
+    return len(df)
+
 
 # ----------------------------
 # Mapping helpers
@@ -170,40 +329,46 @@ def _get_mode_mapping(session):
 # ----------------------------
 # Import inscriptions
 # ----------------------------
-def _import_inscriptions_details(session, df, parc_map, sem_map, annee_map, mode_map):
+def _import_inscriptions_details(session, df, parc_map, sem_map, annee_map, mode_map, non_ecrits=()) -> set:
+    """
+    non_ecrits : Etudiant_id non écrits par _import_etudiants (inscriptions écartées et signalées).
+    Retourne les étudiants dont des inscriptions ont été envoyées à l'écriture.
+    """
     print("\n--- Importation Inscriptions ---")
 
-    df = df.dropna(subset=["etudiant_id", "code_semestre_cle",
-                           "parcours_code", "anneeuniversitaire_annee",
-                           "inscription_code"])
-
-    count = 0
+    dfi = _inscriptions_frame(df, parc_map, sem_map, annee_map, mode_map)
+    dfi = dfi.drop_duplicates(subset=["Inscription_id"], keep="last")
 
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Inscriptions"):
+    orphelines = dfi["Etudiant_id_fk"].isin(non_ecrits)
+    rejets = [dfi[orphelines].assign(_motif="étudiant non écrit")]
+    dfi, invalides = separer_lignes_invalides(Inscription, dfi[~orphelines])
+    rejets.append(invalides)
 
-        session.merge(Inscription(
-            Inscription_id=row["inscription_code"],
-            Etudiant_id_fk=row["etudiant_id"],
-            Parcours_id_fk=parc_map.get(row["parcours_code"]),
-            Semestre_id_fk=sem_map.get(row["code_semestre_cle"]),
-            AnneeUniversitaire_id_fk=annee_map.get(str(row["anneeuniversitaire_annee"])),
-            ModeInscription_id_fk=mode_map.get(row["code_mode_inscription"]),
-            Inscription_date=datetime.now().date()
-        ))
-
-        count += 1
-        if count % 300 == 0:
+    def ecrire(f):
+        try:
+            bulk_upsert(session, Inscription, f)
             session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    # UPSERT sur la clé primaire (mêmes effets que merge), par paquets validés un à un ;
+    # un paquet rejeté pour ses données est coupé jusqu'à la ligne fautive.
+    # En schéma compact, bulk_upsert écrit dans inscriptions_compactes
+    for start in tqdm(range(0, len(dfi), CHUNK_SIZE), desc="Inscriptions"):
+        _, rej = ecrire_avec_repli(ecrire, dfi.iloc[start:start + CHUNK_SIZE])
+        rejets.append(rej)
 
-    session.commit()
+    _signaler_rejets("INSCRIPTION", rejets, "Inscription_id")
     print("✅ Inscriptions importées.")
+    return set(dfi["Etudiant_id_fk"])
 
 
 # ----------------------------
 # ORCHESTRATEUR
 # ----------------------------
-def import_inscriptions_to_db(session: Session):
-    df = _load_and_clean_inscriptions()
+def import_inscriptions_to_db(session: Session, path=None):
+    df = _load_and_clean_inscriptions(path)
     if df is None:
         print("❌ Impossible de charger les inscriptions")
         return
@@ -214,7 +379,9 @@ def import_inscriptions_to_db(session: Session):
     ann = _get_annee_mapping(session)
     mode = _get_mode_mapping(session)
 
-    _import_etudiants(session, df)
-    _import_inscriptions_details(session, df, parc, sem, ann, mode)
+    non_ecrits = _import_etudiants(session, df)
+    modifies = _import_inscriptions_details(session, df, parc, sem, ann, mode, non_ecrits)
 
+    invalider_cache("etudiants", "inscriptions")
     print("✅ Importation Étudiants + Inscriptions terminée.")
+    return {"etudiants_modifies": modifies}
@@ -0,0 +1,237 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import config
+from models import (
+    Etudiant, Inscription,
+    Parcours, Semestre, AnneeUniversitaire, ModeInscription
+)
+from bulk_utils import frame_to_records, separer_lignes_invalides, erreur_de_donnees, message_erreur
+from repository import invalider_cache
+from inscriptions_import import (
+    _iter_excel_chunks, _clean_inscriptions_frame,
+    _etudiants_frame, _inscriptions_frame, _signaler_rejets, CHUNK_SIZE
+)
+
+# Connexions d'écriture simultanées (taille du pool asyncpg)
+POOL_SIZE = 4
+# Paquets nettoyés en attente d'écriture : au-delà, la lecture se met en pause (contre-pression)
+QUEUE_DEPTH = 4
+
+
+# ----------------------------
+# Mapping helpers (async)
+# ----------------------------
+async def _load_mappings(engine):
+    async with engine.connect() as conn:
+        parc = dict((await conn.execute(select(Parcours.Parcours_code, Parcours.Parcours_id))).all())
+        sem = dict((await conn.execute(select(Semestre.Semestre_numero, Semestre.Semestre_id))).all())
+        ann = dict((await conn.execute(select(AnneeUniversitaire.AnneeUniversitaire_annee,
+                                               AnneeUniversitaire.AnneeUniversitaire_id))).all())
+        mode = {c.upper(): i for c, i in (await conn.execute(
+            select(ModeInscription.ModeInscription_code, ModeInscription.ModeInscription_id))).all()}
+    return parc, sem, ann, mode
+
+
+# ----------------------------
+# COPY + UPSERT
+# ----------------------------
+def _q(name):
+    return f'"{name}"'
+
+
+async def _copy_upsert(engine, model, frame) -> int:
+    """
+    COPY du paquet dans une table temporaire de la connexion,
+    puis INSERT ... SELECT ... ON CONFLICT (PK) DO UPDATE dans la même transaction.
+    """
+    if frame.empty:
+        return 0
+
+    table = model.__tablename__
+    tmp = f"tmp_{table}"
+    cols = list(frame.columns)
+    pk = [c.name for c in model.__table__.primary_key.columns]
+    col_list = ", ".join(_q(c) for c in cols)
+    updates = ", ".join(f"{_q(c)} = EXCLUDED.{_q(c)}" for c in cols if c not in pk)
+
+    records = [tuple(r[c] for c in cols) for r in frame_to_records(frame)]
+
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        apg = raw.driver_connection
+        async with apg.transaction():
+            await apg.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {tmp} (LIKE {table} INCLUDING DEFAULTS) "
+                f"ON COMMIT DELETE ROWS"
+            )
+            await apg.copy_records_to_table(tmp, records=records, columns=cols)
+            await apg.execute(
+                f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM {tmp} "
+                f"ON CONFLICT ({', '.join(_q(c) for c in pk)}) DO UPDATE SET {updates}"
+            )
+    return len(records)
+
+
+async def _copy_upsert_avec_repli(engine, model, frame):
+    """
+    _copy_upsert ; un paquet rejeté pour ses données est coupé en deux, récursivement
+    jusqu'à la ligne (cf. bulk_utils.ecrire_avec_repli). Retourne (écrites, rejetées + _motif).
+    """
+    try:
+        return await _copy_upsert(engine, model, frame), frame.iloc[0:0].assign(_motif=None)
+    except Exception as e:
+        if not erreur_de_donnees(e):
+            raise
+        if len(frame) <= 1:
+            return 0, frame.assign(_motif=message_erreur(e))
+        milieu = len(frame) // 2
+        n1, r1 = await _copy_upsert_avec_repli(engine, model, frame.iloc[:milieu])
+        n2, r2 = await _copy_upsert_avec_repli(engine, model, frame.iloc[milieu:])
+        return n1 + n2, pd.concat([r1, r2])
+
+
+# ----------------------------
+# Producteur : lecture + nettoyage
+# ----------------------------
+async def _producer(queue, path, maps, chunksize, n_writers, done, stats):
+    """
+    Lit le fichier par paquets (dans un thread), nettoie, puis dépose dans la file bornée.
+    Pour garder l'état final du chemin synchrone :
+    - un étudiant n'est écrit qu'avec sa première occurrence dans le fichier ;
+    - une inscription dont l'étudiant ou le code apparaît dans un paquet précédent
+      attend que ce paquet soit écrit (la dernière occurrence d'un code l'emporte).
+    """
+    rows = _iter_excel_chunks(path, chunksize)
+    etu_chunk, insc_chunk = {}, {}
+    idx = 0
+
+    try:
+        while True:
+            t0 = time.perf_counter()
+            raw = await asyncio.to_thread(next, rows, None)
+            if raw is None:
+                break
+            df = await asyncio.to_thread(_clean_inscriptions_frame, raw)
+
+            etu = _etudiants_frame(df)
+            etu = etu[~etu["Etudiant_id"].isin(etu_chunk.keys())]
+            insc = _inscriptions_frame(df, *maps).drop_duplicates(subset=["Inscription_id"], keep="last")
+
+            deps = {etu_chunk[e] for e in insc["Etudiant_id_fk"].unique() if e in etu_chunk}
+            deps |= {insc_chunk[c] for c in insc["Inscription_id"] if c in insc_chunk}
+
+            etu_chunk.update(dict.fromkeys(etu["Etudiant_id"], idx))
+            insc_chunk.update(dict.fromkeys(insc["Inscription_id"], idx))
+            stats["etudiants_modifies"].update(insc["Etudiant_id_fk"])
+            stats["parse"] += time.perf_counter() - t0
+            stats["lignes"] += len(raw)
+
+            done[idx] = asyncio.Event()
+            t0 = time.perf_counter()
+            await queue.put((idx, etu, insc, deps))
+            stats["attente_file"] += time.perf_counter() - t0
+            idx += 1
+    finally:
+        for _ in range(n_writers):
+            await queue.put(None)
+
+
+# ----------------------------
+# Consommateurs : écriture
+# ----------------------------
+async def _writer(engine, queue, done, non_ecrits, stats):
+    """
+    Écrit les étudiants puis les inscriptions d'un paquet. Lignes invalides écartées avant
+    écriture, lignes fautives isolées par sous-paquets ; les étudiants non écrits sont notés
+    dans non_ecrits AVANT de signaler done[idx] : les inscriptions qui les référencent
+    (ce paquet ou les suivants) sont écartées au lieu d'échouer sur la FK.
+    """
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        idx, etu, insc, deps = item
+        t0 = time.perf_counter()
+        try:
+            etu, rejets = separer_lignes_invalides(Etudiant, etu)
+            n, rej = await _copy_upsert_avec_repli(engine, Etudiant, etu)
+            stats["etudiants"] += n
+            rejets = pd.concat([rejets, rej])
+            non_ecrits.update(rejets["Etudiant_id"])
+            stats["rejets_etudiants"].append(rejets)
+
+            for d in deps:
+                await done[d].wait()
+            orphelines = insc["Etudiant_id_fk"].isin(non_ecrits)
+            stats["rejets_inscriptions"].append(insc[orphelines].assign(_motif="étudiant non écrit"))
+            insc, rejets = separer_lignes_invalides(Inscription, insc[~orphelines])
+            n, rej = await _copy_upsert_avec_repli(engine, Inscription, insc)
+            stats["inscriptions"] += n
+            stats["rejets_inscriptions"] += [rejets, rej]
+        except Exception as e:
+            # Erreur hors données (connexion...) : tout le paquet est compté comme non écrit
+            stats["erreurs"] += 1
+            motif = f"paquet {idx} : {message_erreur(e)}"
+            non_ecrits.update(item[1]["Etudiant_id"])
+            stats["rejets_etudiants"].append(item[1].assign(_motif=motif))
+            stats["rejets_inscriptions"].append(item[2].assign(_motif=motif))
+            print(f"❌ [ASYNC] Erreur d'écriture du paquet {idx} : {e}")
+        finally:
+            done[idx].set()
+            stats["ecriture"] += time.perf_counter() - t0
+
+
+async def _run(path, chunksize, pool_size, queue_depth):
+    engine = create_async_engine(config.ASYNC_DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    stats = dict.fromkeys(["parse", "attente_file", "ecriture", "lignes",
+                           "etudiants", "inscriptions", "erreurs"], 0)
+    stats["rejets_etudiants"], stats["rejets_inscriptions"] = [], []
+    stats["etudiants_modifies"] = set()
+    try:
+        maps = await _load_mappings(engine)
+        queue = asyncio.Queue(maxsize=queue_depth)
+        done, non_ecrits = {}, set()
+
+        t0 = time.perf_counter()
+        writers = [asyncio.create_task(_writer(engine, queue, done, non_ecrits, stats)) for _ in range(pool_size)]
+        await _producer(queue, path, maps, chunksize, pool_size, done, stats)
+        await asyncio.gather(*writers)
+        stats["total"] = time.perf_counter() - t0
+    finally:
+        await engine.dispose()
+    return stats
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def import_inscriptions_to_db_async(path=None, chunksize=CHUNK_SIZE,
+                                    pool_size=POOL_SIZE, queue_depth=QUEUE_DEPTH):
+    """
+    Ingestion asyncio des étudiants + inscriptions : la lecture/nettoyage du paquet N+1
+    se fait pendant que les paquets précédents sont écrits (COPY + UPSERT) sur un petit
+    pool de connexions asyncpg. État final identique à import_inscriptions_to_db.
+    """
+    print("\n--- Importation Étudiants + Inscriptions (mode asyncio) ---")
+    if config.SCHEMA_CLES == "compact":
+        # COPY direct dans les tables texte : non disponible en schéma compact
+        print("⚠️ Mode asyncio indisponible en schéma compact : utiliser INGESTION_MODE 'sync' ou 'threads'.")
+        return None
+    stats = asyncio.run(_run(path or config.INSCRIPTION_FILE_PATH, chunksize, pool_size, queue_depth))
+    invalider_cache("etudiants", "inscriptions")
+
+    print(f"   ⏱️ Lecture/nettoyage : {stats['parse']:.1f}s | écriture cumulée : {stats['ecriture']:.1f}s "
+          f"| producteur bloqué (file pleine) : {stats['attente_file']:.1f}s | total : {stats['total']:.1f}s")
+    if stats["erreurs"]:
+        print(f"⚠️ {stats['erreurs']} paquet(s) en erreur.")
+    _signaler_rejets("ETUDIANTS", stats["rejets_etudiants"], "Etudiant_id")
+    _signaler_rejets("INSCRIPTIONS", stats["rejets_inscriptions"], "Inscription_id")
+    print(f"✅ {stats['lignes']} lignes lues, {stats['etudiants']} étudiants et "
+          f"{stats['inscriptions']} inscriptions écrits.")
+    return stats
@@ -0,0 +1,275 @@
+# journal_modifications.py
+#
+# Capture des changements (table journal_modifications) pour les consommateurs en aval
+# (reporting, portails) : plus besoin de relire des tables entières pour savoir ce qu'un
+# import a changé.
+#   - triggers PostgreSQL de niveau instruction (tables de transition) sur etudiants,
+#     inscriptions, parcours et les *_historique : une ligne de journal par ligne
+#     insérée / modifiée / supprimée, y compris via COPY et les upserts en masse ;
+#     une mise à jour qui ne change aucune valeur (upsert d'un classeur identique)
+#     n'est pas journalisée ;
+#   - run d'import : demarrer_run pose un identifiant repris par toutes les connexions
+#     (paramètre de session scolarite.run_id), processus de shards compris ;
+#   - lecture des deltas par paquets depuis un curseur (txid, id), sans parcours complet.
+#     Seules les transactions terminées sont lues (txid < xmin du snapshot) : une ligne
+#     validée après coup ne peut pas passer derrière le curseur d'un consommateur.
+# Les TRUNCATE ne sont pas journalisés. En schéma compact, inscriptions_compactes est
+# journalisée sous le nom "inscriptions" (clé Inscription_id) ; en historique par plages,
+# les tables *_historique_plages le sont sous leur propre nom.
+#
+#   python journal_modifications.py --installer
+#   python journal_modifications.py --depuis 812345:1200 [--tables etudiants inscriptions] [--sortie delta.csv]
+#   python journal_modifications.py --purger 812345:1200
+
+import os
+import re
+import uuid
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import delete, event, func, inspect, select, text, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+from models import (
+    JournalModification, Etudiant, Inscription, Parcours,
+    InstitutionHistorique, ComposanteHistorique, MentionHistorique, ParcoursHistorique,
+    CycleHistorique, NiveauHistorique,
+)
+from bulk_utils import DEFAULT_CHUNK_SIZE
+import cles_compactes
+import historique_plages
+
+# Variable d'environnement du run courant (héritée par les processus de shards_import)
+RUN_ENV = "SCOLARITE_RUN_ID"
+PARAMETRE_RUN = "scolarite.run_id"
+
+TABLES_SUIVIES = [
+    Etudiant, Inscription, Parcours,
+    InstitutionHistorique, ComposanteHistorique, MentionHistorique, ParcoursHistorique,
+    CycleHistorique, NiveauHistorique,
+]
+
+FONCTION = "journaliser_modifications"
+
+_SQL_FONCTION = f"""
+CREATE OR REPLACE FUNCTION {FONCTION}() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    -- TG_ARGV[0] : nom journalisé ; TG_ARGV[1..] : colonnes de la clé
+    cols text;
+    cle text;
+    run text := nullif(current_setting('{PARAMETRE_RUN}', true), '');
+    insertion text := 'INSERT INTO journal_modifications ("JournalModification_table", '
+        '"JournalModification_cle", "JournalModification_operation", "JournalModification_run") ';
+BEGIN
+    SELECT string_agg(format('%I', c), ', '), 'concat_ws(''|'', ' || string_agg(format('%I::text', c), ', ') || ')'
+      INTO cols, cle FROM unnest(TG_ARGV[1:]) AS c;
+    IF TG_OP = 'UPDATE' THEN
+        EXECUTE insertion || format(
+            'SELECT %L, %s, ''U'', %L FROM nouvelles n JOIN anciennes a USING (%s) WHERE n IS DISTINCT FROM a',
+            TG_ARGV[0], cle, run, cols);
+    ELSIF TG_OP = 'INSERT' THEN
+        EXECUTE insertion || format('SELECT %L, %s, ''I'', %L FROM nouvelles', TG_ARGV[0], cle, run);
+    ELSE
+        EXECUTE insertion || format('SELECT %L, %s, ''D'', %L FROM anciennes', TG_ARGV[0], cle, run);
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# opération -> clause REFERENCING (une seule opération par trigger avec tables de transition)
+_OPERATIONS = {
+    "INSERT": "NEW TABLE AS nouvelles",
+    "UPDATE": "OLD TABLE AS anciennes NEW TABLE AS nouvelles",
+    "DELETE": "OLD TABLE AS anciennes",
+}
+
+
+# ----------------------------
+# Tables suivies selon le schéma
+# ----------------------------
+def _tables_physiques() -> list:
+    """(table physique, nom journalisé, colonnes de clé) selon SCHEMA_CLES / HISTORY_MODE."""
+    suivies = []
+    for model in TABLES_SUIVIES:
+        nom = model.__tablename__
+        if cles_compactes.actif() and model in cles_compactes.COMPACTS:
+            physique = cles_compactes.COMPACTS[model]
+            cles = [c.name for c in model.__table__.primary_key.columns]  # ID texte conservé
+        elif historique_plages.actif() and model in historique_plages.PLAGES:
+            physique = historique_plages.PLAGES[model]
+            nom = physique.__tablename__
+            cles = [c.name for c in physique.__table__.primary_key.columns]
+        else:
+            physique = model
+            cles = [c.name for c in model.__table__.primary_key.columns]
+        suivies.append((physique.__tablename__, nom, cles))
+    return suivies
+
+
+def installer_journal(engine):
+    """Fonction et triggers du journal (idempotent : triggers recréés à chaque appel)."""
+    existantes = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        conn.execute(text(_SQL_FONCTION))
+        n = 0
+        for physique, nom, cles in _tables_physiques():
+            if physique not in existantes:
+                continue
+            args = ", ".join(f"'{a}'" for a in [nom, *cles])
+            for operation, referencing in _OPERATIONS.items():
+                trigger = f"trg_journal_{operation.lower()}"
+                conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger} ON "{physique}"'))
+                conn.execute(text(
+                    f'CREATE TRIGGER {trigger} AFTER {operation} ON "{physique}" '
+                    f"REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION {FONCTION}({args})"
+                ))
+            n += 1
+    print(f"Journal des modifications : triggers posés sur {n} table(s).")
+
+
+# ----------------------------
+# Run d'import
+# ----------------------------
+def demarrer_run(prefixe="import") -> str:
+    """Identifiant de run repris par les connexions ouvertes ou empruntées au pool ensuite."""
+    run_id = f"{prefixe}-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    os.environ[RUN_ENV] = run_id
+    print(f"🏷️ Run d'import : {run_id}")
+    return run_id
+
+
+def terminer_run():
+    os.environ.pop(RUN_ENV, None)
+
+
+def _poser_run(dbapi_connection, connection_record, connection_proxy):
+    """checkout du pool : paramètre de session scolarite.run_id (vide hors run)."""
+    # Identifiant généré : pas de guillemets à échapper
+    run_id = re.sub(r"[^\w\-]", "", os.environ.get(RUN_ENV, ""))
+    # Connexion déjà positionnée sur ce run (ou jamais sur aucun) : pas d'aller-retour
+    if connection_record.info.get(RUN_ENV, "") == run_id:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SELECT set_config('{PARAMETRE_RUN}', '{run_id}', false)")
+    finally:
+        cursor.close()
+    # Paramètre de session : conservé après COMMIT ; aucune transaction laissée ouverte
+    # (isolation_level / SET TRANSACTION SNAPSHOT restent possibles sur la connexion)
+    dbapi_connection.commit()
+    connection_record.info[RUN_ENV] = run_id
+
+
+event.listen(Pool, "checkout", _poser_run)
+
+
+# ----------------------------
+# Lecture des deltas
+# ----------------------------
+def _curseur(valeur) -> tuple:
+    """(txid, id) depuis un tuple ou une chaîne 'txid:id' ; (0, 0) = depuis le début."""
+    if valeur is None:
+        return (0, 0)
+    if isinstance(valeur, str):
+        txid, _, id_ = valeur.partition(":")
+        return (int(txid), int(id_ or 0))
+    return tuple(int(v) for v in valeur)
+
+
+def lire_modifications(bind, depuis=None, tables=None, taille=DEFAULT_CHUNK_SIZE):
+    """
+    Générateur de (paquet, curseur) : paquets d'au plus `taille` lignes du journal
+    postérieures au curseur, dans l'ordre (txid, id) ; curseur = (txid, id) de la dernière
+    ligne du paquet, à conserver par le consommateur pour l'appel suivant.
+    - bind : Session ou Connection SQLAlchemy
+    - tables : noms journalisés à retenir (défaut : tous)
+    """
+    conn = bind.connection() if isinstance(bind, Session) else bind
+    curseur = _curseur(depuis)
+    # Transactions encore ouvertes au moment de la lecture : lues à l'appel suivant
+    horizon = conn.execute(select(func.txid_snapshot_xmin(func.txid_current_snapshot()))).scalar_one()
+    J = JournalModification
+    cle_curseur = tuple_(J.JournalModification_txid, J.JournalModification_id)
+
+    while True:
+        stmt = (
+            select(J.JournalModification_txid, J.JournalModification_id, J.JournalModification_table,
+                   J.JournalModification_cle, J.JournalModification_operation,
+                   J.JournalModification_run, J.JournalModification_date)
+            .where(cle_curseur > tuple_(*curseur), J.JournalModification_txid < horizon)
+            .order_by(J.JournalModification_txid, J.JournalModification_id)
+            .limit(taille)
+        )
+        if tables:
+            stmt = stmt.where(J.JournalModification_table.in_(list(tables)))
+        paquet = pd.read_sql(stmt, conn)
+        if paquet.empty:
+            return
+        dernier = paquet.iloc[-1]
+        curseur = (int(dernier["JournalModification_txid"]), int(dernier["JournalModification_id"]))
+        yield paquet, curseur
+        if len(paquet) < taille:
+            return
+
+
+def dernieres_modifications(bind, depuis=None, tables=None, taille=DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Dernière opération par (table, clé) depuis le curseur : ce qu'un consommateur doit
+    relire (I / U) ou retirer (D). Lecture par paquets, sans parcours complet du journal.
+    """
+    paquets = [p for p, _ in lire_modifications(bind, depuis, tables, taille)]
+    if not paquets:
+        return pd.DataFrame(columns=["JournalModification_table", "JournalModification_cle",
+                                     "JournalModification_operation"])
+    delta = pd.concat(paquets, ignore_index=True)
+    return (
+        delta.drop_duplicates(["JournalModification_table", "JournalModification_cle"], keep="last")
+             [["JournalModification_table", "JournalModification_cle", "JournalModification_operation",
+               "JournalModification_run"]]
+             .reset_index(drop=True)
+    )
+
+
+def purger_journal(bind, jusqua) -> int:
+    """Supprime les lignes déjà lues par tous les consommateurs (curseur inclus)."""
+    conn = bind.connection() if isinstance(bind, Session) else bind
+    J = JournalModification
+    res = conn.execute(
+        delete(J).where(tuple_(J.JournalModification_txid, J.JournalModification_id) <= tuple_(*_curseur(jusqua)))
+    )
+    print(f"🧹 Journal des modifications : {res.rowcount} ligne(s) purgée(s).")
+    return res.rowcount
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import engine, get_session
+
+    parser = argparse.ArgumentParser(description="Journal des modifications (capture des changements)")
+    parser.add_argument("--installer", action="store_true", help="Poser la fonction et les triggers")
+    parser.add_argument("--depuis", default=None, help="Curseur 'txid:id' (défaut : depuis le début)")
+    parser.add_argument("--tables", nargs="*", default=None)
+    parser.add_argument("--taille", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--sortie", default=None, help="CSV des lignes lues")
+    parser.add_argument("--purger", default=None, help="Curseur 'txid:id' jusqu'auquel purger")
+    args = parser.parse_args()
+
+    if args.installer:
+        installer_journal(engine)
+
+    db = get_session()
+    try:
+        if args.purger:
+            purger_journal(db, args.purger)
+            db.commit()
+        else:
+            total, curseur = 0, _curseur(args.depuis)
+            for i, (paquet, curseur) in enumerate(lire_modifications(db, args.depuis, args.tables, args.taille)):
+                if args.sortie:
+                    paquet.to_csv(args.sortie, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                total += len(paquet)
+                print(paquet["JournalModification_operation"].value_counts().to_dict())
+            print(f"✅ {total} modification(s) lue(s). Curseur : {curseur[0]}:{curseur[1]}")
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+# logos_import.py
+
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import config
+from models import Institution
+from asset_store import AssetStore
+from repository import invalider_cache
+
+EXTENSIONS_LOGO = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg"}
+
+
+def _scan_logos(dossier):
+    """{CODE_EN_MAJUSCULES: chemin} : un fichier par institution, nommé d'après son code (ex. UF.png)."""
+    logos = {}
+    for entry in os.scandir(dossier):
+        stem, ext = os.path.splitext(entry.name)
+        if entry.is_file() and ext.lower() in EXTENSIONS_LOGO:
+            logos[stem.strip().upper()] = entry.path
+    return logos
+
+
+def import_logos_institutions(session: Session, dossier=None, workers=8):
+    """
+    Ingestion parallèle des logos dans le store adressé par contenu, miniatures
+    calculées une fois par contenu, puis Institution_logo_path mis à jour en masse
+    (seulement les institutions dont le chemin change).
+    """
+    print("\n--- Importation Logos Institutions ---")
+    dossier = dossier or config.LOGO_FOLDER_PATH
+    if not os.path.isdir(dossier):
+        print(f"⚠️ Dossier des logos introuvable : {dossier}")
+        return None
+
+    logos = _scan_logos(dossier)
+    institutions = {code.upper(): (iid, path) for iid, code, path in session.execute(
+        select(Institution.Institution_id, Institution.Institution_code, Institution.Institution_logo_path)
+    )}
+    inconnus = sorted(set(logos) - set(institutions))
+    if inconnus:
+        print(f"   ℹ️ Logos sans institution correspondante : {inconnus}")
+
+    sources = [logos[c] for c in logos if c in institutions]
+    store = AssetStore()
+    try:
+        resultats = store.ingest_many(sources, workers=workers)
+        n_mini = store.miniatures_many([r["chemin"] for r in resultats if r["chemin"]], workers=workers)
+    finally:
+        store.close()
+    par_source = {r["source"]: r for r in resultats}
+
+    mappings = []
+    for code, src in logos.items():
+        if code not in institutions:
+            continue
+        r = par_source[os.path.abspath(src)]
+        iid, actuel = institutions[code]
+        if r["chemin"] is None:
+            print(f"❌ [LOGO] {code} : {r['statut']}")
+        elif r["chemin"] != actuel:
+            mappings.append({"Institution_id": iid, "Institution_logo_path": r["chemin"]})
+
+    try:
+        session.bulk_update_mappings(Institution, mappings)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [LOGO] Erreur de mise à jour des institutions : {e}")
+        return None
+
+    if mappings:
+        invalider_cache("structure")
+
+    statuts = {}
+    for r in resultats:
+        statuts[r["statut"]] = statuts.get(r["statut"], 0) + 1
+    print(f"✅ {len(sources)} logos traités {statuts}, {n_mini} miniature(s) créée(s), "
+          f"{len(mappings)} institution(s) mise(s) à jour.")
+    return resultats
@@ -1,15 +1,34 @@
 
+import os
 import sys
+import config
 import database_setup
 from sqlalchemy.orm import sessionmaker
-from database_setup import engine
+from database_setup import engine, session_etape
+from models import (
+    Etudiant, Inscription, Note, ResultatUE, ResultatSemestre, SuiviCreditCycle,
+    InstitutionHistorique, ComposanteHistorique, MentionHistorique, ParcoursHistorique
+)
 
 # Imports des modules
 from fixed_references import import_fixed_references
 from metadata_import import import_metadata_to_db
 from inscriptions_import import import_inscriptions_to_db
+from inscriptions_import_async import import_inscriptions_to_db_async
+from pipeline_import import import_inscriptions_pipeline
+from shards_import import import_inscriptions_shards
 from parcours_niveaux import deduce_parcours_niveaux
+from trajectoires import rafraichir_trajectoires
 from history_import import import_history_from_excel # <-- Nouvelle fonction
+from notes_import import import_notes_to_db
+from resultats_engine import calculer_resultats
+from doublons_etudiants import detecter_doublons_etudiants
+from logos_import import import_logos_institutions
+from documents_etudiants import import_documents_etudiants
+from maquettes_import import import_maquettes_to_db
+from charges_enseignement import import_charges_enseignement, calculer_charges
+from validation_sources import valider_sources, a_des_erreurs
+from journal_modifications import demarrer_run
 
 # --- Encodage Console Windows ---
 try:
@@ -23,6 +42,17 @@ if __name__ == "__main__":
 
     # 1. Initialisation
     database_setup.init_db()
+
+    # 1 bis. Validation des classeurs sources (avant toute écriture)
+    if config.VALIDATION_SOURCES:
+        rapport = valider_sources()
+        if config.VALIDATION_SOURCES == "bloquant" and a_des_erreurs(rapport):
+            print("⛔ Import interrompu : corriger les erreurs du rapport d'anomalies.")
+            sys.exit(1)
+
+    # Run d'import repris par le journal des modifications
+    if config.JOURNAL_MODIFICATIONS:
+        demarrer_run()
     
     SessionLocal = sessionmaker(bind=engine)
     session = SessionLocal()
@@ -32,16 +62,61 @@ if __name__ == "__main__":
         import_fixed_references(session)
 
         # 3. Métadonnées (Institutions -> Parcours)
-        import_metadata_to_db(session)
+        with session_etape("metadata", session) as s:
+            import_metadata_to_db(s)
+
+        # 3 bis. Logos des institutions (store adressé par contenu)
+        if os.path.isdir(config.LOGO_FOLDER_PATH):
+            import_logos_institutions(session)
 
         # 4. Inscriptions (Etudiants + Inscriptions)
-        import_inscriptions_to_db(session)
+        if config.INGESTION_MODE == "async":
+            rapport_inscriptions = import_inscriptions_to_db_async()
+        elif config.INGESTION_MODE == "threads":
+            rapport_inscriptions = import_inscriptions_pipeline(with_history=True)
+        elif config.INGESTION_MODE == "shards":
+            rapport_inscriptions = import_inscriptions_shards(with_history=True)
+        else:
+            with session_etape("inscriptions", session, [Etudiant, Inscription]) as s:
+                rapport_inscriptions = import_inscriptions_to_db(s)
 
         # 5. Déduction Parcours-Niveaux (depuis les relations Inscription)
         deduce_parcours_niveaux(session)
 
+        # 5 bis. Trajectoires des étudiants (seuls les étudiants touchés par l'import)
+        if rapport_inscriptions:
+            rafraichir_trajectoires(session, etudiants=rapport_inscriptions["etudiants_modifies"])
+
         # 6. Historiques (depuis le fichier Excel source pour avoir les libellés d'époque)
-        import_history_from_excel(session)
+        # (déjà chargés par le pipeline en mode "threads" / "shards")
+        if config.INGESTION_MODE not in ("threads", "shards"):
+            with session_etape("historiques", session, [InstitutionHistorique, ComposanteHistorique,
+                                                        MentionHistorique, ParcoursHistorique]) as s:
+                import_history_from_excel(s)
+
+        # 6 bis. Scans des étudiants (photo, CIN, bacc)
+        if os.path.isdir(config.DOCUMENTS_FOLDER_PATH):
+            with session_etape("documents", session, [Etudiant]) as s:
+                import_documents_etudiants(s)
+
+        # 6 ter. Doublons d'étudiants (paires candidates pour revue manuelle)
+        detecter_doublons_etudiants(session)
+
+        # 6 quater. Maquettes UE / EC (requises par les notes et les charges d'enseignement)
+        if os.path.exists(config.MAQUETTES_FILE_PATH):
+            import_maquettes_to_db(session)
+
+        # 7. Notes (feuilles de délibération) + 8. Résultats, si le dossier est présent
+        if os.path.exists(config.NOTES_FOLDER_PATH):
+            with session_etape("notes", session, [Note, ResultatUE, ResultatSemestre,
+                                                  Inscription, SuiviCreditCycle]) as s:
+                import_notes_to_db(s)
+                calculer_resultats(s)
+
+        # 9. Enseignants, volumes horaires, attributions + charges, si le classeur est présent
+        if os.path.exists(config.CHARGES_FILE_PATH):
+            import_charges_enseignement(session)
+            calculer_charges(session)
 
         print("\n==================================================")
         print("✅  IMPORTATION TERMINÉE AVEC SUCCÈS")
@@ -0,0 +1,287 @@
+# maquettes_import.py
+#
+# Maquettes pédagogiques : import en masse depuis Excel + clonage d'une année sur l'autre.
+#
+# Import (config.MAQUETTES_FILE_PATH, toutes les feuilles, une ligne par EC de maquette) :
+#   anneeuniversitaire_annee, parcours_code, semestre (code L1_S1 ou numéro S1),
+#   ue_code, ue_intitule, ue_credit, ec_code, ec_intitule, [ec_coefficient (défaut 1)]
+#   -> catalogues UE / EC (upsert sur le code), maquettes_ue, maquettes_ec.
+#
+# Clonage (cloner_maquettes) : maquettes_ue, maquettes_ec et volumes_horaires d'une année
+# recopiés sur une autre en trois INSERT ... SELECT (ID recalculés en SQL, identiques à
+# make_key_id) ; ce qui existe déjà dans l'année cible est conservé tel quel.
+#
+#   python maquettes_import.py --import
+#   python maquettes_import.py --cloner 2024-2025 2025-2026 [--parcours P1 P2]
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+
+import config
+from models import (
+    UniteEnseignement, ElementConstitutif, MaquetteUE, MaquetteEC, VolumeHoraire,
+    Parcours, Semestre, AnneeUniversitaire
+)
+from metadata_import import safe_string
+from bulk_utils import bulk_upsert, make_key_ids, sql_key_id
+
+COLONNES = ["anneeuniversitaire_annee", "parcours_code", "semestre", "ue_code", "ue_intitule",
+            "ue_credit", "ec_code", "ec_intitule"]
+
+
+# ----------------------------
+# Lecture / mappings
+# ----------------------------
+def _load_maquettes(path) -> pd.DataFrame:
+    sheets = pd.read_excel(path, sheet_name=None, dtype=str)
+    frames = []
+    for nom, df in sheets.items():
+        df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(" ", "_")
+        manquantes = [c for c in COLONNES if c not in df.columns]
+        if manquantes:
+            print(f"⚠️ Feuille '{nom}' ignorée : colonnes absentes {manquantes}")
+            continue
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=COLONNES)
+    df = pd.concat(frames, ignore_index=True)
+    for c in df.columns:
+        df[c] = df[c].astype(object).map(safe_string).replace("", None)
+    for c in ["ue_code", "ec_code", "semestre"]:
+        df[c] = df[c].str.upper()
+    return df
+
+
+def _get_parcours_mapping(session):
+    return {c: i for c, i in session.query(Parcours.Parcours_code, Parcours.Parcours_id)}
+
+
+def _get_semestre_mapping(session):
+    """Code (L1_S1) ou numéro (S1) -> ID ; un numéro partagé par plusieurs niveaux n'est pas retenu."""
+    sems = session.query(Semestre.Semestre_code, Semestre.Semestre_numero, Semestre.Semestre_id).all()
+    numeros = pd.Series([n.upper() for _, n, _ in sems if n])
+    uniques = set(numeros[~numeros.duplicated(keep=False)])
+    mapping = {n.upper(): i for _, n, i in sems if n and n.upper() in uniques}
+    mapping.update({c.upper(): i for c, _, i in sems if c})
+    return mapping
+
+
+def _get_annee_mapping(session):
+    return {a: i for a, i in session.query(AnneeUniversitaire.AnneeUniversitaire_annee,
+                                           AnneeUniversitaire.AnneeUniversitaire_id)}
+
+
+def _get_annee_id(session, annee):
+    annee_id = session.execute(
+        select(AnneeUniversitaire.AnneeUniversitaire_id)
+        .where((AnneeUniversitaire.AnneeUniversitaire_annee == annee) | (AnneeUniversitaire.AnneeUniversitaire_id == annee))
+    ).scalar()
+    if annee_id is None:
+        raise ValueError(f"Année universitaire inconnue : {annee}")
+    return annee_id
+
+
+# ----------------------------
+# Import
+# ----------------------------
+def _valider(df, parc_map, sem_map, annee_map) -> pd.DataFrame:
+    df = df.copy()
+    df["Parcours_id_fk"] = df["parcours_code"].map(parc_map)
+    df["Semestre_id_fk"] = df["semestre"].map(sem_map)
+    df["AnneeUniversitaire_id_fk"] = df["anneeuniversitaire_annee"].map(annee_map)
+    df["MaquetteUE_credit"] = pd.to_numeric(df["ue_credit"], errors="coerce")
+    coef = df["ec_coefficient"] if "ec_coefficient" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    df["MaquetteEC_coefficient"] = pd.to_numeric(coef, errors="coerce").fillna(1)
+
+    conditions = [
+        df["AnneeUniversitaire_id_fk"].isna(),
+        df["Parcours_id_fk"].isna(),
+        df["Semestre_id_fk"].isna(),
+        df["ue_code"].isna() | df["ue_intitule"].isna(),
+        df["ec_code"].isna() | df["ec_intitule"].isna(),
+        df["MaquetteUE_credit"].isna() | (df["MaquetteUE_credit"] < 0),
+    ]
+    motifs = ["ANNEE_INCONNUE", "PARCOURS_INCONNU", "SEMESTRE_INCONNU", "UE_INCOMPLETE",
+              "EC_INCOMPLET", "CREDIT_INVALIDE"]
+    df["motif_rejet"] = np.select(conditions, motifs, default="")
+    rejets = df[df["motif_rejet"] != ""]
+    if not rejets.empty:
+        print(f"⚠️ {len(rejets)} ligne(s) de maquette rejetée(s) :")
+        print(rejets["motif_rejet"].value_counts().to_string())
+    ok = df[df["motif_rejet"] == ""].copy()
+    ok["MaquetteUE_credit"] = ok["MaquetteUE_credit"].astype(int)
+    ok["MaquetteEC_coefficient"] = ok["MaquetteEC_coefficient"].astype(int)
+    return ok
+
+
+def _upsert_catalogue(session, model, df, code_col, intitule_col, prefix) -> dict:
+    """Catalogue UE / EC : upsert sur le code (ID existant conservé), retourne code -> ID."""
+    code, intitule, pk = f"{prefix}_code", f"{prefix}_intitule", f"{prefix}_id"
+    rows = df.drop_duplicates(subset=[code_col], keep="last")
+    rows = pd.DataFrame({code: rows[code_col], intitule: rows[intitule_col]})
+    rows.insert(0, pk, make_key_ids(prefix, rows, [code]))
+    bulk_upsert(session, model, rows, constraint=[code], update_cols=[intitule])
+
+    t = model.__table__
+    codes = rows[code].tolist()
+    return {c: i for c, i in session.execute(select(t.c[code], t.c[pk]).where(t.c[code].in_(codes)))}
+
+
+def _maquettes_ue_mapping(session, annee_ids) -> dict:
+    t = MaquetteUE.__table__
+    rows = session.execute(
+        select(t.c.Parcours_id_fk, t.c.AnneeUniversitaire_id_fk, t.c.UE_id_fk, t.c.MaquetteUE_id)
+        .where(t.c.AnneeUniversitaire_id_fk.in_(annee_ids))
+    )
+    return {(p, a, u): i for p, a, u, i in rows}
+
+
+def import_maquettes_to_db(session: Session, path=None) -> dict:
+    print("\n--- Importation des Maquettes (UE / EC) ---")
+    path = path or config.MAQUETTES_FILE_PATH
+    try:
+        df = _load_maquettes(path)
+    except Exception as e:
+        print(f"❌ ERREUR lecture des maquettes {path} : {e}")
+        return {}
+    if df.empty:
+        print("ℹ️ Aucune ligne de maquette.")
+        return {}
+
+    df = _valider(df, _get_parcours_mapping(session), _get_semestre_mapping(session), _get_annee_mapping(session))
+    stats = {}
+    try:
+        ue_map = _upsert_catalogue(session, UniteEnseignement, df, "ue_code", "ue_intitule", "UE")
+        ec_map = _upsert_catalogue(session, ElementConstitutif, df, "ec_code", "ec_intitule", "EC")
+        df["UE_id_fk"] = df["ue_code"].map(ue_map)
+        df["EC_id_fk"] = df["ec_code"].map(ec_map)
+        stats["ue_catalogue"], stats["ec_catalogue"] = len(ue_map), len(ec_map)
+
+        # Maquettes UE : clé naturelle (parcours, année, UE) ; l'ID d'une maquette existante est conservé
+        cle_ue = ["Parcours_id_fk", "AnneeUniversitaire_id_fk", "UE_id_fk"]
+        mue = df.drop_duplicates(subset=cle_ue, keep="last")[cle_ue + ["Semestre_id_fk", "MaquetteUE_credit"]].copy()
+        mue.insert(0, "MaquetteUE_id", make_key_ids("MQUE", mue, cle_ue))
+        stats["maquettes_ue"] = bulk_upsert(session, MaquetteUE, mue, constraint="uq_maquette_ue",
+                                            update_cols=["Semestre_id_fk", "MaquetteUE_credit"])
+
+        mue_map = _maquettes_ue_mapping(session, mue["AnneeUniversitaire_id_fk"].unique().tolist())
+        df["MaquetteUE_id_fk"] = [mue_map.get(k) for k in zip(*(df[c] for c in cle_ue))]
+        mec = df.drop_duplicates(subset=["MaquetteUE_id_fk", "EC_id_fk"], keep="last")
+        mec = mec[["MaquetteUE_id_fk", "EC_id_fk", "MaquetteEC_coefficient"]].copy()
+        mec.insert(0, "MaquetteEC_id", make_key_ids("MQEC", mec, ["MaquetteUE_id_fk", "EC_id_fk"]))
+        stats["maquettes_ec"] = bulk_upsert(session, MaquetteEC, mec, update_cols=["MaquetteEC_coefficient"])
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [MAQUETTES] Erreur d'insertion en masse : {e}")
+        return {}
+
+    print(f"✅ Maquettes importées : {stats}")
+    return stats
+
+
+# ----------------------------
+# Clonage d'année
+# ----------------------------
+def cloner_maquettes(session: Session, source, cible, parcours=None) -> dict:
+    """
+    Recopie les maquettes UE / EC et leurs volumes horaires de l'année source vers l'année
+    cible (libellé ou ID), pour tous les parcours ou les codes fournis. Trois INSERT ... SELECT
+    ON CONFLICT DO NOTHING : on complète l'année cible sans rien modifier de ce qui y est déjà.
+    Les attributions d'enseignants ne sont pas recopiées.
+    """
+    source_id, cible_id = _get_annee_id(session, source), _get_annee_id(session, cible)
+    if source_id == cible_id:
+        raise ValueError("Années source et cible identiques.")
+    print(f"\n--- Clonage des maquettes {source_id} -> {cible_id} ---")
+
+    ue_src, ue_dst = aliased(MaquetteUE), aliased(MaquetteUE)
+    ec_src, ec_dst = aliased(MaquetteEC), aliased(MaquetteEC)
+
+    filtre = [ue_src.AnneeUniversitaire_id_fk == source_id]
+    if parcours:
+        ids = select(Parcours.Parcours_id).where(Parcours.Parcours_code.in_(list(parcours)))
+        filtre.append(ue_src.Parcours_id_fk.in_(ids))
+
+    # Maquette UE de la cible correspondant à une maquette UE source (même parcours et UE)
+    vers_cible = and_(
+        ue_dst.Parcours_id_fk == ue_src.Parcours_id_fk,
+        ue_dst.UE_id_fk == ue_src.UE_id_fk,
+        ue_dst.AnneeUniversitaire_id_fk == cible_id,
+    )
+
+    ins_ue = pg_insert(MaquetteUE).from_select(
+        ["MaquetteUE_id", "Parcours_id_fk", "AnneeUniversitaire_id_fk", "UE_id_fk", "Semestre_id_fk",
+         "MaquetteUE_credit"],
+        select(
+            sql_key_id("MQUE", ue_src.Parcours_id_fk, cible_id, ue_src.UE_id_fk),
+            ue_src.Parcours_id_fk, literal(cible_id), ue_src.UE_id_fk, ue_src.Semestre_id_fk, ue_src.MaquetteUE_credit,
+        ).where(*filtre)
+    ).on_conflict_do_nothing()
+
+    ins_ec = pg_insert(MaquetteEC).from_select(
+        ["MaquetteEC_id", "MaquetteUE_id_fk", "EC_id_fk", "MaquetteEC_coefficient"],
+        select(
+            sql_key_id("MQEC", ue_dst.MaquetteUE_id, ec_src.EC_id_fk),
+            ue_dst.MaquetteUE_id, ec_src.EC_id_fk, ec_src.MaquetteEC_coefficient,
+        )
+        .select_from(ec_src)
+        .join(ue_src, ec_src.MaquetteUE_id_fk == ue_src.MaquetteUE_id)
+        .join(ue_dst, vers_cible)
+        .where(*filtre)
+    ).on_conflict_do_nothing()
+
+    vol = aliased(VolumeHoraire)
+    ins_vol = pg_insert(VolumeHoraire).from_select(
+        ["Volume_id", "MaquetteEC_id_fk", "TypeEnseignement_id_fk", "Volume_heures"],
+        select(
+            sql_key_id("VOLH", ec_dst.MaquetteEC_id, vol.TypeEnseignement_id_fk),
+            ec_dst.MaquetteEC_id, vol.TypeEnseignement_id_fk, vol.Volume_heures,
+        )
+        .select_from(vol)
+        .join(ec_src, vol.MaquetteEC_id_fk == ec_src.MaquetteEC_id)
+        .join(ue_src, ec_src.MaquetteUE_id_fk == ue_src.MaquetteUE_id)
+        .join(ue_dst, vers_cible)
+        .join(ec_dst, and_(ec_dst.MaquetteUE_id_fk == ue_dst.MaquetteUE_id, ec_dst.EC_id_fk == ec_src.EC_id_fk))
+        .where(*filtre)
+    ).on_conflict_do_nothing()
+
+    stats = {}
+    try:
+        stats["maquettes_ue"] = session.execute(ins_ue).rowcount
+        stats["maquettes_ec"] = session.execute(ins_ec).rowcount
+        stats["volumes_horaires"] = session.execute(ins_vol).rowcount
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [CLONAGE] Erreur : {e}")
+        raise
+
+    print(f"✅ Lignes créées dans {cible_id} : {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Maquettes : import Excel et clonage d'année")
+    parser.add_argument("--import", dest="importer", action="store_true",
+                        help="Importe le classeur (défaut : config.MAQUETTES_FILE_PATH)")
+    parser.add_argument("--fichier", default=None)
+    parser.add_argument("--cloner", nargs=2, metavar=("SOURCE", "CIBLE"), default=None,
+                        help="Années universitaires (ex. 2024-2025 2025-2026)")
+    parser.add_argument("--parcours", nargs="*", default=None, help="Codes parcours (défaut : tous)")
+    args = parser.parse_args()
+
+    session = get_session()
+    try:
+        if args.importer:
+            import_maquettes_to_db(session, args.fichier)
+        if args.cloner:
+            cloner_maquettes(session, *args.cloner, parcours=args.parcours)
+    finally:
+        session.close()
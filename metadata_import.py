@@ -1,6 +1,5 @@
 import pandas as pd
 import sys
-from tqdm import tqdm
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 import pandas as pd
@@ -10,7 +9,8 @@ import config
 from models import (
     Institution, Composante, Domaine, Mention, Parcours, TypeFormation
 )
-from fixed_references import _generate_id
+from id_allocator import IdAllocator
+from repository import invalider_cache
 
 def safe_string(s):
     if s is None or not isinstance(s, str):
@@ -21,39 +21,35 @@ def safe_string(s):
 # ----------------------------
 # 1. Import Institutions
 # ----------------------------
-def _import_institutions(session: Session):
+def _col(df, name):
+    """Colonne nettoyée (safe_string) ou None si absente du fichier."""
+    return df[name].map(safe_string) if name in df.columns else None
+
+
+def _import_institutions(session: Session, ids: IdAllocator):
     print("\n--- Importation Institutions ---")
     df = pd.read_excel(config.INSTITUTION_FILE_PATH)
     df.columns = df.columns.str.lower().str.replace(" ", "_")
-    df = df.where(pd.notnull(df), None)
 
     if "institution_code" not in df.columns:
         print("❌ Colonne institution_code absente.")
         return {}
 
-    df = df.drop_duplicates(subset=["institution_code"]).dropna(subset=["institution_code"])
-
-    mapping = {}
-    counter = 0
+    df["institution_code"] = df["institution_code"].map(safe_string)
+    df = df.dropna(subset=["institution_code"]).drop_duplicates(subset=["institution_code"])
 
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Institutions"):
-        counter += 1
-        inst_code = safe_string(row["institution_code"])
-        inst_id = _generate_id("INST", counter)
-        mapping[inst_code] = inst_id
-
-        session.merge(Institution(
-            Institution_id=inst_id,
-            Institution_code=inst_code,
-            Institution_nom=safe_string(row.get("institution_nom")),
-            Institution_type=safe_string(row.get("institution_type")),
-            Institution_description=safe_string(row.get("institution_description")),
-            Institution_abbreviation=safe_string(row.get("institution_abbreviation")),
-            Institution_logo_path=None
-        ))
+    rows = pd.DataFrame({
+        "Institution_code": df["institution_code"],
+        "Institution_nom": _col(df, "institution_nom"),
+        "Institution_type": _col(df, "institution_type"),
+        "Institution_description": _col(df, "institution_description"),
+        "Institution_abbreviation": _col(df, "institution_abbreviation"),
+        # Institution_logo_path absent : l'upsert conserve le chemin posé par logos_import
+    })
+    rows = ids.upsert(Institution, "INST", rows, ["Institution_code"], constraint="uq_institution_code")
 
     session.commit()
-    return mapping
+    return dict(zip(rows["Institution_code"], rows["Institution_id"]))
 
 
 # ----------------------------
@@ -83,130 +79,75 @@ def _load_and_clean_metadata():
 # ----------------------------
 # 3. Import Composantes
 # ----------------------------
-def _import_composantes(session: Session, df, inst_map):
+def _import_composantes(session: Session, df, inst_map, ids: IdAllocator):
     print("\n--- Importation Composantes ---")
     dfc = df[["composante_code", "composante_label",
-              "institution_code", "composante_abbreviation"]].drop_duplicates()
-
-    mapping = {}
-    counter = 0
-
-    for _, row in tqdm(dfc.iterrows(), total=len(dfc), desc="Composantes"):
-
-        inst_id_fk = inst_map.get(row["institution_code"])
-        if not inst_id_fk:
-            print(f"⚠️ Institution inconnue pour composante {row['composante_code']}")
-            continue
+              "institution_code", "composante_abbreviation"]].dropna(subset=["composante_code"]).drop_duplicates()
 
-        counter += 1
-        comp_id = _generate_id("COMP", counter)
-        mapping[row["composante_code"]] = comp_id
+    inst_fk = dfc["institution_code"].map(inst_map)
+    for code in dfc.loc[inst_fk.isna(), "composante_code"]:
+        print(f"⚠️ Institution inconnue pour composante {code}")
+    dfc, inst_fk = dfc.loc[inst_fk.notna()], inst_fk.loc[inst_fk.notna()]
 
-        session.merge(Composante(
-            Composante_id=comp_id,
-            Composante_code=row["composante_code"],
-            Composante_label=safe_string(row["composante_label"]),
-            Composante_abbreviation=safe_string(row["composante_abbreviation"]),
-            Institution_id_fk=inst_id_fk,
-        ))
+    rows = pd.DataFrame({
+        "Composante_code": dfc["composante_code"],
+        "Composante_label": dfc["composante_label"].map(safe_string),
+        "Composante_abbreviation": dfc["composante_abbreviation"].map(safe_string),
+        "Institution_id_fk": inst_fk,
+    })
+    rows = ids.upsert(Composante, "COMP", rows, ["Composante_code"], constraint="uq_composante_code")
 
     session.commit()
-    return mapping
+    return dict(zip(rows["Composante_code"], rows["Composante_id"]))
 
 
 # ----------------------------
 # 4. Import Domaines
 # ----------------------------
-def _import_domaines(session: Session, df):
+def _import_domaines(session: Session, df, ids: IdAllocator):
     print("\n--- Importation Domaines ---")
-    dfd = df[["domaine_code", "domaine_label"]].drop_duplicates()
+    dfd = df[["domaine_code", "domaine_label"]].dropna(subset=["domaine_code"]).drop_duplicates()
 
-    mapping = {}
-    counter = 0
-
-    for _, row in tqdm(dfd.iterrows(), total=len(dfd), desc="Domaines"):
-        dom_code = row["domaine_code"]
-
-        # Vérifier si le domaine existe déjà
-        existing = session.query(Domaine).filter_by(Domaine_code=dom_code).first()
-
-        if existing:
-            # Mise à jour éventuelle
-            existing.Domaine_label = safe_string(row["domaine_label"])
-            mapping[dom_code] = existing.Domaine_id
-            continue
-
-        # Sinon → insertion
-        counter += 1
-        doma_id = _generate_id("DOMA", counter)
-        mapping[dom_code] = doma_id
-
-        new_dom = Domaine(
-            Domaine_id=doma_id,
-            Domaine_code=dom_code,
-            Domaine_label=safe_string(row["domaine_label"]),
-        )
-        session.add(new_dom)
+    rows = pd.DataFrame({
+        "Domaine_code": dfd["domaine_code"],
+        "Domaine_label": dfd["domaine_label"].map(safe_string),
+    })
+    # Domaine_code : contrainte unique non nommée -> conflit sur la colonne
+    rows = ids.upsert(Domaine, "DOMA", rows, ["Domaine_code"])
 
     session.commit()
-    return mapping
+    return dict(zip(rows["Domaine_code"], rows["Domaine_id"]))
 
 
 # ----------------------------
 # 5. Import Mentions
 # ----------------------------
-def _import_mentions(session: Session, df, comp_map, doma_map):
+def _import_mentions(session: Session, df, comp_map, doma_map, ids: IdAllocator):
     print("\n--- Importation Mentions ---")
     dfm = df[[
         "mention_code", "mention_label",
         "composante_code", "domaine_code",
         "mention_abbreviation"
-    ]].drop_duplicates()
-
-    mapping = {}
-    counter = 0
-
-    for _, row in tqdm(dfm.iterrows(), total=len(dfm), desc="Mentions"):
-        ment_code = row["mention_code"]
-        comp_fk = comp_map.get(row["composante_code"])
-        doma_fk = doma_map.get(row["domaine_code"])
-
-        if not comp_fk or not doma_fk:
-            print(f"⚠️ Composante/Domaine introuvable pour mention {ment_code}")
-            continue
-
-        # Vérifier si la mention existe déjà
-        existing = (
-            session.query(Mention)
-            .filter_by(Mention_code=ment_code, Composante_id_fk=comp_fk)
-            .first()
-        )
-
-        if existing:
-            # Mise à jour
-            existing.Mention_label = safe_string(row["mention_label"])
-            existing.Mention_abbreviation = safe_string(row["mention_abbreviation"])
-            existing.Domaine_id_fk = doma_fk
-            mapping[ment_code] = existing.Mention_id
-            continue
-
-        # Sinon insertion
-        counter += 1
-        ment_id = _generate_id("MENT", counter)
-        mapping[ment_code] = ment_id
-
-        new_mention = Mention(
-            Mention_id=ment_id,
-            Mention_code=ment_code,
-            Mention_label=row["mention_label"],
-            Mention_abbreviation=row["mention_abbreviation"],
-            Composante_id_fk=comp_fk,
-            Domaine_id_fk=doma_fk,
-        )
-        session.add(new_mention)
+    ]].dropna(subset=["mention_code"]).drop_duplicates()
+
+    comp_fk = dfm["composante_code"].map(comp_map)
+    doma_fk = dfm["domaine_code"].map(doma_map)
+    ok = comp_fk.notna() & doma_fk.notna()
+    for code in dfm.loc[~ok, "mention_code"]:
+        print(f"⚠️ Composante/Domaine introuvable pour mention {code}")
+
+    rows = pd.DataFrame({
+        "Mention_code": dfm["mention_code"],
+        "Mention_label": dfm["mention_label"],
+        "Mention_abbreviation": dfm["mention_abbreviation"],
+        "Composante_id_fk": comp_fk,
+        "Domaine_id_fk": doma_fk,
+    }).loc[ok]
+    rows = ids.upsert(Mention, "MENT", rows, ["Mention_code", "Composante_id_fk"],
+                      constraint="unique_mention_code_composante")
 
     session.commit()
-    return mapping
+    return dict(zip(rows["Mention_code"], rows["Mention_id"]))
 
 
 # ----------------------------
@@ -233,66 +174,37 @@ def _clean_date(value):
         return None
 
 
-def _import_parcours(session: Session, df, ment_map):
+def _import_parcours(session: Session, df, ment_map, ids: IdAllocator):
     print("\n--- Importation Parcours ---")
     dfp = df[[
         "parcours_code", "parcours_label", "mention_code",
         "date_creation", "date_fin", "typeformation_code",
         "parcours_abbreviation"
-    ]].drop_duplicates()
+    ]].dropna(subset=["parcours_code"]).drop_duplicates()
 
     # Mapping TypeFormation
     t_map = {c: i for c, i in session.query(TypeFormation.TypeFormation_code,
                                            TypeFormation.TypeFormation_id).all()}
 
-    mapping = {}
-    counter = 0
-
-    for _, row in tqdm(dfp.iterrows(), total=len(dfp), desc="Parcours"):
-        ment_fk = ment_map.get(row["mention_code"])
-        if not ment_fk:
-            print(f"⚠️ Mention inconnue pour parcours {row['parcours_code']}")
-            continue
+    ment_fk = dfp["mention_code"].map(ment_map)
+    for code in dfp.loc[ment_fk.isna(), "parcours_code"]:
+        print(f"⚠️ Mention inconnue pour parcours {code}")
 
+    rows = pd.DataFrame({
+        "Parcours_code": dfp["parcours_code"],
+        "Parcours_label": dfp["parcours_label"],
+        "Parcours_abbreviation": dfp["parcours_abbreviation"],
+        "Mention_id_fk": ment_fk,
+        "Parcours_type_formation_defaut_id_fk": dfp["typeformation_code"].map(t_map),
         # Nettoyage des dates
-        date_creation = _clean_date(row.get("date_creation"))
-        date_fin = _clean_date(row.get("date_fin"))
-
-        # Vérifier si le parcours existe déjà
-        existing = session.query(Parcours).filter_by(
-            Parcours_code=row["parcours_code"],
-            Mention_id_fk=ment_fk
-        ).first()
-
-        if existing:
-            # Mise à jour seulement
-            existing.Parcours_label = row["parcours_label"]
-            existing.Parcours_abbreviation = row["parcours_abbreviation"]
-            existing.Parcours_type_formation_defaut_id_fk = t_map.get(row["typeformation_code"])
-            existing.Parcours_date_creation = date_creation
-            existing.Parcours_date_fin = date_fin
-
-            mapping[row["parcours_code"]] = existing.Parcours_id
-            continue
-
-        # Insertion nouvelle
-        counter += 1
-        parc_id = _generate_id("PARC", counter)
-        mapping[row["parcours_code"]] = parc_id
-
-        session.add(Parcours(
-            Parcours_id=parc_id,
-            Parcours_code=row["parcours_code"],
-            Parcours_label=row["parcours_label"],
-            Parcours_abbreviation=row["parcours_abbreviation"],
-            Mention_id_fk=ment_fk,
-            Parcours_type_formation_defaut_id_fk=t_map.get(row["typeformation_code"]),
-            Parcours_date_creation=date_creation,
-            Parcours_date_fin=date_fin
-        ))
+        "Parcours_date_creation": dfp["date_creation"].map(_clean_date),
+        "Parcours_date_fin": dfp["date_fin"].map(_clean_date),
+    }).loc[ment_fk.notna()]
+    rows = ids.upsert(Parcours, "PARC", rows, ["Parcours_code", "Mention_id_fk"],
+                      constraint="unique_parcours_code_mention")
 
     session.commit()
-    return mapping
+    return dict(zip(rows["Parcours_code"], rows["Parcours_id"]))
 
 
 # ----------------------------
@@ -300,14 +212,17 @@ def _import_parcours(session: Session, df, ment_map):
 # ----------------------------
 def import_metadata_to_db(session: Session):
 
-    inst_map = _import_institutions(session)
+    ids = IdAllocator(session)
+
+    inst_map = _import_institutions(session, ids)
     df = _load_and_clean_metadata()
     if df is None:
         return
 
-    comp_map = _import_composantes(session, df, inst_map)
-    doma_map = _import_domaines(session, df)
-    ment_map = _import_mentions(session, df, comp_map, doma_map)
-    _import_parcours(session, df, ment_map)
+    comp_map = _import_composantes(session, df, inst_map, ids)
+    doma_map = _import_domaines(session, df, ids)
+    ment_map = _import_mentions(session, df, comp_map, doma_map, ids)
+    _import_parcours(session, df, ment_map, ids)
 
+    invalider_cache("structure")
     print("✅ Importation métadonnées terminée.")
@@ -1,7 +1,7 @@
 # models.py
 from sqlalchemy import (
-    Column, Integer, String, Date, Numeric, ForeignKey,
-    UniqueConstraint, Text, Boolean, CheckConstraint
+    Column, Integer, BigInteger, SmallInteger, String, Date, Numeric, ForeignKey,
+    UniqueConstraint, Text, Boolean, CheckConstraint, Identity, Index, DateTime, func
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -561,6 +561,276 @@ class SuiviCreditCycle(Base):
     cycle = relationship("Cycle", back_populates="suivi_credits")
 
 
+class ResultatARecalculer(Base):
+    """FILE DES RÉSULTATS À RECALCULER
+    Une ligne par (Etudiant, MaquetteUE, Session) touchée par une écriture de notes.
+    Vidée par le recalcul incrémental (resultats_engine.recalculer_resultats_modifies).
+    """
+    __tablename__ = 'resultats_a_recalculer'
+
+    Etudiant_id_fk = Column(String(50), ForeignKey('etudiants.Etudiant_id'), primary_key=True)
+    MaquetteUE_id_fk = Column(String(50), ForeignKey('maquettes_ue.MaquetteUE_id'), primary_key=True)
+    SessionExamen_id_fk = Column(String(8), ForeignKey('sessions_examen.SessionExamen_id'), primary_key=True)
+
+
+class DoublonEtudiantCandidat(Base):
+    """FILE DE REVUE DES DOUBLONS D'ÉTUDIANTS
+    Une ligne par paire (A, B) avec A < B, produite par doublons_etudiants.
+    Le statut (A_VERIFIER / CONFIRME / REJETE) est posé par la revue et
+    n'est jamais écrasé par une nouvelle détection.
+    """
+    __tablename__ = 'doublons_etudiants_candidats'
+    __table_args__ = (
+        # Ordre binaire (COLLATE "C") : celui de la comparaison de chaînes Python qui ordonne les paires
+        CheckConstraint('"Etudiant_id_a" COLLATE "C" < "Etudiant_id_b" COLLATE "C"', name='ck_doublon_paire_ordonnee'),
+        {'extend_existing': True}
+    )
+
+    Etudiant_id_a = Column(String(50), ForeignKey('etudiants.Etudiant_id'), primary_key=True)
+    Etudiant_id_b = Column(String(50), ForeignKey('etudiants.Etudiant_id'), primary_key=True)
+
+    DoublonEtudiantCandidat_score = Column(Numeric(4, 3), nullable=False)
+    DoublonEtudiantCandidat_motifs = Column(String(100))  # clés de blocage partagées
+    DoublonEtudiantCandidat_statut = Column(String(20), default='A_VERIFIER', nullable=False)
+    DoublonEtudiantCandidat_date_detection = Column(Date)
+
+
+class Trajectoire(Base):
+    """TRAJECTOIRES DES ÉTUDIANTS
+    Une ligne par (Etudiant, Année) : inscription principale de l'année (niveau le plus
+    élevé) et sa place dans le parcours de l'étudiant (rang, année et niveau d'entrée,
+    événement par rapport à l'année précédente, année d'inscription suivante).
+    Dérivée des inscriptions et rafraîchie par trajectoires.rafraichir_trajectoires.
+    """
+    __tablename__ = 'trajectoires'
+    __table_args__ = (
+        Index('ix_trajectoire_cohorte', 'Trajectoire_entree_annee_ordre', 'Trajectoire_entree_niveau_ordre'),
+        Index('ix_trajectoire_annee_niveau', 'AnneeUniversitaire_ordre', 'Niveau_ordre'),
+        {'extend_existing': True}
+    )
+
+    Etudiant_id_fk = Column(String(50), ForeignKey('etudiants.Etudiant_id'), primary_key=True)
+    AnneeUniversitaire_id_fk = Column(String(9), ForeignKey('annees_universitaires.AnneeUniversitaire_id'), primary_key=True)
+    AnneeUniversitaire_ordre = Column(Integer, nullable=False)
+    Parcours_id_fk = Column(String(15), ForeignKey('parcours.Parcours_id'), nullable=False)
+    Niveau_id_fk = Column(String(10), ForeignKey('niveaux.Niveau_id'), nullable=False)
+    Niveau_ordre = Column(SmallInteger)  # parcours_niveaux.ORDRE (L1 = 1 ... D3 = 8)
+
+    Trajectoire_rang = Column(SmallInteger, nullable=False)  # 1 = première année d'inscription
+    Trajectoire_entree_annee_ordre = Column(Integer, nullable=False)
+    Trajectoire_entree_niveau_ordre = Column(SmallInteger)
+    # ENTREE / PASSAGE / REDOUBLEMENT / RETROGRADATION / REPRISE (après interruption)
+    Trajectoire_evenement = Column(String(15), nullable=False)
+    Trajectoire_is_changement_parcours = Column(Boolean, default=False, nullable=False)
+    Trajectoire_suivante_annee_ordre = Column(Integer)  # NULL : dernière inscription connue
+
+
+class JournalModification(Base):
+    """JOURNAL DES MODIFICATIONS (capture des changements)
+    Une ligne par ligne insérée (I), modifiée (U) ou supprimée (D) dans une table suivie,
+    écrite par les triggers de journal_modifications.py. Le couple (txid, id) sert de
+    curseur aux consommateurs (reporting, portails), qui lisent les deltas par paquets.
+    """
+    __tablename__ = 'journal_modifications'
+    __table_args__ = (
+        Index('ix_journal_curseur', 'JournalModification_txid', 'JournalModification_id'),
+        {'extend_existing': True}
+    )
+
+    JournalModification_id = Column(BigInteger, Identity(), primary_key=True)
+    JournalModification_table = Column(String(40), nullable=False)
+    JournalModification_cle = Column(String(150), nullable=False)  # colonnes de clé jointes par '|'
+    JournalModification_operation = Column(String(1), nullable=False)  # I / U / D
+    JournalModification_run = Column(String(40))  # run d'import (journal_modifications.demarrer_run)
+    JournalModification_txid = Column(BigInteger, server_default=func.txid_current(), nullable=False)
+    JournalModification_date = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+# ===================================================================
+# --- SCHÉMA COMPACT (config.SCHEMA_CLES = "compact") ---
+# ===================================================================
+# Les tables volumineuses sont stockées avec des clés entières ; les tables
+# "inscriptions", "notes", "resultats_ue" et "resultats_semestre" deviennent
+# des vues qui redonnent les codes texte (voir cles_compactes.py).
+
+_SK = 'cles_compactes.CleCompacte_sk'
+
+
+class CleCompacte(Base):
+    """CORRESPONDANCE CODE TEXTE <-> CLÉ ENTIÈRE
+    Une ligne par (table cible, code) ; la clé est unique toutes tables confondues,
+    ce qui permet aux vues de décoder par une seule jointure sur CleCompacte_sk.
+    """
+    __tablename__ = 'cles_compactes'
+    __table_args__ = (
+        UniqueConstraint('CleCompacte_sk', name='uq_cle_compacte_sk'),
+        {'extend_existing': True}
+    )
+
+    CleCompacte_entite = Column(String(40), primary_key=True)   # table cible (ex. 'etudiants')
+    CleCompacte_code = Column(String(100), primary_key=True)    # ID texte de la table cible
+    CleCompacte_sk = Column(Integer, Identity(), nullable=False)
+
+
+class InscriptionCompacte(Base):
+    __tablename__ = 'inscriptions_compactes'
+    __table_args__ = (
+        UniqueConstraint('Inscription_id', name='uq_inscription_id_sk'),
+        UniqueConstraint(
+            'Etudiant_sk', 'AnneeUniversitaire_sk', 'Parcours_sk', 'Semestre_sk',
+            name='uq_etudiant_annee_parcours_semestre_sk'
+        ),
+        {'extend_existing': True}
+    )
+
+    Inscription_sk = Column(BigInteger, Identity(), primary_key=True)
+    Inscription_id = Column(String(100), nullable=False)
+    Etudiant_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    AnneeUniversitaire_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    Parcours_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    Semestre_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    ModeInscription_sk = Column(Integer, ForeignKey(_SK), nullable=True)
+
+    Inscription_date = Column(Date, nullable=False)
+    Inscription_credit_acquis_semestre = Column(Integer, default=0)
+    Inscription_is_semestre_valide = Column(Boolean, default=False)
+
+
+class NoteCompacte(Base):
+    __tablename__ = 'notes_compactes'
+    __table_args__ = (
+        UniqueConstraint('Note_id', name='uq_note_id_sk'),
+        UniqueConstraint(
+            'Etudiant_sk', 'EC_sk', 'AnneeUniversitaire_sk', 'SessionExamen_sk',
+            name='uq_etudiant_ec_annee_session_sk'
+        ),
+        {'extend_existing': True}
+    )
+
+    Note_sk = Column(BigInteger, Identity(), primary_key=True)
+    Note_id = Column(String(50), nullable=False)
+    Etudiant_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    EC_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    AnneeUniversitaire_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    SessionExamen_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+
+    Note_valeur = Column(Numeric(5, 2), nullable=False)
+
+
+class ResultatSemestreCompact(Base):
+    __tablename__ = 'resultats_semestre_compacts'
+    __table_args__ = (
+        UniqueConstraint('ResultatSemestre_id', name='uq_resultat_semestre_id_sk'),
+        UniqueConstraint('Etudiant_sk', 'Semestre_sk', 'AnneeUniversitaire_sk', 'SessionExamen_sk',
+                         name='uq_resultat_semestre_session_sk'),
+        {'extend_existing': True}
+    )
+
+    ResultatSemestre_sk = Column(BigInteger, Identity(), primary_key=True)
+    ResultatSemestre_id = Column(String(50), nullable=False)
+    Etudiant_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    Semestre_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    AnneeUniversitaire_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    SessionExamen_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+
+    ResultatSemestre_statut_validation = Column(String(5), nullable=False)
+    ResultatSemestre_credits_acquis = Column(Numeric(4, 1))
+    ResultatSemestre_moyenne_obtenue = Column(Numeric(4, 2))
+
+
+class ResultatUECompact(Base):
+    __tablename__ = 'resultats_ue_compacts'
+    __table_args__ = (
+        UniqueConstraint('ResultatUE_id', name='uq_resultat_ue_id_sk'),
+        UniqueConstraint('Etudiant_sk', 'MaquetteUE_sk', 'SessionExamen_sk',
+                         name='uq_resultat_maquette_session_sk'),
+        {'extend_existing': True}
+    )
+
+    ResultatUE_sk = Column(BigInteger, Identity(), primary_key=True)
+    ResultatUE_id = Column(String(50), nullable=False)
+    Etudiant_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    MaquetteUE_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+    SessionExamen_sk = Column(Integer, ForeignKey(_SK), nullable=False)
+
+    ResultatUE_moyenne = Column(Numeric(4, 2), nullable=False)
+    ResultatUE_is_acquise = Column(Boolean, default=False, nullable=False)
+    ResultatUE_credit_obtenu = Column(Integer, default=0, nullable=False)
+
+
+# ===================================================================
+# --- HISTORIQUE PAR PLAGES (config.HISTORY_MODE = "plages") ---
+# ===================================================================
+# Une ligne par période de validité (années consécutives, bornes = AnneeUniversitaire_ordre
+# incluses) au lieu d'une ligne par année ; nouvelle ligne seulement si le code ou le
+# libellé change. Les tables *_historique deviennent des vues qui redonnent une ligne
+# par année (voir historique_plages.py). Clé primaire (entité, début) : la recherche
+# "libellé en vigueur l'année X" est un parcours d'index.
+
+class InstitutionHistoriquePlage(Base):
+    __tablename__ = 'institutions_historique_plages'
+    __table_args__ = (
+        CheckConstraint('"AnneeUniversitaire_debut_ordre" <= "AnneeUniversitaire_fin_ordre"',
+                        name='ck_institution_plage_bornes'),
+        {'extend_existing': True}
+    )
+    Institution_id_fk = Column(String(10), ForeignKey('institutions.Institution_id'), primary_key=True)
+    AnneeUniversitaire_debut_ordre = Column(Integer, primary_key=True)
+    AnneeUniversitaire_fin_ordre = Column(Integer, nullable=False)
+    Institution_nom_historique = Column(String(255))
+    Institution_code_historique = Column(String(32))
+    Institution_description_historique = Column(Text)
+    Institution_abbreviation_historique = Column(String(20))
+
+
+class ComposanteHistoriquePlage(Base):
+    __tablename__ = 'composantes_historique_plages'
+    __table_args__ = (
+        CheckConstraint('"AnneeUniversitaire_debut_ordre" <= "AnneeUniversitaire_fin_ordre"',
+                        name='ck_composante_plage_bornes'),
+        {'extend_existing': True}
+    )
+    Composante_id_fk = Column(String(12), ForeignKey('composantes.Composante_id'), primary_key=True)
+    AnneeUniversitaire_debut_ordre = Column(Integer, primary_key=True)
+    AnneeUniversitaire_fin_ordre = Column(Integer, nullable=False)
+    Composante_label_historique = Column(String(100))
+    Composante_code_historique = Column(String(50))
+    Composante_description_historique = Column(Text)
+    Composante_abbreviation_historique = Column(String(20))
+
+
+class MentionHistoriquePlage(Base):
+    __tablename__ = 'mentions_historique_plages'
+    __table_args__ = (
+        CheckConstraint('"AnneeUniversitaire_debut_ordre" <= "AnneeUniversitaire_fin_ordre"',
+                        name='ck_mention_plage_bornes'),
+        {'extend_existing': True}
+    )
+    Mention_id_fk = Column(String(12), ForeignKey('mentions.Mention_id'), primary_key=True)
+    AnneeUniversitaire_debut_ordre = Column(Integer, primary_key=True)
+    AnneeUniversitaire_fin_ordre = Column(Integer, nullable=False)
+    Mention_label_historique = Column(String(100))
+    Mention_code_historique = Column(String(30))
+    Mention_description_historique = Column(Text)
+    Mention_abbreviation_historique = Column(String(20))
+
+
+class ParcoursHistoriquePlage(Base):
+    __tablename__ = 'parcours_historique_plages'
+    __table_args__ = (
+        CheckConstraint('"AnneeUniversitaire_debut_ordre" <= "AnneeUniversitaire_fin_ordre"',
+                        name='ck_parcours_plage_bornes'),
+        {'extend_existing': True}
+    )
+    Parcours_id_fk = Column(String(15), ForeignKey('parcours.Parcours_id'), primary_key=True)
+    AnneeUniversitaire_debut_ordre = Column(Integer, primary_key=True)
+    AnneeUniversitaire_fin_ordre = Column(Integer, nullable=False)
+    Parcours_label_historique = Column(String(100))
+    Parcours_code_historique = Column(String(50))
+    Parcours_description_historique = Column(Text)
+    Parcours_abbreviation_historique = Column(String(20))
+
+
 # ===================================================================
 # --- GESTION DES ENSEIGNANTS, VOLUMES ET ATTRIBUTIONS ---
 # ===================================================================
@@ -657,4 +927,11 @@ class Jury(Base):
 
     def __repr__(self):
         return (f"<Jury Semestre {self.Semestre_id_fk} (Annee: {self.AnneeUniversitaire_id_fk}, Session: {self.SessionExamen_id_fk}) "
-                f"Président: {self.Enseignant_id_fk}>")
\ No newline at end of file
+                f"Président: {self.Enseignant_id_fk}>")
+
+# Clés étrangères DEFERRABLE INITIALLY IMMEDIATE : vérifiées à chaque ordre comme avant,
+# différées jusqu'au COMMIT dans database_setup.bulk_load (SET CONSTRAINTS ALL DEFERRED).
+# Les contraintes d'unicité restent immédiates : ON CONFLICT n'accepte pas d'arbitre différable.
+for _table in Base.metadata.tables.values():
+    for _fk in _table.foreign_key_constraints:
+        _fk.deferrable, _fk.initially = True, "IMMEDIATE"
@@ -0,0 +1,220 @@
+import glob
+import os
+
+import pandas as pd
+import numpy as np
+from sqlalchemy.orm import Session
+
+import config
+from models import (
+    Etudiant, Note, ElementConstitutif, AnneeUniversitaire, SessionExamen
+)
+from metadata_import import safe_string
+from bulk_utils import bulk_upsert_changed, make_key_ids
+from suivi_notes import marquer_notes_modifiees, NOTE_KEY
+
+# Colonnes d'identification attendues dans une feuille de délibération.
+# Toutes les autres colonnes sont considérées comme des colonnes d'EC (en-tête = EC_code).
+ID_COLS = ["etudiant_id", "anneeuniversitaire_annee", "sessionexamen_code"]
+
+# Colonnes descriptives tolérées (ignorées sans avertissement)
+INFO_COLS = [
+    "etudiant_nom", "etudiant_prenoms", "etudiant_numero_inscription",
+    "parcours_code", "niveau_code", "semestre_numero", "mention_abbreviation",
+    "composante_code", "institution_code",
+]
+
+# Bornes de validation : notes sur 20, stockées en Numeric(5, 2)
+NOTE_MIN = 0
+NOTE_MAX = 20
+
+
+# ----------------------------
+# Lecture des feuilles larges
+# ----------------------------
+def _list_notes_files(source=None):
+    source = source or config.NOTES_FOLDER_PATH
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, "*.xlsx")))
+    else:
+        files = sorted(glob.glob(source))
+    return [f for f in files if not os.path.basename(f).startswith("~$")]
+
+
+def _melt_sheet(df: pd.DataFrame, ec_codes: set, default_session, origin: str):
+    """
+    Passe une feuille large (une colonne par EC) au format long
+    (etudiant_id, anneeuniversitaire_annee, sessionexamen_code, ec_code, note_brute).
+    """
+    df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(" ", "_")
+
+    if "etudiant_id" not in df.columns or "anneeuniversitaire_annee" not in df.columns:
+        print(f"⚠️ [{origin}] Colonnes etudiant_id / anneeuniversitaire_annee absentes, feuille ignorée.")
+        return None, []
+
+    if "sessionexamen_code" not in df.columns:
+        df["sessionexamen_code"] = default_session
+
+    ec_cols = [c for c in df.columns if c.upper() in ec_codes]
+    unknown = [c for c in df.columns if c not in ec_cols and c not in ID_COLS and c not in INFO_COLS
+               and not c.startswith("unnamed")]
+
+    if not ec_cols:
+        print(f"⚠️ [{origin}] Aucune colonne d'EC reconnue, feuille ignorée.")
+        return None, unknown
+
+    long_df = df.melt(
+        id_vars=ID_COLS, value_vars=ec_cols,
+        var_name="ec_code", value_name="note_brute"
+    )
+    long_df["ec_code"] = long_df["ec_code"].str.upper()
+    long_df["origine"] = origin
+    return long_df, unknown
+
+
+def _load_notes_long(files, ec_codes: set, default_session):
+    frames = []
+    for path in files:
+        try:
+            sheets = pd.read_excel(path, sheet_name=None)
+        except Exception as e:
+            print(f"❌ ERREUR lecture fichier notes {path} : {e}")
+            continue
+
+        for sheet_name, sheet in sheets.items():
+            origin = f"{os.path.basename(path)}:{sheet_name}"
+            long_df, unknown = _melt_sheet(sheet, ec_codes, default_session, origin)
+            if unknown:
+                print(f"   ℹ️ [{origin}] Colonnes ignorées (EC inconnus ?) : {unknown}")
+            if long_df is not None:
+                frames.append(long_df)
+
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+# ----------------------------
+# Mapping helpers
+# ----------------------------
+def _get_ec_mapping(session):
+    return {c.upper(): i for c, i in session.query(ElementConstitutif.EC_code, ElementConstitutif.EC_id)}
+
+def _get_annee_mapping(session):
+    return {a: i for a, i in session.query(AnneeUniversitaire.AnneeUniversitaire_annee,
+                                           AnneeUniversitaire.AnneeUniversitaire_id)}
+
+def _get_session_mapping(session):
+    return {c.upper(): i for c, i in session.query(SessionExamen.SessionExamen_code,
+                                                   SessionExamen.SessionExamen_id)}
+
+def _get_etudiant_ids(session):
+    return {i for (i,) in session.query(Etudiant.Etudiant_id)}
+
+
+# ----------------------------
+# Résolution + validation vectorisées
+# ----------------------------
+def _resolve_and_validate(df: pd.DataFrame, ec_map, annee_map, sess_map, etu_ids):
+    """
+    Résout les clés étrangères et valide les valeurs en une passe sur tout le DataFrame.
+    Retourne (DataFrame prêt pour la table notes, DataFrame des rejets avec motif).
+    """
+    # Les cellules vides ne sont pas des notes (EC non suivi)
+    raw = df["note_brute"]
+    empty = raw.isna() | raw.astype(str).str.strip().isin(["", "nan", "None"])
+    df = df.loc[~empty].copy()
+
+    for c in ["etudiant_id", "anneeuniversitaire_annee", "sessionexamen_code"]:
+        df[c] = df[c].astype(str).map(safe_string)
+    df["sessionexamen_code"] = df["sessionexamen_code"].str.upper()
+
+    # Virgule décimale tolérée ("12,5")
+    valeur = pd.to_numeric(
+        df["note_brute"].astype(str).str.replace(",", ".", regex=False).str.strip(),
+        errors="coerce"
+    )
+    df["Note_valeur"] = valeur.round(2)
+    df["EC_id_fk"] = df["ec_code"].map(ec_map)
+    df["AnneeUniversitaire_id_fk"] = df["anneeuniversitaire_annee"].map(annee_map)
+    df["SessionExamen_id_fk"] = df["sessionexamen_code"].map(sess_map)
+    df["Etudiant_id_fk"] = df["etudiant_id"].where(df["etudiant_id"].isin(etu_ids))
+
+    # Motifs de rejet, du plus bloquant au moins bloquant (le premier trouvé est retenu)
+    checks = [
+        (df["Etudiant_id_fk"].isna(), "ETUDIANT_INCONNU"),
+        (df["AnneeUniversitaire_id_fk"].isna(), "ANNEE_INCONNUE"),
+        (df["SessionExamen_id_fk"].isna(), "SESSION_INCONNUE"),
+        (df["EC_id_fk"].isna(), "EC_INCONNU"),
+        (valeur.isna(), "NOTE_NON_NUMERIQUE"),
+        ((valeur < NOTE_MIN) | (valeur > NOTE_MAX), "NOTE_HORS_BORNES"),
+    ]
+    df["motif_rejet"] = np.select([m for m, _ in checks], [lbl for _, lbl in checks], default="")
+
+    rejets = df.loc[df["motif_rejet"] != "",
+                    ["origine", "etudiant_id", "anneeuniversitaire_annee",
+                     "sessionexamen_code", "ec_code", "note_brute", "motif_rejet"]]
+    ok = df.loc[df["motif_rejet"] == ""]
+
+    key_cols = NOTE_KEY
+
+    # Une même note présente dans deux feuilles : la dernière lue l'emporte
+    ok = ok.drop_duplicates(subset=key_cols, keep="last")
+
+    notes = ok[key_cols + ["Note_valeur"]].copy()
+    notes.insert(0, "Note_id", make_key_ids("NOTE", notes, key_cols))
+    return notes, rejets
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def import_notes_to_db(session: Session, source=None, session_code="N"):
+    """
+    Importe toutes les feuilles de délibération d'une session en une seule passe :
+    lecture + passage au format long de chaque feuille, résolution en masse des
+    étudiants / EC / années / sessions, validation des valeurs, puis UPSERT sur
+    la contrainte uq_etudiant_ec_annee_session.
+
+    - source : dossier ou motif glob (par défaut config.NOTES_FOLDER_PATH)
+    - session_code : session utilisée pour les feuilles sans colonne sessionexamen_code
+    Retourne le DataFrame des notes écrites (colonnes du modèle Note).
+    """
+    print("\n--- Importation Notes (feuilles de délibération) ---")
+
+    files = _list_notes_files(source)
+    if not files:
+        print("⚠️ Aucun fichier de notes trouvé.")
+        return None
+
+    print("🔗 Récupération des mappings...")
+    ec_map = _get_ec_mapping(session)
+    annee_map = _get_annee_mapping(session)
+    sess_map = _get_session_mapping(session)
+    etu_ids = _get_etudiant_ids(session)
+
+    df = _load_notes_long(files, set(ec_map), session_code)
+    if df is None:
+        print("❌ Aucune feuille de notes exploitable.")
+        return None
+
+    notes, rejets = _resolve_and_validate(df, ec_map, annee_map, sess_map, etu_ids)
+
+    if not rejets.empty:
+        print(f"⚠️ {len(rejets)} notes rejetées :")
+        print(rejets["motif_rejet"].value_counts().to_string())
+
+    try:
+        # Seules les notes nouvelles ou dont la valeur change sont réécrites et marquées à recalculer
+        changed = bulk_upsert_changed(session, Note, notes,
+                                      constraint="uq_etudiant_ec_annee_session",
+                                      update_cols=["Note_valeur"], key_cols=NOTE_KEY)
+        marquer_notes_modifiees(session, changed)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [NOTES] Erreur d'insertion en masse : {e}")
+        return None
+
+    print(f"✅ {len(notes)} notes lues depuis {len(files)} fichier(s), {len(changed)} nouvelles ou modifiées.")
+    return notes
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 from models import Inscription, Semestre, Niveau, ParcoursNiveau
+from repository import invalider_cache
 
 # Ordre académique pour déterminer le champ "ordre"
 ORDRE = {
@@ -79,4 +80,5 @@ def deduce_parcours_niveaux(session: Session):
             count += 1
 
     session.commit()
+    invalider_cache("structure")
     print(f"✅ {count} relations Parcours-Niveau (par année) déduites et insérées.")
\ No newline at end of file
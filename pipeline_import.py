@@ -0,0 +1,251 @@
+import queue
+import threading
+import time
+
+import pandas as pd
+
+import config
+from database_setup import engine, get_session
+from models import Etudiant, Inscription
+from bulk_utils import bulk_upsert, separer_lignes_invalides, ecrire_avec_repli, message_erreur
+from repository import invalider_cache
+from inscriptions_import import (
+    _iter_excel_chunks, _clean_inscriptions_frame, _etudiants_frame, _inscriptions_frame,
+    _get_parcours_mapping, _get_semestre_mapping, _get_annee_mapping, _get_mode_mapping,
+    _signaler_rejets, CHUNK_SIZE
+)
+from history_import import ENTITIES_CONFIG, _get_mappings, _add_mention_code, _history_frame
+from metadata_import import safe_string
+
+_FIN = object()
+
+
+# ----------------------------
+# Pipeline producteur / consommateurs
+# ----------------------------
+def run_pipeline(nom, produce, consume, queue_depth=None, n_consumers=None, cle="_cle"):
+    """
+    Exécute une étape en producteur/consommateurs :
+    - produce() : générateur de (payload, deps) ; lecture + nettoyage du paquet N+1
+      pendant que les consommateurs écrivent le paquet N.
+      deps = indices de paquets précédents qui doivent être écrits avant celui-ci.
+    - consume(conn, payload) : écriture d'un paquet (transactions à sa charge) ; chaque
+      thread consommateur garde sa propre connexion du pool. Retourne les lignes non
+      écrites (colonne _motif) ou None.
+    File bornée (queue_depth) : le producteur se bloque si les écritures ne suivent pas.
+    Retourne le rapport d'utilisation de l'étape ; stats["rejets"] : lignes non écrites
+    (identifiées par la colonne `cle`), résumées à la fin de l'étape.
+    """
+    queue_depth = queue_depth or config.PIPELINE_QUEUE_DEPTH
+    n_consumers = n_consumers or config.PIPELINE_CONSUMERS
+
+    q = queue.Queue(maxsize=queue_depth)
+    done = {}
+    errors = []
+    stats = {
+        "producteur_actif": 0.0, "producteur_bloque": 0.0, "paquets": 0,
+        "consommateurs_actif": [0.0] * n_consumers, "consommateurs_attente": [0.0] * n_consumers,
+        "rejets": [],
+    }
+
+    def producer():
+        gen = produce()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = next(gen, _FIN)
+                stats["producteur_actif"] += time.perf_counter() - t0
+                if item is _FIN:
+                    break
+                payload, deps = item
+                idx = stats["paquets"]
+                done[idx] = threading.Event()
+                t0 = time.perf_counter()
+                q.put((idx, payload, deps))
+                stats["producteur_bloque"] += time.perf_counter() - t0
+                stats["paquets"] += 1
+        except Exception as e:
+            errors.append(f"producteur : {e}")
+        finally:
+            for _ in range(n_consumers):
+                q.put(_FIN)
+
+    def consumer(k):
+        with engine.connect() as conn:
+            while True:
+                t0 = time.perf_counter()
+                item = q.get()
+                stats["consommateurs_attente"][k] += time.perf_counter() - t0
+                if item is _FIN:
+                    return
+                idx, payload, deps = item
+                t0 = time.perf_counter()
+                try:
+                    for d in deps:
+                        done[d].wait()
+                    rejets = consume(conn, payload)
+                    if rejets is not None:
+                        stats["rejets"].append(rejets)
+                except Exception as e:
+                    errors.append(f"paquet {idx} : {e}")
+                    if isinstance(payload, pd.DataFrame):
+                        stats["rejets"].append(payload.assign(_motif=f"paquet {idx} : {message_erreur(e)}"))
+                finally:
+                    done[idx].set()
+                    stats["consommateurs_actif"][k] += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=producer, name=f"{nom}-producteur")]
+    threads += [threading.Thread(target=consumer, args=(k,), name=f"{nom}-conso-{k}")
+                for k in range(n_consumers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats["total"] = time.perf_counter() - t0
+
+    for err in errors:
+        print(f"❌ [{nom}] {err}")
+    _signaler_rejets(nom, stats["rejets"], cle)
+    _print_report(nom, stats)
+    stats["erreurs"] = len(errors)
+    return stats
+
+
+def _print_report(nom, stats):
+    total = stats["total"] or 1e-9
+    prod = 100 * stats["producteur_actif"] / total
+    cons = 100 * sum(stats["consommateurs_actif"]) / (total * len(stats["consommateurs_actif"]))
+    goulot = "lecture/nettoyage (producteur)" if prod >= cons else "écriture (consommateurs)"
+    print(f"   ⏱️ [{nom}] {stats['paquets']} paquets en {total:.1f}s | "
+          f"producteur actif {prod:.0f}% (bloqué file pleine {100 * stats['producteur_bloque'] / total:.0f}%) | "
+          f"consommateurs actifs {cons:.0f}% en moyenne")
+    print(f"   🔎 [{nom}] Goulot d'étranglement : {goulot}")
+
+
+# ----------------------------
+# Étapes
+# ----------------------------
+def _clean_chunks(path, chunksize):
+    for raw in _iter_excel_chunks(path, chunksize):
+        yield _clean_inscriptions_frame(raw)
+
+
+def _produce_etudiants(path, chunksize):
+    """Un étudiant n'est écrit qu'avec sa première occurrence dans le fichier."""
+    seen = set()
+    for df in _clean_chunks(path, chunksize):
+        etu = _etudiants_frame(df)
+        etu = etu[~etu["Etudiant_id"].isin(seen)]
+        seen.update(etu["Etudiant_id"])
+        yield etu, ()
+
+
+def _produce_inscriptions(path, chunksize, maps, modifies):
+    """
+    Un code d'inscription répété attend l'écriture du paquet précédent (la dernière occurrence
+    l'emporte). modifies : reçoit les étudiants des inscriptions produites.
+    """
+    last_chunk = {}
+    for idx, df in enumerate(_clean_chunks(path, chunksize)):
+        insc = _inscriptions_frame(df, *maps).drop_duplicates(subset=["Inscription_id"], keep="last")
+        modifies.update(insc["Etudiant_id_fk"])
+        deps = {last_chunk[c] for c in insc["Inscription_id"] if c in last_chunk}
+        last_chunk.update(dict.fromkeys(insc["Inscription_id"], idx))
+        yield insc, deps
+
+
+def _produce_historiques(path, chunksize, maps):
+    """Une ligne par (entité, année) : première occurrence, comme drop_duplicates dans le chemin synchrone."""
+    seen = {ent['type']: set() for ent in ENTITIES_CONFIG}
+    for raw in _iter_excel_chunks(path, chunksize):
+        raw.columns = raw.columns.str.lower().str.replace(' ', '_')
+        df = _add_mention_code(raw.where(pd.notnull(raw), None))
+        payload = []
+        for ent in ENTITIES_CONFIG:
+            if ent['code_col'] not in df.columns:
+                continue
+            cols = ['anneeuniversitaire_annee', ent['code_col']]
+            sub = df.drop_duplicates(subset=cols).dropna(subset=cols)
+            keys = list(zip(sub['anneeuniversitaire_annee'].astype(str), sub[ent['code_col']].map(safe_string)))
+            new = pd.Series([k not in seen[ent['type']] for k in keys], index=sub.index, dtype=bool)
+            seen[ent['type']].update(keys)
+            payload.append((ent, _history_frame(sub.loc[new], ent, maps)))
+        yield payload, ()
+
+
+def _ecrire_valide(conn, model, frame) -> pd.DataFrame:
+    """
+    Lignes invalides écartées, puis upsert (une transaction par paquet) ; un paquet rejeté
+    pour ses données est coupé en sous-paquets. Retourne les lignes non écrites (+ _motif, _cle).
+    """
+    frame, rejets = separer_lignes_invalides(model, frame)
+
+    def ecrire(f):
+        with conn.begin():
+            bulk_upsert(conn, model, f)
+
+    _, rej = ecrire_avec_repli(ecrire, frame)
+    rejets = pd.concat([rejets, rej])
+    pk = [c.name for c in model.__table__.primary_key.columns]
+    return rejets.assign(_cle=rejets[pk].astype(str).agg("|".join, axis=1) if len(rejets) else None)
+
+
+def _write_inscriptions(non_ecrits):
+    """Les inscriptions d'un étudiant non écrit sont écartées (elles échoueraient sur la FK)."""
+    def consume(conn, frame):
+        orphelines = frame["Etudiant_id_fk"].isin(non_ecrits)
+        rejets = frame[orphelines].assign(_motif="étudiant non écrit", _cle=frame["Inscription_id"])
+        return pd.concat([rejets, _ecrire_valide(conn, Inscription, frame[~orphelines])])
+    return consume
+
+
+def _write_historiques(conn, payload):
+    rejets = [_ecrire_valide(conn, ent['orm_class'], frame) for ent, frame in payload]
+    return pd.concat(rejets) if rejets else None
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def import_inscriptions_pipeline(path=None, chunksize=CHUNK_SIZE, queue_depth=None, n_consumers=None,
+                                 with_history=False):
+    """
+    Étapes Étudiants -> Inscriptions (-> Historiques) en pipeline producteur/consommateurs.
+    Les étapes s'enchaînent (les inscriptions référencent les étudiants), chaque étape
+    recouvrant lecture et écriture. Retourne le rapport par étape.
+    """
+    path = path or config.INSCRIPTION_FILE_PATH
+    print("\n--- Importation Étudiants + Inscriptions (pipeline threads) ---")
+
+    session = get_session()
+    try:
+        maps = (_get_parcours_mapping(session), _get_semestre_mapping(session),
+                _get_annee_mapping(session), _get_mode_mapping(session))
+        hist_maps = _get_mappings(session) if with_history else None
+    finally:
+        session.close()
+
+    report = {
+        "etudiants": run_pipeline(
+            "ETUDIANTS", lambda: _produce_etudiants(path, chunksize),
+            lambda conn, frame: _ecrire_valide(conn, Etudiant, frame),
+            queue_depth, n_consumers, cle="Etudiant_id"),
+    }
+    non_ecrits = set()
+    for rejets in report["etudiants"]["rejets"]:
+        non_ecrits.update(rejets["Etudiant_id"])
+    modifies = set()
+    report["inscriptions"] = run_pipeline(
+        "INSCRIPTIONS", lambda: _produce_inscriptions(path, chunksize, maps, modifies),
+        _write_inscriptions(non_ecrits), queue_depth, n_consumers, cle="Inscription_id")
+    if with_history:
+        report["historiques"] = run_pipeline(
+            "HISTORIQUES", lambda: _produce_historiques(path, chunksize, hist_maps),
+            _write_historiques, queue_depth, n_consumers)
+
+    report["etudiants_modifies"] = modifies
+
+    invalider_cache("etudiants", "inscriptions")
+    print("✅ Importation en pipeline terminée.")
+    return report
@@ -0,0 +1,148 @@
+# rapport_memoire_inscriptions.py
+#
+# Rapport mémoire du DataFrame d'inscriptions : nettoyage historique (tout en object)
+# contre nettoyage compact (_clean_inscriptions_frame). Chaque variante tourne dans un
+# processus séparé pour que le RSS mesuré ne dépende pas de l'autre.
+#
+#   python rapport_memoire_inscriptions.py --lignes 500000
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Fichier synthétique
+# ----------------------------
+def generer_inscriptions(n, seed=0):
+    """Colonnes et cardinalités proches du fichier réel ; dtypes tels que rendus par read_excel."""
+    rng = np.random.default_rng(seed)
+    n_etu = max(1, n // 2)
+    etu = rng.integers(0, n_etu, n)
+    annees = [f"{a}-{a + 1}" for a in range(2015, 2025)]
+    parcours = [f"PARC_{i:03d}" for i in range(120)]
+
+    def pick(values, size=n):
+        return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+    naissance = pd.to_datetime("1995-01-01") + pd.to_timedelta(rng.integers(0, 4000, n), unit="D")
+    return pd.DataFrame({
+        "etudiant_id": pd.Series(etu).map(lambda i: f"ETU{i:07d}").astype(object),
+        "etudiant_numero_inscription": pd.Series(etu).map(lambda i: f"N{i:06d}").astype(object),
+        "etudiant_nom": pd.Series(etu).map(lambda i: f"NOM{i % 5000}").astype(object),
+        "etudiant_prenoms": pd.Series(etu).map(lambda i: f"Prenom {i % 20000}").astype(object),
+        "etudiant_sexe": pick(["M", "F"]),
+        "etudiant_naissance_date": naissance.strftime("%d/%m/%Y").astype(object),
+        "etudiant_naissance_lieu": pick([f"Lieu {i}" for i in range(300)]),
+        "etudiant_nationalite": pick(["Malagasy", "Comorienne", "Française"]),
+        "etudiant_bacc_annee": rng.integers(2010, 2024, n).astype(float),
+        "etudiant_bacc_serie": pick(["A1", "A2", "C", "D", "OSE", "Technique"]),
+        "etudiant_bacc_mention": pick(["Passable", "Assez bien", "Bien", "Très bien"]),
+        "etudiant_cin": pd.Series(etu).map(lambda i: f"{101000000000 + i}").astype(object),
+        "inscription_code": [f"INSC{i:08d}" for i in range(n)],
+        "institution_code": pick(["UF"]),
+        "composante_code": pick([f"COMP{i}" for i in range(12)]),
+        "domaine_code": pick([f"DOM{i}" for i in range(8)]),
+        "mention_abbreviation": pick([f"M{i}" for i in range(60)]),
+        "parcours_code": pick(parcours),
+        "niveau_code": pick(["L1", "L2", "L3", "M1", "M2"]),
+        "semestre_numero": rng.integers(1, 11, n),
+        "modeinscription_label": pick(["Classique", "Hybride"]),
+        "anneeuniversitaire_annee": pick(annees),
+    })
+
+
+# ----------------------------
+# Mesures
+# ----------------------------
+def _rss_mo():
+    """RSS du processus courant (psutil si disponible, sinon /proc)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _nettoyage_historique(df):
+    """Nettoyage d'avant la compaction : toutes les colonnes deviennent object."""
+    from metadata_import import safe_string
+
+    df.columns = df.columns.str.lower().str.replace(" ", "_")
+    df = df.where(pd.notnull(df), None)
+    for c in ["etudiant_naissance_date", "etudiant_cin_date"]:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors="coerce", dayfirst=True).dt.date
+    for c in ["parcours_code", "niveau_code", "semestre_numero", "modeinscription_label",
+              "institution_code", "composante_code", "domaine_code",
+              "mention_abbreviation", "etudiant_id", "anneeuniversitaire_annee"]:
+        if c in df.columns:
+            df[c] = df[c].astype(str).apply(safe_string)
+            df[c] = df[c].replace(["None", "nan", ""], None)
+    df["code_semestre_cle"] = df["semestre_numero"].map(lambda s: f"S{int(float(s)):02d}" if s else None)
+    df["code_mode_inscription"] = df["modeinscription_label"].astype(str).str.upper().replace(
+        {"CLASSIQUE": "CLAS", "HYBRIDE": "HYB", "NAN": "CLAS"})
+    return df
+
+
+def _mesurer(variante, chemin):
+    """Exécuté dans un sous-processus : charge le fichier, nettoie, affiche les mesures."""
+    import gc
+    from inscriptions_import import _clean_inscriptions_frame
+
+    brut = pd.read_pickle(chemin)
+    gc.collect()
+    avant = _rss_mo()
+
+    nettoyer = _nettoyage_historique if variante == "historique" else _clean_inscriptions_frame
+    df = nettoyer(brut)
+    del brut
+    gc.collect()
+    apres = _rss_mo()
+
+    print(f"{avant:.1f};{apres:.1f};{df.memory_usage(deep=True).sum() / 2**20:.1f}")
+
+
+def rapport_memoire(n_lignes=500_000):
+    print(f"\n--- Rapport mémoire : {n_lignes} inscriptions synthétiques ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        chemin = os.path.join(tmp, "inscriptions.pkl")
+        generer_inscriptions(n_lignes).to_pickle(chemin)
+
+        resultats = {}
+        for variante in ("historique", "compact"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mesurer", variante, chemin],
+                capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip().splitlines()[-1]
+            resultats[variante] = [float(x) for x in out.split(";")]
+
+    print(f"{'variante':<12}{'RSS avant':>12}{'RSS après':>12}{'DataFrame':>12}  (Mo)")
+    for variante, (avant, apres, frame) in resultats.items():
+        print(f"{variante:<12}{avant:>12.1f}{apres:>12.1f}{frame:>12.1f}")
+    gain = resultats["historique"][2] / max(resultats["compact"][2], 1e-9)
+    print(f"✅ DataFrame {gain:.1f}x plus petit, RSS après nettoyage "
+          f"{resultats['historique'][1] - resultats['compact'][1]:.0f} Mo de moins.")
+    return resultats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rapport mémoire du nettoyage des inscriptions")
+    parser.add_argument("--lignes", type=int, default=500_000)
+    parser.add_argument("--mesurer", nargs=2, metavar=("VARIANTE", "FICHIER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mesurer:
+        _mesurer(*args.mesurer)
+    else:
+        rapport_memoire(args.lignes)
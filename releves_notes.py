@@ -0,0 +1,300 @@
+# releves_notes.py
+#
+# Relevés de notes d'une cohorte (parcours x année) en un nombre fixe de requêtes :
+# chaque table est lue une fois pour toute la cohorte (pas de chargement paresseux
+# Etudiant.notes_obtenues -> Note.element_constitutif -> ... par étudiant),
+# les relevés sont assemblés en mémoire puis rendus par un pool de processus.
+#
+#   python releves_notes.py --parcours INFO_GL --annee 2023-2024 --workers 4
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+
+import config
+from models import (
+    Etudiant, Inscription, Parcours, Mention, AnneeUniversitaire, Semestre, SessionExamen,
+    MaquetteUE, MaquetteEC, UniteEnseignement, ElementConstitutif,
+    Note, ResultatUE, ResultatSemestre
+)
+
+STATUTS = {"V": "Validé", "AJ": "Ajourné", "NV": "Non validé"}
+
+
+# ----------------------------
+# Compteur de requêtes
+# ----------------------------
+@contextmanager
+def compteur_requetes(conn):
+    """Compte les requêtes SQL émises sur une connexion pendant le bloc."""
+    compteur = {"requetes": 0}
+
+    def _compter(*_):
+        compteur["requetes"] += 1
+
+    event.listen(conn, "before_cursor_execute", _compter)
+    try:
+        yield compteur
+    finally:
+        event.remove(conn, "before_cursor_execute", _compter)
+
+
+# ----------------------------
+# Chargement de la cohorte (5 requêtes)
+# ----------------------------
+def _read(conn, stmt) -> pd.DataFrame:
+    return pd.read_sql(stmt, conn)
+
+
+def load_cohorte(conn, parcours_id, annee_id) -> dict:
+    """Étudiants, maquette, notes, résultats UE et résultats semestre de la cohorte."""
+    cohorte = (
+        select(Inscription.Etudiant_id_fk)
+        .where(Inscription.Parcours_id_fk == parcours_id,
+               Inscription.AnneeUniversitaire_id_fk == annee_id)
+        .distinct()
+        .scalar_subquery()
+    )
+
+    etudiants = _read(conn, select(
+        Etudiant.Etudiant_id, Etudiant.Etudiant_numero_inscription, Etudiant.Etudiant_nom,
+        Etudiant.Etudiant_prenoms, Etudiant.Etudiant_naissance_date, Etudiant.Etudiant_naissance_lieu
+    ).where(Etudiant.Etudiant_id.in_(cohorte)).order_by(Etudiant.Etudiant_nom, Etudiant.Etudiant_prenoms))
+
+    maquette = _read(conn, select(
+        MaquetteUE.MaquetteUE_id, MaquetteUE.Semestre_id_fk, MaquetteUE.MaquetteUE_credit,
+        Semestre.Semestre_numero, UniteEnseignement.UE_code, UniteEnseignement.UE_intitule,
+        MaquetteEC.EC_id_fk, MaquetteEC.MaquetteEC_coefficient,
+        ElementConstitutif.EC_code, ElementConstitutif.EC_intitule
+    )
+        .join(Semestre, MaquetteUE.Semestre_id_fk == Semestre.Semestre_id)
+        .join(UniteEnseignement, MaquetteUE.UE_id_fk == UniteEnseignement.UE_id)
+        .join(MaquetteEC, MaquetteEC.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+        .join(ElementConstitutif, MaquetteEC.EC_id_fk == ElementConstitutif.EC_id)
+        .where(MaquetteUE.Parcours_id_fk == parcours_id,
+               MaquetteUE.AnneeUniversitaire_id_fk == annee_id))
+
+    notes = _read(conn, select(
+        Note.Etudiant_id_fk, Note.EC_id_fk, Note.Note_valeur,
+        SessionExamen.SessionExamen_code, SessionExamen.SessionExamen_id
+    )
+        .join(SessionExamen, Note.SessionExamen_id_fk == SessionExamen.SessionExamen_id)
+        .where(Note.Etudiant_id_fk.in_(cohorte), Note.AnneeUniversitaire_id_fk == annee_id))
+
+    res_ue = _read(conn, select(
+        ResultatUE.Etudiant_id_fk, ResultatUE.MaquetteUE_id_fk, ResultatUE.ResultatUE_moyenne,
+        ResultatUE.ResultatUE_is_acquise, ResultatUE.ResultatUE_credit_obtenu,
+        SessionExamen.SessionExamen_code
+    )
+        .join(SessionExamen, ResultatUE.SessionExamen_id_fk == SessionExamen.SessionExamen_id)
+        .join(MaquetteUE, ResultatUE.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+        .where(ResultatUE.Etudiant_id_fk.in_(cohorte),
+               MaquetteUE.Parcours_id_fk == parcours_id,
+               MaquetteUE.AnneeUniversitaire_id_fk == annee_id))
+
+    res_sem = _read(conn, select(
+        ResultatSemestre.Etudiant_id_fk, ResultatSemestre.Semestre_id_fk,
+        ResultatSemestre.ResultatSemestre_moyenne_obtenue, ResultatSemestre.ResultatSemestre_credits_acquis,
+        ResultatSemestre.ResultatSemestre_statut_validation, SessionExamen.SessionExamen_code
+    )
+        .join(SessionExamen, ResultatSemestre.SessionExamen_id_fk == SessionExamen.SessionExamen_id)
+        .where(ResultatSemestre.Etudiant_id_fk.in_(cohorte),
+               ResultatSemestre.AnneeUniversitaire_id_fk == annee_id))
+
+    # Les Numeric arrivent en Decimal
+    for df, cols in [(notes, ["Note_valeur"]), (res_ue, ["ResultatUE_moyenne"]),
+                     (res_sem, ["ResultatSemestre_moyenne_obtenue", "ResultatSemestre_credits_acquis"])]:
+        for c in cols:
+            df[c] = pd.to_numeric(df[c].astype(float), errors="coerce")
+
+    return {"etudiants": etudiants, "maquette": maquette, "notes": notes,
+            "resultats_ue": res_ue, "resultats_semestre": res_sem}
+
+
+# ----------------------------
+# Assemblage en mémoire
+# ----------------------------
+def _by_student(df, key, cols):
+    """{etudiant: {clé: {session: valeurs}}} en une passe sur le tableau."""
+    out = {}
+    for r in df[["Etudiant_id_fk", key, "SessionExamen_code"] + cols].itertuples(index=False, name=None):
+        out.setdefault(r[0], {}).setdefault(r[1], {})[r[2]] = r[3:]
+    return out
+
+
+def _structure_maquette(maq: pd.DataFrame) -> list:
+    """[(Semestre_id, numéro, [(MaquetteUE_id, code, intitulé, crédit, [EC...])])], calculé une fois."""
+    maq = maq.sort_values(["Semestre_numero", "UE_code", "EC_code"])
+    structure = []
+    for (sem_id, sem_num), ues in maq.groupby(["Semestre_id_fk", "Semestre_numero"], sort=False):
+        blocs = []
+        for (mue_id, ue_code, ue_lib, credit), ecs in ues.groupby(
+                ["MaquetteUE_id", "UE_code", "UE_intitule", "MaquetteUE_credit"], sort=False):
+            blocs.append((mue_id, ue_code, ue_lib, int(credit),
+                          list(ecs[["EC_id_fk", "EC_code", "EC_intitule", "MaquetteEC_coefficient"]]
+                               .itertuples(index=False, name=None))))
+        structure.append((sem_id, sem_num, blocs))
+    return structure
+
+
+def assembler_releves(data: dict, entete: dict) -> list:
+    """Un dict par étudiant : semestres -> UE -> EC (note par session), résultats UE et semestre."""
+    structure = _structure_maquette(data["maquette"])
+    notes = _by_student(data["notes"], "EC_id_fk", ["Note_valeur"])
+    res_ue = _by_student(data["resultats_ue"], "MaquetteUE_id_fk",
+                         ["ResultatUE_moyenne", "ResultatUE_is_acquise", "ResultatUE_credit_obtenu"])
+    res_sem = _by_student(data["resultats_semestre"], "Semestre_id_fk",
+                          ["ResultatSemestre_moyenne_obtenue", "ResultatSemestre_credits_acquis",
+                           "ResultatSemestre_statut_validation"])
+
+    releves = []
+    for etu in data["etudiants"].to_dict(orient="records"):
+        eid = etu["Etudiant_id"]
+        n, ru, rs = notes.get(eid, {}), res_ue.get(eid, {}), res_sem.get(eid, {})
+
+        semestres = []
+        for sem_id, sem_num, blocs in structure:
+            semestres.append({
+                "semestre": sem_num,
+                "ues": [{
+                    "code": ue_code, "intitule": ue_lib, "credit": credit,
+                    "ecs": [{"code": ec_code, "intitule": ec_lib, "coefficient": int(coef),
+                             "notes": {s: v[0] for s, v in n.get(ec_id, {}).items()}}
+                            for ec_id, ec_code, ec_lib, coef in ecs],
+                    "resultats": {s: {"moyenne": m, "acquise": bool(a), "credits": int(c)}
+                                  for s, (m, a, c) in ru.get(mue_id, {}).items()},
+                } for mue_id, ue_code, ue_lib, credit, ecs in blocs],
+                "resultats": {s: {"moyenne": m, "credits": c, "statut": st}
+                              for s, (m, c, st) in rs.get(sem_id, {}).items()},
+            })
+
+        releves.append({**entete, "etudiant": etu, "semestres": semestres})
+    return releves
+
+
+# ----------------------------
+# Rendu (exécuté dans les processus du pool)
+# ----------------------------
+def _fmt(v):
+    return "-" if v is None or pd.isna(v) else f"{v:.2f}"
+
+
+def rendre_releve(r: dict) -> str:
+    """Relevé en texte à largeur fixe."""
+    etu = r["etudiant"]
+    lignes = [
+        f"RELEVÉ DE NOTES — {r['annee']}",
+        f"Parcours : {r['parcours_code']} {r.get('parcours_label') or ''}".rstrip(),
+        f"Étudiant : {etu['Etudiant_nom']} {etu.get('Etudiant_prenoms') or ''}".rstrip(),
+        f"N° : {etu.get('Etudiant_numero_inscription') or '-'}    Identifiant : {etu['Etudiant_id']}",
+        "",
+    ]
+    for sem in r["semestres"]:
+        lignes.append(f"=== Semestre {sem['semestre']} ===")
+        for ue in sem["ues"]:
+            res = " | ".join(f"{s}: {_fmt(x['moyenne'])} ({x['credits']} cr.)" for s, x in sorted(ue["resultats"].items()))
+            lignes.append(f"  {ue['code']:<10} {ue['intitule'][:40]:<40} {ue['credit']:>3} cr.   {res}")
+            for ec in ue["ecs"]:
+                notes = " | ".join(f"{s}: {_fmt(v)}" for s, v in sorted(ec["notes"].items())) or "-"
+                lignes.append(f"      {ec['code']:<10} {ec['intitule'][:36]:<36} x{ec['coefficient']:<2} {notes}")
+        for s, x in sorted(sem["resultats"].items()):
+            lignes.append(f"  >> Session {s} : moyenne {_fmt(x['moyenne'])}, {_fmt(x['credits'])} crédits, "
+                          f"{STATUTS.get(x['statut'], x['statut'])}")
+        lignes.append("")
+    return "\n".join(lignes)
+
+
+def _rendre_et_ecrire(args):
+    releve, dossier = args
+    path = os.path.join(dossier, f"releve_{releve['etudiant']['Etudiant_id']}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(rendre_releve(releve))
+    return path
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def generer_releves(session: Session, parcours_code, annee_code, dossier=None, workers=4,
+                    mention_code=None) -> dict:
+    """
+    Relevés de tous les inscrits d'un parcours pour une année.
+    Un code parcours n'est unique que dans sa mention : mention_code est requis s'il est ambigu.
+    Retourne le rapport {releves, requetes, requetes_par_releve, chargement, rendu}.
+    """
+    print(f"\n--- Relevés de notes : {parcours_code} / {annee_code} ---")
+    dossier = dossier or os.path.join(config.EXPORT_FOLDER_PATH, "releves", annee_code,
+                                      *([mention_code] if mention_code else []), parcours_code)
+    os.makedirs(dossier, exist_ok=True)
+
+    conn = session.connection()
+    t0 = time.perf_counter()
+    with compteur_requetes(conn) as compteur:
+        stmt = (
+            select(Parcours.Parcours_id, Parcours.Parcours_label, Mention.Mention_code)
+            .join(Mention, Parcours.Mention_id_fk == Mention.Mention_id)
+            .where(Parcours.Parcours_code == parcours_code)
+        )
+        if mention_code is not None:
+            stmt = stmt.where(Mention.Mention_code == mention_code)
+        candidats = session.execute(stmt).all()
+        if len(candidats) > 1:
+            raise ValueError(f"Parcours {parcours_code} ambigu (mentions "
+                             f"{sorted(c.Mention_code for c in candidats)}) : préciser la mention")
+        parcours = candidats[0] if candidats else None
+        annee_id = session.execute(
+            select(AnneeUniversitaire.AnneeUniversitaire_id)
+            .where(AnneeUniversitaire.AnneeUniversitaire_annee == annee_code)
+        ).scalar()
+        if parcours is None or annee_id is None:
+            raise ValueError(f"Parcours ou année inconnu : {parcours_code} / {annee_code}")
+
+        data = load_cohorte(conn, parcours.Parcours_id, annee_id)
+    entete = {"annee": annee_code, "parcours_code": parcours_code, "parcours_label": parcours.Parcours_label}
+    releves = assembler_releves(data, entete)
+    t_charge = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if workers > 1 and len(releves) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, len(releves) // (workers * 4))
+            list(pool.map(_rendre_et_ecrire, [(r, dossier) for r in releves], chunksize=chunk))
+    else:
+        for r in releves:
+            _rendre_et_ecrire((r, dossier))
+    t_rendu = time.perf_counter() - t0
+
+    n = len(releves)
+    rapport = {
+        "releves": n, "requetes": compteur["requetes"],
+        "requetes_par_releve": compteur["requetes"] / n if n else 0.0,
+        "chargement": t_charge, "rendu": t_rendu,
+    }
+    print(f"   📊 {compteur['requetes']} requêtes pour {n} relevés "
+          f"({rapport['requetes_par_releve']:.3f} par relevé) | chargement {t_charge:.1f}s, rendu {t_rendu:.1f}s")
+    print(f"✅ Relevés écrits dans {dossier}")
+    return rapport
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Relevés de notes d'un parcours pour une année")
+    parser.add_argument("--parcours", required=True, help="Code parcours")
+    parser.add_argument("--annee", required=True, help="Année universitaire, ex. 2023-2024")
+    parser.add_argument("--mention", default=None, help="Code mention (si le code parcours est ambigu)")
+    parser.add_argument("--dossier", default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    db = get_session()
+    try:
+        generer_releves(db, args.parcours, args.annee, args.dossier, args.workers, args.mention)
+    finally:
+        db.close()
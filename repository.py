@@ -0,0 +1,253 @@
+# repository.py
+#
+# Couche de lecture commune : requêtes fréquentes avec chargement explicite des relations
+# et cache de résultats borné (LRU + TTL). Les résultats sont des dicts / listes python,
+# jamais des objets ORM (qui resteraient liés à la session qui les a chargés).
+#
+# Invalidation : chaque étape d'import appelle invalider_cache(<groupe>) quand elle se termine.
+#   "structure"    : institutions, composantes, mentions, parcours, parcours_niveaux
+#   "etudiants"    : etudiants
+#   "inscriptions" : inscriptions
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, selectinload
+
+from models import (
+    Etudiant, Inscription, Mention, Parcours, ParcoursNiveau, Niveau, Semestre,
+    AnneeUniversitaire
+)
+
+CACHE_MAXSIZE = 2048      # entrées conservées au plus (les moins récemment lues sont évincées)
+CACHE_TTL = 600           # secondes de validité d'une entrée
+
+
+# ----------------------------
+# Cache LRU + TTL
+# ----------------------------
+class LRUTTLCache:
+    """Cache borné thread-safe ; chaque entrée porte les groupes de tables dont elle dépend."""
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clé -> (expiration, groupes, valeur)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, key):
+        """Retourne (trouvé, valeur)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expire, _, value = entry
+            if expire < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, groupes):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, frozenset(groupes), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *groupes):
+        """Supprime les entrées dépendant d'un des groupes (aucun groupe : tout le cache)."""
+        with self._lock:
+            if not groupes:
+                n = len(self._data)
+                self._data.clear()
+            else:
+                cibles = set(groupes)
+                keys = [k for k, (_, g, _) in self._data.items() if g & cibles]
+                for k in keys:
+                    del self._data[k]
+                n = len(keys)
+            self.invalidations += n
+            return n
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entrees": len(self._data), "hits": self.hits, "misses": self.misses,
+                "taux_hit": self.hits / total if total else 0.0,
+                "evictions": self.evictions, "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = LRUTTLCache()
+
+
+def _cached(*groupes):
+    """
+    Met en cache le résultat d'une requête ; la session (1er argument) ne fait pas partie de la clé.
+    Retourne une copie profonde de la valeur en cache.
+    """
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(session, *args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = _cache.get(key)
+            if not found:
+                value = fn(session, *args, **kwargs)
+                _cache.put(key, value, groupes)
+            return copy.deepcopy(value)
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+
+def invalider_cache(*groupes) -> int:
+    """À appeler en fin d'étape d'import ; retourne le nombre d'entrées supprimées."""
+    return _cache.invalidate(*groupes)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+def _row(obj, *cols):
+    return {c: getattr(obj, c) for c in cols}
+
+
+# ----------------------------
+# Étudiants
+# ----------------------------
+_ETUDIANT_COLS = (
+    "Etudiant_id", "Etudiant_numero_inscription", "Etudiant_nom", "Etudiant_prenoms",
+    "Etudiant_sexe", "Etudiant_naissance_date", "Etudiant_naissance_lieu", "Etudiant_nationalite",
+    "Etudiant_bacc_annee", "Etudiant_bacc_serie", "Etudiant_mail", "Etudiant_telephone",
+)
+
+
+@_cached("etudiants", "inscriptions", "structure")
+def get_etudiant(session: Session, etudiant_id):
+    """
+    Étudiant + inscription(s) de sa dernière année (ordre de AnneeUniversitaire), avec
+    parcours, semestre et année chargés en 2 requêtes (selectinload + joinedload).
+    None si l'étudiant n'existe pas.
+    """
+    etu = session.execute(
+        select(Etudiant)
+        .where(Etudiant.Etudiant_id == etudiant_id)
+        .options(
+            selectinload(Etudiant.inscriptions).joinedload(Inscription.parcours),
+            selectinload(Etudiant.inscriptions).joinedload(Inscription.semestre),
+            selectinload(Etudiant.inscriptions).joinedload(Inscription.annee_univ),
+        )
+    ).scalar_one_or_none()
+    if etu is None:
+        return None
+
+    out = _row(etu, *_ETUDIANT_COLS)
+    inscriptions = [i for i in etu.inscriptions if i.annee_univ is not None]
+    derniere = max((i.annee_univ.AnneeUniversitaire_ordre for i in inscriptions), default=None)
+    out["inscriptions_courantes"] = sorted(
+        (
+            {
+                "Inscription_id": i.Inscription_id,
+                "AnneeUniversitaire_annee": i.annee_univ.AnneeUniversitaire_annee,
+                "Parcours_id": i.Parcours_id_fk,
+                "Parcours_code": i.parcours.Parcours_code if i.parcours else None,
+                "Parcours_label": i.parcours.Parcours_label if i.parcours else None,
+                "Semestre_id": i.Semestre_id_fk,
+                "Semestre_numero": i.semestre.Semestre_numero if i.semestre else None,
+                "Inscription_is_semestre_valide": i.Inscription_is_semestre_valide,
+            }
+            for i in inscriptions if i.annee_univ.AnneeUniversitaire_ordre == derniere
+        ),
+        key=lambda d: (d["Parcours_code"] or "", d["Semestre_numero"] or ""),
+    )
+    out["nb_inscriptions"] = len(etu.inscriptions)
+    return out
+
+
+# ----------------------------
+# Structure
+# ----------------------------
+@_cached("structure")
+def get_arbre_parcours(session: Session, mention_id, annee_id=None):
+    """
+    Mention -> parcours -> niveaux couverts (parcours_niveaux, une année ou toutes)
+    -> semestres du niveau. Chargé en une requête par niveau de l'arbre (selectinload).
+    """
+    mention = session.execute(
+        select(Mention)
+        .where(Mention.Mention_id == mention_id)
+        .options(
+            selectinload(Mention.parcours)
+            .selectinload(Parcours.niveaux_couverts)
+            .joinedload(ParcoursNiveau.niveau_lie)
+            .selectinload(Niveau.semestres)
+        )
+    ).scalar_one_or_none()
+    if mention is None:
+        return None
+
+    out = _row(mention, "Mention_id", "Mention_code", "Mention_label")
+    out["parcours"] = []
+    for p in sorted(mention.parcours, key=lambda p: p.Parcours_code):
+        liens = [pn for pn in p.niveaux_couverts if annee_id is None or pn.AnneeUniversitaire_id_fk == annee_id]
+        niveaux = {}
+        for pn in liens:
+            niv = pn.niveau_lie
+            niveaux.setdefault(niv.Niveau_id, {
+                "Niveau_id": niv.Niveau_id, "Niveau_code": niv.Niveau_code,
+                "ordre": pn.ParcoursNiveau_ordre,
+                "semestres": sorted(s.Semestre_numero for s in niv.semestres),
+            })
+        node = _row(p, "Parcours_id", "Parcours_code", "Parcours_label")
+        node["niveaux"] = sorted(niveaux.values(), key=lambda n: (n["ordre"] is None, n["ordre"], n["Niveau_code"]))
+        out["parcours"].append(node)
+    return out
+
+
+# ----------------------------
+# Effectifs
+# ----------------------------
+@_cached("inscriptions", "structure")
+def get_effectif(session: Session, parcours_id, annee_id):
+    """Étudiants distincts inscrits à un parcours une année, au total et par semestre."""
+    rows = session.execute(
+        select(Semestre.Semestre_numero, func.count(func.distinct(Inscription.Etudiant_id_fk)))
+        .join(Semestre, Inscription.Semestre_id_fk == Semestre.Semestre_id)
+        .where(Inscription.Parcours_id_fk == parcours_id,
+               Inscription.AnneeUniversitaire_id_fk == annee_id)
+        .group_by(Semestre.Semestre_numero)
+    ).all()
+    total = session.execute(
+        select(func.count(func.distinct(Inscription.Etudiant_id_fk)))
+        .where(Inscription.Parcours_id_fk == parcours_id,
+               Inscription.AnneeUniversitaire_id_fk == annee_id)
+    ).scalar_one()
+    return {"total": total, "par_semestre": dict(sorted(rows))}
+
+
+@_cached("structure")
+def get_annee_active(session: Session):
+    """Année universitaire marquée active (la plus récente si plusieurs), ou None."""
+    annee = session.execute(
+        select(AnneeUniversitaire)
+        .where(AnneeUniversitaire.AnneeUniversitaire_is_active.is_(True))
+        .order_by(AnneeUniversitaire.AnneeUniversitaire_ordre.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if annee is None:
+        return None
+    return _row(annee, "AnneeUniversitaire_id", "AnneeUniversitaire_annee", "AnneeUniversitaire_ordre")
@@ -0,0 +1,545 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import (
+    Note, MaquetteUE, MaquetteEC, Inscription, SessionExamen, AnneeUniversitaire,
+    Semestre, Niveau, Cycle,
+    ResultatUE, ResultatSemestre, SuiviCreditCycle, ResultatARecalculer
+)
+from bulk_utils import bulk_upsert, make_key_ids, frame_to_records, DEFAULT_CHUNK_SIZE
+from cles_compactes import mettre_a_jour_en_masse, supprimer_en_masse
+from repository import invalider_cache
+
+# Règles de délibération (système LMD)
+SEUIL_UE = 10.0           # moyenne minimale pour acquérir une UE
+SEUIL_SEMESTRE = 10.0     # moyenne minimale pour valider un semestre
+COMPENSATION = True       # un semestre validé par compensation accorde tous ses crédits
+
+# Crédits nécessaires pour valider un cycle (par Cycle_code)
+CREDITS_CYCLE = {'L': 180, 'M': 120, 'D': 180}
+
+UE_KEY = ["Etudiant_id_fk", "MaquetteUE_id_fk", "SessionExamen_id_fk"]
+SEM_KEY = ["Etudiant_id_fk", "Semestre_id_fk", "AnneeUniversitaire_id_fk", "SessionExamen_id_fk"]
+
+
+# ----------------------------
+# Chargement en tableaux
+# ----------------------------
+def _read(session: Session, stmt) -> pd.DataFrame:
+    return pd.read_sql(stmt, session.connection())
+
+
+def _filter_in(stmt, column, values):
+    if values is None:
+        return stmt
+    return stmt.where(column.in_(list(values)))
+
+
+def load_deliberation_data(session: Session, annee_id=None, etudiant_ids=None) -> dict:
+    """
+    Charge en une requête par table tout ce qu'il faut pour délibérer :
+    notes, maquettes (EC -> UE, coefficients, crédits), inscriptions et sessions.
+    """
+    notes_stmt = select(
+        Note.Etudiant_id_fk, Note.EC_id_fk, Note.AnneeUniversitaire_id_fk,
+        Note.SessionExamen_id_fk, Note.Note_valeur
+    )
+    maq_stmt = (
+        select(
+            MaquetteUE.MaquetteUE_id.label("MaquetteUE_id_fk"),
+            MaquetteUE.Parcours_id_fk, MaquetteUE.AnneeUniversitaire_id_fk,
+            MaquetteUE.Semestre_id_fk, MaquetteUE.MaquetteUE_credit,
+            MaquetteEC.EC_id_fk, MaquetteEC.MaquetteEC_coefficient
+        )
+        .join(MaquetteEC, MaquetteEC.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+    )
+    insc_stmt = select(
+        Inscription.Inscription_id, Inscription.Etudiant_id_fk,
+        Inscription.AnneeUniversitaire_id_fk, Inscription.Parcours_id_fk,
+        Inscription.Semestre_id_fk
+    )
+
+    if annee_id is not None:
+        notes_stmt = notes_stmt.where(Note.AnneeUniversitaire_id_fk == annee_id)
+        maq_stmt = maq_stmt.where(MaquetteUE.AnneeUniversitaire_id_fk == annee_id)
+        insc_stmt = insc_stmt.where(Inscription.AnneeUniversitaire_id_fk == annee_id)
+
+    notes_stmt = _filter_in(notes_stmt, Note.Etudiant_id_fk, etudiant_ids)
+    insc_stmt = _filter_in(insc_stmt, Inscription.Etudiant_id_fk, etudiant_ids)
+
+    sessions = _read(session, select(SessionExamen.SessionExamen_id, SessionExamen.SessionExamen_code)
+                     .order_by(SessionExamen.SessionExamen_id))
+    sessions["ordre"] = np.arange(len(sessions))
+
+    notes = _read(session, notes_stmt)
+    notes["Note_valeur"] = notes["Note_valeur"].astype(float)
+
+    maquettes = _read(session, maq_stmt)
+    maquettes["MaquetteUE_credit"] = maquettes["MaquetteUE_credit"].astype(float)
+    maquettes["MaquetteEC_coefficient"] = maquettes["MaquetteEC_coefficient"].astype(float)
+
+    return {
+        "notes": notes,
+        "maquettes": maquettes,
+        "inscriptions": _read(session, insc_stmt),
+        "sessions": sessions,
+    }
+
+
+def load_semestre_cycles(session: Session) -> pd.DataFrame:
+    """Semestre_id -> (Cycle_id, Cycle_code)"""
+    stmt = (
+        select(Semestre.Semestre_id.label("Semestre_id_fk"),
+               Cycle.Cycle_id.label("Cycle_id_fk"), Cycle.Cycle_code)
+        .join(Niveau, Semestre.Niveau_id_fk == Niveau.Niveau_id)
+        .join(Cycle, Niveau.Cycle_id_fk == Cycle.Cycle_id)
+    )
+    return _read(session, stmt)
+
+
+# ----------------------------
+# Calculs vectorisés
+# ----------------------------
+def _notes_grid(data: dict) -> pd.DataFrame:
+    """
+    Grille (étudiant, maquette UE, EC, session cible) avec la note effective de chaque EC.
+    - Une note n'est rattachée qu'à la maquette du parcours/semestre où l'étudiant est inscrit.
+    - Pour une session donnée, la note effective d'un EC est la plus récente des sessions <= cible
+      (la note de rattrapage remplace celle de la session normale ; sinon celle-ci est conservée).
+    - Seuls les couples (étudiant, semestre) ayant au moins une note dans la session cible sont délibérés.
+    - Un EC de la maquette sans aucune note compte pour 0.
+    """
+    notes, maq, insc, sessions = data["notes"], data["maquettes"], data["inscriptions"], data["sessions"]
+
+    insc_keys = insc[["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "Parcours_id_fk", "Semestre_id_fk"]] \
+        .drop_duplicates()
+
+    placed = (
+        notes.merge(maq, on=["AnneeUniversitaire_id_fk", "EC_id_fk"])
+             .merge(insc_keys, on=["Etudiant_id_fk", "AnneeUniversitaire_id_fk",
+                                   "Parcours_id_fk", "Semestre_id_fk"])
+             .merge(sessions[["SessionExamen_id", "ordre"]],
+                    left_on="SessionExamen_id_fk", right_on="SessionExamen_id")
+             .drop(columns="SessionExamen_id")
+    )
+
+    pair_cols = ["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "Parcours_id_fk", "Semestre_id_fk"]
+    note_cols = ["Etudiant_id_fk", "MaquetteUE_id_fk", "EC_id_fk"]
+
+    grids = []
+    for sess_id, ordre in zip(sessions["SessionExamen_id"], sessions["ordre"]):
+        pairs = placed.loc[placed["ordre"] == ordre, pair_cols].drop_duplicates()
+        if pairs.empty:
+            continue
+
+        effective = (
+            placed.loc[placed["ordre"] <= ordre]
+                  .sort_values("ordre")
+                  .drop_duplicates(subset=note_cols, keep="last")
+        )
+
+        grid = pairs.merge(maq, on=["AnneeUniversitaire_id_fk", "Parcours_id_fk", "Semestre_id_fk"])
+        grid = grid.merge(effective[note_cols + ["Note_valeur"]], on=note_cols, how="left")
+        grid["Note_valeur"] = grid["Note_valeur"].fillna(0.0)
+        grid["SessionExamen_id_fk"] = sess_id
+        grid["ordre"] = ordre
+        grids.append(grid)
+
+    if not grids:
+        return pd.DataFrame(columns=pair_cols + ["MaquetteUE_id_fk", "EC_id_fk", "MaquetteUE_credit",
+                                                 "MaquetteEC_coefficient", "Note_valeur",
+                                                 "SessionExamen_id_fk", "ordre"])
+    return pd.concat(grids, ignore_index=True)
+
+
+def compute_resultats_ue(grid: pd.DataFrame, seuil_ue=SEUIL_UE) -> pd.DataFrame:
+    """Moyenne pondérée par coefficient des EC de chaque UE, acquisition et crédits obtenus."""
+    g = grid.assign(_pond=grid["Note_valeur"] * grid["MaquetteEC_coefficient"])
+    keys = UE_KEY + ["AnneeUniversitaire_id_fk", "Semestre_id_fk", "ordre"]
+    ue = g.groupby(keys, as_index=False, sort=False).agg(
+        _pond=("_pond", "sum"),
+        _coef=("MaquetteEC_coefficient", "sum"),
+        MaquetteUE_credit=("MaquetteUE_credit", "first"),
+    )
+    ue["ResultatUE_moyenne"] = (ue["_pond"] / ue["_coef"].where(ue["_coef"] > 0)).fillna(0.0).round(2)
+    ue["ResultatUE_is_acquise"] = ue["ResultatUE_moyenne"] >= seuil_ue
+    ue["ResultatUE_credit_obtenu"] = np.where(ue["ResultatUE_is_acquise"], ue["MaquetteUE_credit"], 0).astype(int)
+    return ue.drop(columns=["_pond", "_coef"])
+
+
+def compute_resultats_semestre(ue: pd.DataFrame, derniere_session_ordre: int,
+                               seuil_semestre=SEUIL_SEMESTRE, compensation=COMPENSATION) -> pd.DataFrame:
+    """
+    Moyenne du semestre pondérée par les crédits des UE, crédits acquis et statut :
+    'V' validé, 'AJ' ajourné (une session ultérieure reste possible), 'NV' non validé.
+    """
+    u = ue.assign(_pond=ue["ResultatUE_moyenne"] * ue["MaquetteUE_credit"],
+                  _nv=~ue["ResultatUE_is_acquise"])
+    sem = u.groupby(SEM_KEY + ["ordre"], as_index=False, sort=False).agg(
+        _pond=("_pond", "sum"),
+        _credits=("MaquetteUE_credit", "sum"),
+        _acquis=("ResultatUE_credit_obtenu", "sum"),
+        _nb_nv=("_nv", "sum"),
+    )
+    moyenne = (sem["_pond"] / sem["_credits"].where(sem["_credits"] > 0)).fillna(0.0)
+    sem["ResultatSemestre_moyenne_obtenue"] = moyenne.round(2)
+
+    toutes_acquises = sem["_nb_nv"] == 0
+    if compensation:
+        valide = toutes_acquises | (sem["ResultatSemestre_moyenne_obtenue"] >= seuil_semestre)
+    else:
+        valide = toutes_acquises
+
+    sem["ResultatSemestre_credits_acquis"] = np.where(valide, sem["_credits"], sem["_acquis"]).astype(float)
+    sem["ResultatSemestre_statut_validation"] = np.select(
+        [valide, sem["ordre"] < derniere_session_ordre], ["V", "AJ"], default="NV"
+    )
+    return sem.drop(columns=["_pond", "_credits", "_acquis", "_nb_nv"])
+
+
+def compute_credits_cycle(sem_all: pd.DataFrame, sem_cycles: pd.DataFrame) -> pd.DataFrame:
+    """
+    Total des crédits acquis par cycle : pour chaque semestre on retient le meilleur
+    résultat toutes années et sessions confondues, puis on somme par cycle.
+    """
+    best = (
+        sem_all.groupby(["Etudiant_id_fk", "Semestre_id_fk"], as_index=False)["ResultatSemestre_credits_acquis"]
+               .max()
+               .merge(sem_cycles, on="Semestre_id_fk")
+    )
+    cyc = best.groupby(["Etudiant_id_fk", "Cycle_id_fk", "Cycle_code"], as_index=False) \
+              ["ResultatSemestre_credits_acquis"].sum()
+    cyc["SuiviCreditCycle_credit_total_acquis"] = cyc["ResultatSemestre_credits_acquis"].astype(int)
+    requis = cyc["Cycle_code"].map(CREDITS_CYCLE).fillna(np.inf)
+    cyc["SuiviCreditCycle_is_cycle_valide"] = cyc["SuiviCreditCycle_credit_total_acquis"] >= requis
+    return cyc.drop(columns=["ResultatSemestre_credits_acquis", "Cycle_code"])
+
+
+def compute_deliberation(data: dict, session_id=None) -> dict:
+    """Calcul complet (sans écriture) : résultats UE et semestre pour les données chargées."""
+    grid = _notes_grid(data)
+    if session_id is not None:
+        grid = grid.loc[grid["SessionExamen_id_fk"] == session_id]
+
+    ue = compute_resultats_ue(grid)
+    sem = compute_resultats_semestre(ue, int(data["sessions"]["ordre"].max()))
+    return {"ue": ue, "semestre": sem}
+
+
+# ----------------------------
+# Écriture en masse
+# ----------------------------
+def _load_all_resultats_semestre(session: Session, etudiant_ids) -> pd.DataFrame:
+    stmt = select(
+        ResultatSemestre.Etudiant_id_fk, ResultatSemestre.Semestre_id_fk,
+        ResultatSemestre.ResultatSemestre_credits_acquis
+    )
+    df = _read(session, _filter_in(stmt, ResultatSemestre.Etudiant_id_fk, etudiant_ids))
+    df["ResultatSemestre_credits_acquis"] = df["ResultatSemestre_credits_acquis"].astype(float)
+    return df
+
+
+def _update_inscriptions(session: Session, sem: pd.DataFrame, insc: pd.DataFrame) -> int:
+    """Reporte sur chaque inscription le résultat de la dernière session délibérée du semestre."""
+    last = (
+        sem.sort_values("ordre")
+           .drop_duplicates(subset=["Etudiant_id_fk", "Semestre_id_fk", "AnneeUniversitaire_id_fk"], keep="last")
+    )
+    upd = insc.merge(last, on=["Etudiant_id_fk", "Semestre_id_fk", "AnneeUniversitaire_id_fk"])
+    if upd.empty:
+        return 0
+
+    mappings = frame_to_records(pd.DataFrame({
+        "Inscription_id": upd["Inscription_id"],
+        "Inscription_credit_acquis_semestre": upd["ResultatSemestre_credits_acquis"].astype(int),
+        "Inscription_is_semestre_valide": upd["ResultatSemestre_statut_validation"] == "V",
+    }))
+    return mettre_a_jour_en_masse(session, Inscription, mappings)
+
+
+def write_deliberation(session: Session, results: dict, inscriptions: pd.DataFrame) -> dict:
+    """UPSERT des résultats UE / semestre, mise à jour des inscriptions puis des crédits de cycle."""
+    ue, sem = results["ue"], results["semestre"]
+
+    ue_rows = ue[UE_KEY + ["ResultatUE_moyenne", "ResultatUE_is_acquise", "ResultatUE_credit_obtenu"]].copy()
+    ue_rows.insert(0, "ResultatUE_id", make_key_ids("RUE", ue_rows, UE_KEY))
+    n_ue = bulk_upsert(session, ResultatUE, ue_rows, constraint="uq_resultat_maquette_session")
+
+    sem_rows = sem[SEM_KEY + ["ResultatSemestre_statut_validation", "ResultatSemestre_credits_acquis",
+                              "ResultatSemestre_moyenne_obtenue"]].copy()
+    sem_rows.insert(0, "ResultatSemestre_id", make_key_ids("RSEM", sem_rows, SEM_KEY))
+    n_sem = bulk_upsert(session, ResultatSemestre, sem_rows, constraint="uq_resultat_semestre_session")
+
+    n_insc = _update_inscriptions(session, sem, inscriptions)
+    n_cyc = recalculer_credits_cycle(session, sem["Etudiant_id_fk"].unique().tolist())
+
+    return {"ue": n_ue, "semestre": n_sem, "inscriptions": n_insc, "cycles": n_cyc}
+
+
+def recalculer_credits_cycle(session: Session, etudiants) -> int:
+    """
+    Crédits de cycle des étudiants donnés, recalculés sur tout leur historique de résultats
+    semestre en base ; un cycle sans plus aucun résultat perd sa ligne de suivi.
+    """
+    etudiants = list(etudiants)
+    if not etudiants:
+        return 0
+    sem_all = _load_all_resultats_semestre(session, etudiants)
+    cyc = compute_credits_cycle(sem_all, load_semestre_cycles(session))
+    cyc_rows = cyc[["Etudiant_id_fk", "Cycle_id_fk", "SuiviCreditCycle_credit_total_acquis",
+                    "SuiviCreditCycle_is_cycle_valide"]].copy()
+    cyc_rows.insert(0, "SuiviCreditCycle_id",
+                    make_key_ids("SCC", cyc_rows, ["Etudiant_id_fk", "Cycle_id_fk"]))
+
+    existants = _read(session, _filter_in(
+        select(SuiviCreditCycle.SuiviCreditCycle_id, SuiviCreditCycle.Etudiant_id_fk,
+               SuiviCreditCycle.Cycle_id_fk),
+        SuiviCreditCycle.Etudiant_id_fk, etudiants))
+    m = existants.merge(cyc_rows[["Etudiant_id_fk", "Cycle_id_fk"]], how="left", indicator=True)
+    obsoletes = m.loc[m["_merge"] == "left_only", "SuiviCreditCycle_id"].tolist()
+    for start in range(0, len(obsoletes), DEFAULT_CHUNK_SIZE):
+        lot = obsoletes[start:start + DEFAULT_CHUNK_SIZE]
+        session.execute(delete(SuiviCreditCycle).where(SuiviCreditCycle.SuiviCreditCycle_id.in_(lot)))
+    return bulk_upsert(session, SuiviCreditCycle, cyc_rows, constraint="uq_etudiant_cycle_credit")
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def _resolve_scope(session: Session, annee_code=None, session_code=None):
+    annee_id = sess_id = None
+    if annee_code is not None:
+        annee_id = session.query(AnneeUniversitaire.AnneeUniversitaire_id) \
+            .filter_by(AnneeUniversitaire_annee=annee_code).scalar()
+        if annee_id is None:
+            raise ValueError(f"Année universitaire inconnue : {annee_code}")
+    if session_code is not None:
+        sess_id = session.query(SessionExamen.SessionExamen_id) \
+            .filter_by(SessionExamen_code=session_code).scalar()
+        if sess_id is None:
+            raise ValueError(f"Session d'examen inconnue : {session_code}")
+    return annee_id, sess_id
+
+
+def calculer_resultats(session: Session, annee_code=None, session_code=None):
+    """
+    Délibération en masse : ResultatUE -> ResultatSemestre -> Inscription -> SuiviCreditCycle.
+    - annee_code : ex. '2023-2024' (None = toutes les années)
+    - session_code : 'N' / 'R' (None = toutes les sessions)
+    """
+    print("\n--- Calcul des Résultats (UE, Semestres, Cycles) ---")
+    annee_id, sess_id = _resolve_scope(session, annee_code, session_code)
+
+    data = load_deliberation_data(session, annee_id=annee_id)
+    print(f"   📥 {len(data['notes'])} notes, {len(data['maquettes'])} EC de maquette, "
+          f"{len(data['inscriptions'])} inscriptions chargés.")
+
+    results = compute_deliberation(data, session_id=sess_id)
+
+    try:
+        counts = write_deliberation(session, results, data["inscriptions"])
+        session.commit()
+        invalider_cache("inscriptions")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [RESULTATS] Erreur d'écriture : {e}")
+        return None
+
+    print(f"✅ {counts['ue']} résultats UE, {counts['semestre']} résultats semestre, "
+          f"{counts['inscriptions']} inscriptions, {counts['cycles']} suivis de cycle mis à jour.")
+    return results
+
+
+# ----------------------------
+# Recalcul incrémental (file resultats_a_recalculer)
+# ----------------------------
+def _load_dirty_keys(session: Session) -> pd.DataFrame:
+    stmt = (
+        select(ResultatARecalculer.Etudiant_id_fk, ResultatARecalculer.MaquetteUE_id_fk,
+               ResultatARecalculer.SessionExamen_id_fk,
+               MaquetteUE.AnneeUniversitaire_id_fk, MaquetteUE.Semestre_id_fk)
+        .join(MaquetteUE, ResultatARecalculer.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+    )
+    return _read(session, stmt)
+
+
+def _supprimer_resultats_obsoletes(session: Session, results: dict, scope: pd.DataFrame,
+                                   inscriptions: pd.DataFrame) -> dict:
+    """
+    Résultats en base du périmètre recalculé (étudiant, année, semestre) qui ne sont plus
+    produits (note supprimée, ou déplacée vers une autre UE / session) : supprimés ; les
+    inscriptions d'un semestre sans aucun résultat reviennent à 0 crédit, non validé.
+    """
+    scope_cols = ["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "Semestre_id_fk"]
+    etudiants = scope["Etudiant_id_fk"].unique().tolist()
+
+    def _absents(db, calc, keys):
+        m = db.merge(scope, on=scope_cols).merge(calc.reindex(columns=keys).drop_duplicates(), on=keys,
+                                                  how="left", indicator=True)
+        return m[m["_merge"] == "left_only"]
+
+    ue_db = _read(session, _filter_in(
+        select(ResultatUE.ResultatUE_id, *[ResultatUE.__table__.c[k] for k in UE_KEY],
+               MaquetteUE.AnneeUniversitaire_id_fk, MaquetteUE.Semestre_id_fk)
+        .join(MaquetteUE, ResultatUE.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id),
+        ResultatUE.Etudiant_id_fk, etudiants))
+    sem_db = _read(session, _filter_in(
+        select(ResultatSemestre.ResultatSemestre_id, *[ResultatSemestre.__table__.c[k] for k in SEM_KEY]),
+        ResultatSemestre.Etudiant_id_fk, etudiants))
+
+    n_ue = supprimer_en_masse(session, ResultatUE, _absents(ue_db, results["ue"], UE_KEY)["ResultatUE_id"])
+    n_sem = supprimer_en_masse(session, ResultatSemestre,
+                               _absents(sem_db, results["semestre"], SEM_KEY)["ResultatSemestre_id"])
+
+    vides = _absents(inscriptions, results["semestre"], scope_cols)
+    n_insc = mettre_a_jour_en_masse(session, Inscription, frame_to_records(pd.DataFrame({
+        "Inscription_id": vides["Inscription_id"],
+        "Inscription_credit_acquis_semestre": 0,
+        "Inscription_is_semestre_valide": False,
+    })))
+    return {"ue": n_ue, "semestre": n_sem, "inscriptions": n_insc}
+
+
+def recalculer_resultats_modifies(session: Session):
+    """
+    Recalcule UE -> semestre -> cycle uniquement pour les clés marquées dans
+    resultats_a_recalculer (notes ajoutées/corrigées/supprimées), puis vide la file.
+    Les résultats du périmètre qui ne sont plus produits sont supprimés.
+    Toutes les sessions du semestre touché sont recalculées : une note de session
+    normale est reprise par les sessions suivantes.
+    """
+    print("\n--- Recalcul incrémental des Résultats ---")
+    dirty = _load_dirty_keys(session)
+    if dirty.empty:
+        print("✅ Aucun résultat à recalculer.")
+        return None
+
+    etudiants = dirty["Etudiant_id_fk"].unique().tolist()
+    print(f"   🔎 {len(dirty)} clés marquées, {len(etudiants)} étudiant(s) concerné(s).")
+
+    data = load_deliberation_data(session, etudiant_ids=etudiants)
+    results = compute_deliberation(data)
+
+    scope = dirty[["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "Semestre_id_fk"]].drop_duplicates()
+    results = {
+        k: v.merge(scope, on=["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "Semestre_id_fk"])
+        for k, v in results.items()
+    }
+
+    keys = list(dirty[["Etudiant_id_fk", "MaquetteUE_id_fk", "SessionExamen_id_fk"]]
+                .itertuples(index=False, name=None))
+    try:
+        # Avant l'écriture : les crédits de cycle sont recalculés sur les résultats en base
+        obsoletes = _supprimer_resultats_obsoletes(session, results, scope, data["inscriptions"])
+        counts = write_deliberation(session, results, data["inscriptions"])
+        session.query(ResultatARecalculer).filter(
+            tuple_(ResultatARecalculer.Etudiant_id_fk, ResultatARecalculer.MaquetteUE_id_fk,
+                   ResultatARecalculer.SessionExamen_id_fk).in_(keys)
+        ).delete(synchronize_session=False)
+        session.commit()
+        invalider_cache("inscriptions")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [RESULTATS] Erreur de recalcul incrémental : {e}")
+        return None
+
+    print(f"✅ {counts['ue']} résultats UE, {counts['semestre']} résultats semestre, "
+          f"{counts['cycles']} suivis de cycle recalculés.")
+    if obsoletes["ue"] or obsoletes["semestre"]:
+        print(f"   🧹 {obsoletes['ue']} résultat(s) UE et {obsoletes['semestre']} résultat(s) semestre "
+              f"sans note supprimé(s).")
+    return results
+
+
+def _diff(calc: pd.DataFrame, db: pd.DataFrame, keys: list, cols: list) -> int:
+    m = calc[keys + cols].merge(db[keys + cols], on=keys, how="outer",
+                                suffixes=("_calc", "_db"), indicator=True)
+    diff = m["_merge"] != "both"
+    for c in cols:
+        a, b = m[f"{c}_calc"], m[f"{c}_db"]
+        if pd.api.types.is_numeric_dtype(calc[c]):
+            # Les Numeric lus en base arrivent en Decimal
+            a = pd.to_numeric(a.astype(float), errors="coerce")
+            b = pd.to_numeric(b.astype(float), errors="coerce")
+            diff |= ~np.isclose(a, b, atol=0.005)
+        else:
+            diff |= a.astype(str) != b.astype(str)
+    return int(diff.sum())
+
+
+def verifier_recalcul_incremental(session: Session, annee_code=None) -> bool:
+    """
+    Contrôle de cohérence : recalcule tout en mémoire (sans écrire) et compare
+    avec les résultats en base produits par les recalculs incrémentaux.
+    Les crédits de cycle ne sont comparés que sur toutes les années (annee_code=None).
+    """
+    print("\n--- Vérification : recalcul incrémental vs recalcul complet ---")
+    annee_id, _ = _resolve_scope(session, annee_code)
+    data = load_deliberation_data(session, annee_id=annee_id)
+    full = compute_deliberation(data)
+
+    ue_stmt = (
+        select(ResultatUE.Etudiant_id_fk, ResultatUE.MaquetteUE_id_fk, ResultatUE.SessionExamen_id_fk,
+               ResultatUE.ResultatUE_moyenne, ResultatUE.ResultatUE_is_acquise,
+               ResultatUE.ResultatUE_credit_obtenu)
+        .join(MaquetteUE, ResultatUE.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+    )
+    sem_stmt = select(
+        ResultatSemestre.Etudiant_id_fk, ResultatSemestre.Semestre_id_fk,
+        ResultatSemestre.AnneeUniversitaire_id_fk, ResultatSemestre.SessionExamen_id_fk,
+        ResultatSemestre.ResultatSemestre_statut_validation,
+        ResultatSemestre.ResultatSemestre_credits_acquis,
+        ResultatSemestre.ResultatSemestre_moyenne_obtenue
+    )
+    if annee_id is not None:
+        ue_stmt = ue_stmt.where(MaquetteUE.AnneeUniversitaire_id_fk == annee_id)
+        sem_stmt = sem_stmt.where(ResultatSemestre.AnneeUniversitaire_id_fk == annee_id)
+
+    ecarts = {
+        "ue": _diff(full["ue"], _read(session, ue_stmt), UE_KEY,
+                    ["ResultatUE_moyenne", "ResultatUE_is_acquise", "ResultatUE_credit_obtenu"]),
+        "semestre": _diff(full["semestre"], _read(session, sem_stmt), SEM_KEY,
+                          ["ResultatSemestre_statut_validation", "ResultatSemestre_credits_acquis",
+                           "ResultatSemestre_moyenne_obtenue"]),
+    }
+
+    if annee_id is None:
+        cyc = compute_credits_cycle(full["semestre"], load_semestre_cycles(session))
+        cyc_db = _read(session, select(
+            SuiviCreditCycle.Etudiant_id_fk, SuiviCreditCycle.Cycle_id_fk,
+            SuiviCreditCycle.SuiviCreditCycle_credit_total_acquis,
+            SuiviCreditCycle.SuiviCreditCycle_is_cycle_valide
+        ))
+        ecarts["cycles"] = _diff(cyc, cyc_db, ["Etudiant_id_fk", "Cycle_id_fk"],
+                                 ["SuiviCreditCycle_credit_total_acquis", "SuiviCreditCycle_is_cycle_valide"])
+
+    for k, n in ecarts.items():
+        print(f"   {'✅' if n == 0 else '❌'} {k} : {n} écart(s)")
+    return all(n == 0 for n in ecarts.values())
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Calcul des résultats (UE, semestres, cycles)")
+    parser.add_argument("--annee", help="Année universitaire, ex. 2023-2024")
+    parser.add_argument("--session", help="Code de session d'examen (N / R)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne recalculer que les clés marquées dans resultats_a_recalculer")
+    parser.add_argument("--verifier", action="store_true",
+                        help="Comparer les résultats en base avec un recalcul complet en mémoire")
+    args = parser.parse_args()
+
+    db = get_session()
+    try:
+        if args.incremental:
+            recalculer_resultats_modifies(db)
+        else:
+            calculer_resultats(db, annee_code=args.annee, session_code=args.session)
+        if args.verifier:
+            verifier_recalcul_incremental(db, annee_code=args.annee)
+    finally:
+        db.close()
@@ -0,0 +1,249 @@
+# shards_import.py
+#
+# Import multi-classeurs en parallèle (config.INGESTION_MODE = "shards") : un classeur par
+# année et/ou par institution, désignés par un dossier ou un motif glob.
+#   1. lecture : chaque classeur est lu et nettoyé dans un processus séparé (read_excel est
+#      lié au CPU : le temps de lecture se divise par le nombre de cœurs) ;
+#   2. fusion : dédoublonnage inter-classeurs dans le processus principal
+#      - étudiants : une ligne par Etudiant_id, premier renseignement non vide de chaque
+#        colonne dans l'ordre des fichiers (un classeur complète les vides d'un autre) ;
+#      - inscriptions : dernière occurrence d'un code, comme le chemin synchrone ;
+#      - historiques : première occurrence de (année, code) ;
+#   3. écriture : partitions disjointes écrites en parallèle, un processus et une connexion
+#      par partition (aucun écrivain n'attend les verrous d'un autre).
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import repeat
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+import config
+from bulk_utils import bulk_upsert, separer_lignes_invalides, ecrire_avec_repli
+from database_setup import get_session
+from models import Etudiant, Inscription
+from repository import invalider_cache
+from inscriptions_import import (
+    lister_sources, _clean_inscriptions_frame, _etudiants_frame, _inscriptions_frame,
+    _get_parcours_mapping, _get_semestre_mapping, _get_annee_mapping, _get_mode_mapping,
+    _signaler_rejets, CHUNK_SIZE
+)
+from history_import import ENTITIES_CONFIG, _get_mappings, _add_mention_code, _history_frame
+
+HIST_COLS = ['institution_code', 'institution_nom', 'composante_code',
+             'mention_abbreviation', 'parcours_code', 'anneeuniversitaire_annee']
+
+# Moteur du processus de travail (créé par _init_worker, jamais hérité du parent)
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    _engine = create_engine(config.DATABASE_URL, pool_size=1, max_overflow=0)
+
+
+# ----------------------------
+# 1. Lecture (un processus par classeur)
+# ----------------------------
+def _sources_historiques(raw: pd.DataFrame) -> dict:
+    """{type d'entité: lignes distinctes (année, code[, libellé source])} d'un classeur."""
+    df = raw[[c for c in HIST_COLS if c in raw.columns]].copy()
+    df = _add_mention_code(df.where(pd.notnull(df), None))
+    out = {}
+    for ent in ENTITIES_CONFIG:
+        cols_group = ['anneeuniversitaire_annee', ent['code_col']]
+        if not set(cols_group) <= set(df.columns):
+            continue
+        cols = cols_group + [c for c in [ent['label_source_col']] if c and c in df.columns]
+        out[ent['type']] = df[cols].drop_duplicates(subset=cols_group).dropna(subset=cols_group)
+    return out
+
+
+def _lire_shard(path, maps, with_history):
+    """Lecture + nettoyage d'un classeur ; retourne ses étudiants, inscriptions et sources d'historique."""
+    t0 = time.perf_counter()
+    try:
+        raw = pd.read_excel(path)
+        raw.columns = raw.columns.str.lower().str.replace(" ", "_")
+        hist = _sources_historiques(raw) if with_history else {}
+        df = _clean_inscriptions_frame(raw)
+        return {
+            "fichier": path, "lignes": len(df), "historiques": hist,
+            "etudiants": _etudiants_frame(df),
+            "inscriptions": _inscriptions_frame(df, *maps).drop_duplicates(subset=["Inscription_id"], keep="last"),
+            "duree": time.perf_counter() - t0, "erreur": None,
+        }
+    except Exception as e:
+        return {"fichier": path, "lignes": 0, "duree": time.perf_counter() - t0, "erreur": str(e)}
+
+
+# ----------------------------
+# 2. Fusion inter-classeurs
+# ----------------------------
+def fusionner_etudiants(frames: list) -> pd.DataFrame:
+    """
+    Une ligne par Etudiant_id : pour chaque colonne, première valeur non vide dans l'ordre
+    des classeurs (GroupBy.first ignore les valeurs manquantes).
+    """
+    etu = pd.concat(frames, ignore_index=True)
+    if etu.empty:
+        return etu
+    return etu.groupby("Etudiant_id", sort=False, dropna=True).first().reset_index()
+
+
+def fusionner_inscriptions(frames: list) -> pd.DataFrame:
+    insc = pd.concat(frames, ignore_index=True)
+    return insc.drop_duplicates(subset=["Inscription_id"], keep="last").reset_index(drop=True)
+
+
+# ----------------------------
+# 3. Écriture (partitions disjointes, un processus par partition)
+# ----------------------------
+def _ecrire_partition(model, frame, chunksize):
+    """
+    Lignes invalides écartées, puis une transaction par paquet ; un paquet rejeté pour ses
+    données est coupé en sous-paquets. Retourne (lignes écrites, lignes rejetées + _motif).
+    Une erreur hors données (connexion...) remonte au processus principal.
+    """
+    frame, rejets = separer_lignes_invalides(model, frame)
+    rejets, total = [rejets], 0
+    with _engine.connect() as conn:
+        def ecrire(f):
+            with conn.begin():
+                bulk_upsert(conn, model, f)
+
+        for start in range(0, len(frame), chunksize):
+            n, rej = ecrire_avec_repli(ecrire, frame.iloc[start:start + chunksize])
+            total += n
+            rejets.append(rej)
+    return total, pd.concat(rejets)
+
+
+def _ecrire_parallele(pool, nom, model, frame, n_parts, chunksize=CHUNK_SIZE):
+    """
+    Clés déjà dédoublonnées : des tranches contiguës sont des ensembles de clés disjoints.
+    Retourne (lignes écrites, lignes rejetées, partitions en échec [(n°, lignes, erreur)]) ;
+    les lignes d'une partition en échec ne sont pas garanties écrites.
+    """
+    bornes = [len(frame) * k // n_parts for k in range(n_parts + 1)]
+    parts = [frame.iloc[a:b] for a, b in zip(bornes, bornes[1:]) if b > a]
+    futures = {pool.submit(_ecrire_partition, model, p, chunksize): k for k, p in enumerate(parts)}
+    total, rejets, echecs = 0, [], []
+    for f in as_completed(futures):
+        k = futures[f]
+        try:
+            n, rej = f.result()
+            total += n
+            rejets.append(rej)
+        except Exception as e:
+            echecs.append((k, len(parts[k]), str(e).splitlines()[0]))
+            print(f"❌ [{nom}] Partition {k} en erreur ({len(parts[k])} lignes non confirmées) : {e}")
+    return total, rejets, sorted(echecs)
+
+
+def _ecrire_historiques(shards, hist_maps) -> dict:
+    """Peu de lignes (une par entité et par année) : écrites dans le processus principal."""
+    session = get_session()
+    counts = {}
+    try:
+        for ent in ENTITIES_CONFIG:
+            parts = [s["historiques"][ent['type']] for s in shards if ent['type'] in s["historiques"]]
+            if not parts:
+                continue
+            cols_group = ['anneeuniversitaire_annee', ent['code_col']]
+            sub = pd.concat(parts, ignore_index=True).drop_duplicates(subset=cols_group)
+            frame = _history_frame(sub, ent, hist_maps).drop_duplicates(
+                subset=['AnneeUniversitaire_id_fk', ent['fk_field']])
+            counts[ent['type']] = bulk_upsert(session, ent['orm_class'], frame)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [HISTORIQUES] Erreur d'écriture : {e}")
+    finally:
+        session.close()
+    return counts
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def import_inscriptions_shards(source=None, workers=None, with_history=False):
+    """
+    Lecture parallèle des classeurs (un processus chacun), fusion des étudiants et
+    inscriptions communs à plusieurs classeurs, puis écriture parallèle par partitions.
+    source : classeur, dossier ou motif glob (défaut : config.INSCRIPTION_FILE_PATH).
+    """
+    fichiers = lister_sources(source or config.INSCRIPTION_FILE_PATH)
+    print(f"\n--- Importation Étudiants + Inscriptions ({len(fichiers)} classeur(s), processus) ---")
+    if not fichiers:
+        print(f"❌ Aucun classeur trouvé pour : {source or config.INSCRIPTION_FILE_PATH}")
+        return None
+    workers = workers or config.SHARD_WORKERS or os.cpu_count() or 1
+
+    session = get_session()
+    try:
+        maps = (_get_parcours_mapping(session), _get_semestre_mapping(session),
+                _get_annee_mapping(session), _get_mode_mapping(session))
+        hist_maps = _get_mappings(session) if with_history else None
+    finally:
+        session.close()
+
+    stats = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        t0 = time.perf_counter()
+        shards = list(pool.map(_lire_shard, fichiers, repeat(maps), repeat(with_history)))
+        stats["lecture"] = time.perf_counter() - t0
+
+        for s in shards:
+            if s["erreur"]:
+                print(f"❌ [SHARD] {os.path.basename(s['fichier'])} : {s['erreur']}")
+        shards = [s for s in shards if not s["erreur"]]
+        if not shards:
+            return None
+
+        t0 = time.perf_counter()
+        n_lus = sum(len(s["etudiants"]) for s in shards)
+        etudiants = fusionner_etudiants([s["etudiants"] for s in shards])
+        inscriptions = fusionner_inscriptions([s["inscriptions"] for s in shards])
+        stats["fusion"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        # Les inscriptions référencent les étudiants : deux vagues successives
+        stats["etudiants"], rejets_etu, echecs = _ecrire_parallele(pool, "ETUDIANTS", Etudiant, etudiants, workers)
+        _signaler_rejets("ETUDIANTS", rejets_etu, "Etudiant_id")
+        if echecs:
+            # Étudiants non confirmés : la seconde vague échouerait en masse sur la FK
+            raise RuntimeError(
+                f"{len(echecs)} partition(s) d'étudiants en échec ({sum(n for _, n, _ in echecs)} lignes) : "
+                f"vague des inscriptions annulée ({len(inscriptions)} inscriptions non écrites), import à relancer."
+            )
+
+        non_ecrits = set(pd.concat(rejets_etu)["Etudiant_id"]) if rejets_etu else set()
+        orphelines = inscriptions["Etudiant_id_fk"].isin(non_ecrits)
+        stats["etudiants_modifies"] = set(inscriptions.loc[~orphelines, "Etudiant_id_fk"])
+        stats["inscriptions"], rejets_insc, echecs = _ecrire_parallele(
+            pool, "INSCRIPTIONS", Inscription, inscriptions[~orphelines], workers)
+        _signaler_rejets("INSCRIPTIONS",
+                         [inscriptions[orphelines].assign(_motif="étudiant non écrit")] + rejets_insc,
+                         "Inscription_id")
+        if echecs:
+            print(f"⚠️ [SHARDS] {len(echecs)} partition(s) d'inscriptions en échec "
+                  f"({sum(n for _, n, _ in echecs)} lignes non confirmées).")
+            stats["erreur"] = echecs
+        stats["ecriture"] = time.perf_counter() - t0
+
+    if with_history:
+        stats["historiques"] = _ecrire_historiques(shards, hist_maps)
+
+    invalider_cache("etudiants", "inscriptions")
+
+    cumul = sum(s["duree"] for s in shards)
+    print(f"   ⏱️ Lecture : {stats['lecture']:.1f}s ({cumul:.1f}s cumulées sur {len(shards)} classeur(s), "
+          f"x{cumul / max(stats['lecture'], 1e-9):.1f}) | fusion : {stats['fusion']:.1f}s "
+          f"| écriture : {stats['ecriture']:.1f}s ({workers} processus)")
+    print(f"   ℹ️ {n_lus - len(etudiants)} fiche(s) étudiant présente(s) dans plusieurs classeurs fusionnée(s).")
+    print(f"✅ {sum(s['lignes'] for s in shards)} lignes lues, {stats['etudiants']} étudiants et "
+          f"{stats['inscriptions']} inscriptions écrits.")
+    return stats
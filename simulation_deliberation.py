@@ -0,0 +1,283 @@
+# simulation_deliberation.py
+#
+# Simulation de délibération ("et si ?") pour une année entière, sans aucune écriture.
+#
+# Les notes, coefficients et crédits sont chargés et ramenés une seule fois en tableaux
+# numpy (moyennes d'UE et de semestre : elles ne dépendent pas des règles). Chaque variante
+# de règles n'est ensuite qu'une série d'opérations vectorisées sur ces tableaux
+# (quelques millisecondes), puis les variantes sont comparées : taux de validation,
+# crédits acquis, UE acquises, bascules de statut par rapport à la première variante.
+#
+# Une variante est un dict (clés absentes = règles de resultats_engine) :
+#   seuil_ue        moyenne minimale pour acquérir une UE
+#   seuil_semestre  moyenne minimale pour valider un semestre par compensation
+#   compensation    compensation entre UE autorisée
+#   plancher_ue     moyenne d'UE en dessous de laquelle la compensation est refusée (None : aucun)
+#   capitalisation  les UE acquises d'un semestre non validé gardent leurs crédits
+# Chaque valeur peut être donnée par session d'examen : {"N": 10.0, "R": 9.5}.
+#
+#   python simulation_deliberation.py --annee 2023-2024 --seuil-semestre 9 9.5 10 --plancher-ue none 7
+#   python simulation_deliberation.py --annee 2023-2024 --variantes variantes.json --rapport simulation.xlsx
+
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from resultats_engine import (
+    SEUIL_UE, SEUIL_SEMESTRE, COMPENSATION, SEM_KEY,
+    load_deliberation_data, _notes_grid, compute_resultats_ue, _resolve_scope
+)
+
+VARIANTE_DEFAUT = {
+    "seuil_ue": SEUIL_UE,
+    "seuil_semestre": SEUIL_SEMESTRE,
+    "compensation": COMPENSATION,
+    "plancher_ue": None,
+    "capitalisation": True,
+}
+
+STATUTS = np.array(["V", "AJ", "NV"])
+
+
+# ----------------------------
+# Préparation (une fois par année)
+# ----------------------------
+def preparer_simulation(data: dict) -> dict:
+    """
+    Tableaux indépendants des règles, à partir des données de load_deliberation_data :
+    une entrée par (étudiant, UE, session) et par (étudiant, semestre, session).
+    """
+    grid = _notes_grid(data)
+    ue = compute_resultats_ue(grid)
+
+    parcours = data["maquettes"].drop_duplicates("MaquetteUE_id_fk") \
+        .set_index("MaquetteUE_id_fk")["Parcours_id_fk"]
+    codes = data["sessions"].set_index("SessionExamen_id")["SessionExamen_code"]
+    ue["Parcours_id_fk"] = ue["MaquetteUE_id_fk"].map(parcours)
+    ue["SessionExamen_code"] = ue["SessionExamen_id_fk"].map(codes)
+    ue["_pond"] = ue["ResultatUE_moyenne"] * ue["MaquetteUE_credit"]
+
+    groupes = ue.groupby(SEM_KEY + ["ordre"], sort=False)
+    sem = groupes.agg(
+        Parcours_id_fk=("Parcours_id_fk", "first"),
+        SessionExamen_code=("SessionExamen_code", "first"),
+        _pond=("_pond", "sum"),
+        credits=("MaquetteUE_credit", "sum"),
+        min_ue=("ResultatUE_moyenne", "min"),
+    ).reset_index()
+    sem["moyenne"] = (sem["_pond"] / sem["credits"].where(sem["credits"] > 0)).fillna(0.0).round(2)
+
+    # Cellules de synthèse : (session, parcours, semestre)
+    cellules = ["SessionExamen_code", "Parcours_id_fk", "Semestre_id_fk"]
+    cell_idx = sem.groupby(cellules, sort=True).ngroup().to_numpy()
+    cell_keys = sem[cellules].drop_duplicates().sort_values(cellules).reset_index(drop=True)
+
+    sess_ue = pd.Categorical(ue["SessionExamen_code"], categories=codes.tolist())
+    sess_sem = pd.Categorical(sem["SessionExamen_code"], categories=codes.tolist())
+    derniere = int(data["sessions"]["ordre"].max()) if not data["sessions"].empty else 0
+
+    return {
+        "sessions": codes.tolist(),
+        "n_sem": len(sem),
+        "ue_sem": groupes.ngroup().to_numpy(),
+        "ue_moyenne": ue["ResultatUE_moyenne"].to_numpy(float),
+        "ue_credit": ue["MaquetteUE_credit"].to_numpy(float),
+        "ue_session": sess_ue.codes,
+        "sem_moyenne": sem["moyenne"].to_numpy(float),
+        "sem_credits": sem["credits"].to_numpy(float),
+        "sem_min_ue": sem["min_ue"].to_numpy(float),
+        "sem_session": sess_sem.codes,
+        "sem_rattrapable": (sem["ordre"] < derniere).to_numpy(),
+        "sem_cellule": cell_idx,
+        "cellules": cell_keys,
+        "semestres": sem[SEM_KEY + ["Parcours_id_fk", "SessionExamen_code", "moyenne"]],
+    }
+
+
+def _par_session(valeur, sessions, session_idx, dtype=float):
+    """Règle scalaire ou {code session: valeur} -> tableau aligné sur session_idx."""
+    if isinstance(valeur, dict):
+        defaut = valeur.get("*")
+        table = np.array([valeur.get(s, defaut) for s in sessions], dtype=object)
+    else:
+        table = np.array([valeur] * len(sessions), dtype=object)
+    if dtype is float:
+        table = np.array([np.nan if v is None else v for v in table], dtype=float)
+    else:
+        table = table.astype(dtype)
+    return table[session_idx]
+
+
+# ----------------------------
+# Évaluation d'une variante
+# ----------------------------
+def evaluer_variante(prep: dict, variante: dict) -> dict:
+    """Acquisition des UE, validation et crédits des semestres sous une variante de règles."""
+    v = {**VARIANTE_DEFAUT, **variante}
+    sessions = prep["sessions"]
+
+    seuil_ue = _par_session(v["seuil_ue"], sessions, prep["ue_session"])
+    acquise = prep["ue_moyenne"] >= seuil_ue
+    credit_ue = np.where(acquise, prep["ue_credit"], 0.0)
+
+    n = prep["n_sem"]
+    nb_nv = np.bincount(prep["ue_sem"], weights=~acquise, minlength=n)
+    acquis = np.bincount(prep["ue_sem"], weights=credit_ue, minlength=n)
+
+    s = prep["sem_session"]
+    compense = _par_session(v["compensation"], sessions, s, bool) \
+        & (prep["sem_moyenne"] >= _par_session(v["seuil_semestre"], sessions, s))
+    plancher = _par_session(v["plancher_ue"], sessions, s)
+    compense &= np.isnan(plancher) | (prep["sem_min_ue"] >= np.nan_to_num(plancher))
+    valide = (nb_nv == 0) | compense
+
+    capitalise = _par_session(v["capitalisation"], sessions, s, bool)
+    credits = np.where(valide, prep["sem_credits"], np.where(capitalise, acquis, 0.0))
+    statut = np.where(valide, 0, np.where(prep["sem_rattrapable"], 1, 2))
+    return {"ue_acquise": acquise, "valide": valide, "credits": credits, "statut": statut}
+
+
+def _nom(variante: dict) -> str:
+    if "nom" in variante:
+        return variante["nom"]
+    return ", ".join(f"{k}={v}" for k, v in variante.items()) or "règles actuelles"
+
+
+def grille_variantes(**axes) -> list:
+    """Produit cartésien des valeurs de règles : grille_variantes(seuil_semestre=[9, 10], plancher_ue=[None, 7])."""
+    noms = list(axes)
+    return [dict(zip(noms, valeurs)) for valeurs in itertools.product(*(axes[n] for n in noms))]
+
+
+# ----------------------------
+# Comparaison de variantes
+# ----------------------------
+def comparer_variantes(prep: dict, variantes: list) -> dict:
+    """
+    Évalue chaque variante et retourne :
+    - "synthese" : par variante et session, semestres délibérés, taux de validation, crédits moyens,
+      taux d'UE acquises, bascules de statut par rapport à la première variante ;
+    - "parcours" : mêmes indicateurs par variante, session, parcours et semestre.
+    """
+    cellules = prep["cellules"]
+    n_cell = len(cellules)
+    cell = prep["sem_cellule"]
+    effectif = np.bincount(cell, minlength=n_cell)
+    cell_ue = cell[prep["ue_sem"]]
+    n_ue = np.bincount(cell_ue, minlength=n_cell)
+
+    synthese, detail = [], []
+    reference = None
+    for i, variante in enumerate(variantes):
+        t0 = time.perf_counter()
+        r = evaluer_variante(prep, variante)
+        if reference is None:
+            reference = r["statut"]
+        bascules = r["statut"] != reference
+
+        d = cellules.copy()
+        d.insert(0, "variante", _nom(variante))
+        d["ordre_variante"] = i
+        d["semestres"] = effectif
+        d["valides"] = np.bincount(cell, weights=r["valide"], minlength=n_cell).astype(int)
+        d["ajournes"] = np.bincount(cell, weights=r["statut"] == 1, minlength=n_cell).astype(int)
+        d["credits"] = np.bincount(cell, weights=r["credits"], minlength=n_cell)
+        d["ue"] = n_ue
+        d["ue_acquises"] = np.bincount(cell_ue, weights=r["ue_acquise"], minlength=n_cell).astype(int)
+        d["bascules"] = np.bincount(cell, weights=bascules, minlength=n_cell).astype(int)
+        d["ms"] = (time.perf_counter() - t0) * 1000
+        detail.append(d)
+
+    if not detail:
+        return {"synthese": pd.DataFrame(), "parcours": pd.DataFrame()}
+    detail = pd.concat(detail, ignore_index=True)
+    sommes = ["semestres", "valides", "ajournes", "credits", "ue", "ue_acquises", "bascules"]
+    synthese = detail.groupby(["ordre_variante", "variante", "SessionExamen_code"], as_index=False, sort=True) \
+        .agg(**{c: (c, "sum") for c in sommes}, ms=("ms", "first"))
+
+    for df in (detail, synthese):
+        df["taux_validation"] = (df["valides"] / df["semestres"].where(df["semestres"] > 0) * 100).round(2)
+        df["credits_moyens"] = (df["credits"] / df["semestres"].where(df["semestres"] > 0)).round(2)
+        df["taux_ue_acquises"] = (df["ue_acquises"] / df["ue"].where(df["ue"] > 0) * 100).round(2)
+        df["credits"] = df["credits"].round(1)
+    detail = detail.drop(columns="ms")
+    synthese["ms"] = synthese["ms"].round(2)
+    return {"synthese": synthese.drop(columns="ordre_variante"), "parcours": detail.drop(columns="ordre_variante")}
+
+
+# ----------------------------
+# ORCHESTRATEUR
+# ----------------------------
+def simuler_deliberation(session: Session, annee_code, variantes, rapport=None) -> dict:
+    """
+    Charge une année, évalue les variantes (la première sert de référence pour les bascules)
+    et affiche la synthèse. Rien n'est écrit en base ; rapport : classeur Excel facultatif.
+    """
+    print(f"\n--- Simulation de délibération {annee_code} ({len(variantes)} variante(s)) ---")
+    annee_id, _ = _resolve_scope(session, annee_code)
+
+    t0 = time.perf_counter()
+    data = load_deliberation_data(session, annee_id=annee_id)
+    session.rollback()  # lecture seule : libère la transaction pendant le calcul
+    t_lecture = time.perf_counter() - t0
+    prep = preparer_simulation(data)
+    t_prep = time.perf_counter() - t0 - t_lecture
+    print(f"   📥 {len(data['notes'])} notes lues en {t_lecture:.2f}s ; "
+          f"{prep['n_sem']} semestres, {len(prep['ue_moyenne'])} UE préparés en {t_prep:.2f}s.")
+
+    t1 = time.perf_counter()
+    resultats = comparer_variantes(prep, variantes)
+    print(f"   ⏱️ {len(variantes)} variante(s) en {time.perf_counter() - t1:.3f}s")
+    if not resultats["synthese"].empty:
+        cols = ["variante", "SessionExamen_code", "semestres", "taux_validation", "credits_moyens",
+                "taux_ue_acquises", "bascules"]
+        print(resultats["synthese"][cols].to_string(index=False))
+
+    if rapport:
+        with pd.ExcelWriter(rapport) as writer:
+            for nom, df in resultats.items():
+                df.to_excel(writer, sheet_name=nom, index=False)
+        print(f"   📄 Rapport écrit : {rapport}")
+    return resultats
+
+
+def _valeur_cli(v):
+    return None if v.lower() == "none" else float(v)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Simulation de délibération (aucune écriture)")
+    parser.add_argument("--annee", required=True, help="Année universitaire, ex. 2023-2024")
+    parser.add_argument("--variantes", default=None, help="Fichier JSON : liste de variantes (dicts)")
+    parser.add_argument("--seuil-ue", nargs="+", type=float, default=None)
+    parser.add_argument("--seuil-semestre", nargs="+", type=float, default=None)
+    parser.add_argument("--plancher-ue", nargs="+", type=_valeur_cli, default=None,
+                        help="Valeurs ou 'none'")
+    parser.add_argument("--sans-compensation", action="store_true",
+                        help="Ajoute la variante sans compensation à la grille")
+    parser.add_argument("--rapport", default=None, help="Classeur Excel de sortie")
+    args = parser.parse_args()
+
+    if args.variantes:
+        with open(args.variantes, encoding="utf-8") as f:
+            variantes = json.load(f)
+    else:
+        axes = {k: v for k, v in [("seuil_ue", args.seuil_ue), ("seuil_semestre", args.seuil_semestre),
+                                  ("plancher_ue", args.plancher_ue)] if v}
+        if args.sans_compensation:
+            axes["compensation"] = [True, False]
+        # Règles actuelles en premier : référence des bascules
+        variantes = [{}] + grille_variantes(**axes) if axes else [{}]
+
+    db = get_session()
+    try:
+        simuler_deliberation(db, args.annee, variantes, args.rapport)
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+# suivi_notes.py
+
+import pandas as pd
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import Note, MaquetteUE, MaquetteEC, ResultatARecalculer
+from bulk_utils import bulk_upsert
+
+NOTE_KEY = ["Etudiant_id_fk", "EC_id_fk", "AnneeUniversitaire_id_fk", "SessionExamen_id_fk"]
+
+
+# ----------------------------
+# Marquage des clés impactées
+# ----------------------------
+def marquer_notes_modifiees(bind, notes_keys: pd.DataFrame) -> int:
+    """
+    Traduit des clés de notes (Etudiant, EC, Année, Session) en clés de résultats
+    (Etudiant, MaquetteUE, Session) et les ajoute à la table resultats_a_recalculer.
+    - bind : Session ou Connection SQLAlchemy (la transaction de l'écriture des notes)
+    """
+    if notes_keys is None or notes_keys.empty:
+        return 0
+
+    annees = notes_keys["AnneeUniversitaire_id_fk"].unique().tolist()
+    ecs = notes_keys["EC_id_fk"].unique().tolist()
+
+    stmt = (
+        select(MaquetteEC.EC_id_fk, MaquetteUE.AnneeUniversitaire_id_fk,
+               MaquetteUE.MaquetteUE_id.label("MaquetteUE_id_fk"))
+        .join(MaquetteUE, MaquetteEC.MaquetteUE_id_fk == MaquetteUE.MaquetteUE_id)
+        .where(MaquetteUE.AnneeUniversitaire_id_fk.in_(annees))
+        .where(MaquetteEC.EC_id_fk.in_(ecs))
+    )
+    conn = bind.connection() if isinstance(bind, Session) else bind
+    maq = pd.read_sql(stmt, conn)
+
+    # Un EC partagé par plusieurs parcours marque toutes ses maquettes :
+    # le recalcul ne retient ensuite que celle de l'inscription de l'étudiant.
+    dirty = (
+        notes_keys.merge(maq, on=["EC_id_fk", "AnneeUniversitaire_id_fk"])
+                  [["Etudiant_id_fk", "MaquetteUE_id_fk", "SessionExamen_id_fk"]]
+                  .drop_duplicates()
+    )
+    return bulk_upsert(conn, ResultatARecalculer, dirty, update_cols=[])
+
+
+# ----------------------------
+# Suivi des écritures ORM
+# ----------------------------
+def _cle_avant_flush(obj) -> dict:
+    """Clé de la note avant modification (historique des attributs, encore intact en after_flush)."""
+    attrs = inspect(obj).attrs
+    return {k: (attrs[k].history.deleted[0] if attrs[k].history.deleted else getattr(obj, k))
+            for k in NOTE_KEY}
+
+
+def _enregistrer_notes_modifiees(session: Session, flush_context):
+    """
+    after_flush : toute note ajoutée, modifiée ou supprimée via l'ORM est marquée ;
+    une note dont la clé change (étudiant, EC, année, session) marque l'ancienne et la nouvelle.
+    """
+    keys = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Note):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        keys.append({k: getattr(obj, k) for k in NOTE_KEY})
+        if obj in session.dirty:
+            keys.append(_cle_avant_flush(obj))
+
+    if keys:
+        marquer_notes_modifiees(session.connection(), pd.DataFrame(keys).drop_duplicates())
+
+
+event.listen(Session, "after_flush", _enregistrer_notes_modifiees)
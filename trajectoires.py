@@ -0,0 +1,296 @@
+# trajectoires.py
+#
+# Trajectoires des étudiants (table trajectoires) : une ligne par étudiant et par année,
+# dérivée des inscriptions en une passe SQL (fonctions de fenêtre) :
+#   - inscription principale de l'année : niveau le plus élevé (ordre parcours_niveaux.ORDRE) ;
+#   - rang, année et niveau d'entrée, événement par rapport à l'année précédente
+#     (ENTREE, PASSAGE, REDOUBLEMENT, RETROGRADATION, REPRISE après interruption),
+#     changement de parcours, année d'inscription suivante.
+# Rafraîchissement incrémental : main.py recalcule les étudiants touchés par l'import
+# (toutes leurs années) ; en ligne de commande, --rafraichir compare les inscriptions
+# principales à la table pour trouver les étudiants à recalculer, --complet reconstruit tout.
+# Requêtes de cohorte au-dessus : flux_cohorte, taux_redoublement, sorties.
+#
+#   python trajectoires.py --rafraichir [--complet]
+#   python trajectoires.py --cohorte 2022-2023 --niveau L1 [--parcours CODE]
+#   python trajectoires.py --redoublement [--annee 2023-2024]
+#   python trajectoires.py --sorties 2022-2023
+
+import time
+
+import pandas as pd
+from sqlalchemy import and_, case, delete, func, literal, select
+from sqlalchemy.orm import Session
+
+from models import Trajectoire, Inscription, Semestre, Niveau, Parcours, AnneeUniversitaire
+from parcours_niveaux import ORDRE
+from bulk_utils import DEFAULT_CHUNK_SIZE
+
+# Niveaux de fin de cycle : une sortie après l'un d'eux n'est pas comptée comme abandon
+NIVEAUX_FIN_CYCLE = {"L3", "M2", "D3"}
+
+COLONNES = ["Etudiant_id_fk", "AnneeUniversitaire_id_fk", "AnneeUniversitaire_ordre",
+            "Parcours_id_fk", "Niveau_id_fk", "Niveau_ordre"]
+
+
+# ----------------------------
+# Construction (SQL)
+# ----------------------------
+def _inscriptions_principales(etudiants=None):
+    """(étudiant, année) -> inscription de niveau le plus élevé (parcours départagés par ID)."""
+    niveau_ordre = case(ORDRE, value=Niveau.Niveau_code, else_=None)
+    rang = func.row_number().over(
+        partition_by=[Inscription.Etudiant_id_fk, Inscription.AnneeUniversitaire_id_fk],
+        order_by=[niveau_ordre.desc().nulls_last(), Inscription.Parcours_id_fk],
+    )
+    stmt = (
+        select(
+            Inscription.Etudiant_id_fk, Inscription.AnneeUniversitaire_id_fk,
+            AnneeUniversitaire.AnneeUniversitaire_ordre, Inscription.Parcours_id_fk,
+            Niveau.Niveau_id.label("Niveau_id_fk"), niveau_ordre.label("Niveau_ordre"),
+            rang.label("_rang"),
+        )
+        .join(Semestre, Inscription.Semestre_id_fk == Semestre.Semestre_id)
+        .join(Niveau, Semestre.Niveau_id_fk == Niveau.Niveau_id)
+        .join(AnneeUniversitaire, Inscription.AnneeUniversitaire_id_fk == AnneeUniversitaire.AnneeUniversitaire_id)
+    )
+    if etudiants is not None:
+        stmt = stmt.where(Inscription.Etudiant_id_fk.in_(etudiants))
+    sub = stmt.subquery("insc")
+    return select(*[sub.c[c] for c in COLONNES]).where(sub.c._rang == 1).subquery("principales")
+
+
+def _trajectoires_select(etudiants=None):
+    """Une ligne de trajectoires par (étudiant, année), fenêtres par étudiant dans l'ordre des années."""
+    p = _inscriptions_principales(etudiants)
+    w = {"partition_by": p.c.Etudiant_id_fk, "order_by": p.c.AnneeUniversitaire_ordre}
+    prec_annee = func.lag(p.c.AnneeUniversitaire_ordre).over(**w)
+    prec_niveau = func.lag(p.c.Niveau_ordre).over(**w)
+    prec_parcours = func.lag(p.c.Parcours_id_fk).over(**w)
+
+    evenement = case(
+        (prec_annee.is_(None), "ENTREE"),
+        (p.c.AnneeUniversitaire_ordre - prec_annee > 1, "REPRISE"),
+        (p.c.Niveau_ordre > prec_niveau, "PASSAGE"),
+        (p.c.Niveau_ordre == prec_niveau, "REDOUBLEMENT"),
+        (p.c.Niveau_ordre < prec_niveau, "RETROGRADATION"),
+        else_="PASSAGE",
+    )
+    return select(
+        *[p.c[c] for c in COLONNES],
+        func.row_number().over(**w).label("Trajectoire_rang"),
+        func.first_value(p.c.AnneeUniversitaire_ordre).over(**w).label("Trajectoire_entree_annee_ordre"),
+        func.first_value(p.c.Niveau_ordre).over(**w).label("Trajectoire_entree_niveau_ordre"),
+        evenement.label("Trajectoire_evenement"),
+        case((and_(prec_parcours.is_not(None), prec_parcours != p.c.Parcours_id_fk), True),
+             else_=False).label("Trajectoire_is_changement_parcours"),
+        func.lead(p.c.AnneeUniversitaire_ordre).over(**w).label("Trajectoire_suivante_annee_ordre"),
+    )
+
+
+def _etudiants_modifies(session: Session) -> list:
+    """Étudiants dont les inscriptions principales ne correspondent plus à la table (dans un sens ou l'autre)."""
+    p = _inscriptions_principales()
+    t = Trajectoire.__table__
+    actuelles = select(*[p.c[c] for c in COLONNES])
+    stockees = select(*[t.c[c] for c in COLONNES])
+    etudiants = set()
+    for ecarts in (actuelles.except_(stockees), stockees.except_(actuelles)):
+        ecarts = ecarts.subquery()
+        etudiants.update(e for (e,) in session.execute(select(ecarts.c.Etudiant_id_fk).distinct()))
+    return sorted(etudiants)
+
+
+def _inserer(session: Session, etudiants=None) -> int:
+    sel = _trajectoires_select(etudiants)
+    cols = [c.name for c in sel.selected_columns]
+    return session.execute(Trajectoire.__table__.insert().from_select(cols, sel)).rowcount
+
+
+def rafraichir_trajectoires(session: Session, complet=False, etudiants=None) -> dict:
+    """
+    Met la table trajectoires à jour depuis les inscriptions.
+    - etudiants     : recalcule ces étudiants seulement (ceux que l'import a touchés),
+      sans comparer la table aux inscriptions ;
+    - complet=False : compare les inscriptions principales à la table et recalcule les
+      étudiants qui diffèrent (nouvelle année, changement de niveau / parcours,
+      inscriptions supprimées) ;
+    - complet=True  : vide et reconstruit toute la table en une instruction.
+    """
+    print("\n--- Trajectoires des étudiants ---")
+    t0 = time.perf_counter()
+    t = Trajectoire.__table__
+    try:
+        if complet:
+            session.execute(delete(t))
+            n = _inserer(session)
+            stats = {"etudiants": None, "lignes": n}
+        else:
+            etudiants = _etudiants_modifies(session) if etudiants is None else sorted(etudiants)
+            n = 0
+            for start in range(0, len(etudiants), DEFAULT_CHUNK_SIZE):
+                lot = etudiants[start:start + DEFAULT_CHUNK_SIZE]
+                session.execute(delete(t).where(t.c.Etudiant_id_fk.in_(lot)))
+                n += _inserer(session, lot)
+            stats = {"etudiants": len(etudiants), "lignes": n}
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"❌ [TRAJECTOIRES] Erreur de rafraîchissement : {e}")
+        return {}
+
+    qui = "reconstruction complète" if complet else f"{stats['etudiants']} étudiant(s) recalculé(s)"
+    print(f"✅ Trajectoires : {qui}, {stats['lignes']} ligne(s) en {time.perf_counter() - t0:.2f}s.")
+    return stats
+
+
+# ----------------------------
+# Requêtes de cohorte
+# ----------------------------
+def _ordre_annee(session: Session, annee) -> int:
+    ordre = session.execute(
+        select(AnneeUniversitaire.AnneeUniversitaire_ordre)
+        .where((AnneeUniversitaire.AnneeUniversitaire_annee == annee) | (AnneeUniversitaire.AnneeUniversitaire_id == annee))
+    ).scalar()
+    if ordre is None:
+        raise ValueError(f"Année universitaire inconnue : {annee}")
+    return ordre
+
+
+def _niveaux() -> dict:
+    return {v: k for k, v in ORDRE.items()}
+
+
+def flux_cohorte(session: Session, annee, niveau="L1", parcours=None, entrants=False) -> pd.DataFrame:
+    """
+    Devenir des étudiants inscrits en `niveau` l'année `annee` (entrants=True : seulement ceux
+    dont c'est la première année) : une ligne par année suivante (0 = année de la cohorte),
+    une colonne par niveau, une colonne non_inscrits (sortis ou en interruption cette année-là)
+    et, pour chaque niveau supérieur, atteint_<niveau> (cumul des étudiants l'ayant atteint).
+    Ex. "combien de L1 de 2022-2023 ont atteint la L3" : colonne atteint_L3.
+    """
+    o = _ordre_annee(session, annee)
+    t = Trajectoire.__table__
+    cohorte = select(t.c.Etudiant_id_fk).where(t.c.AnneeUniversitaire_ordre == o, t.c.Niveau_ordre == ORDRE[niveau])
+    if entrants:
+        cohorte = cohorte.where(t.c.Trajectoire_rang == 1)
+    if parcours is not None:
+        cohorte = cohorte.join(Parcours, t.c.Parcours_id_fk == Parcours.Parcours_id) \
+                         .where(Parcours.Parcours_code == parcours)
+
+    stmt = (
+        select((t.c.AnneeUniversitaire_ordre - o).label("annee_relative"), t.c.Niveau_ordre,
+               func.count().label("etudiants"))
+        .where(t.c.Etudiant_id_fk.in_(cohorte), t.c.AnneeUniversitaire_ordre >= o)
+        .group_by(t.c.AnneeUniversitaire_ordre, t.c.Niveau_ordre)
+    )
+    df = pd.read_sql(stmt, session.connection())
+    taille = session.execute(select(func.count()).select_from(cohorte.subquery())).scalar()
+    derniere = session.execute(select(func.max(t.c.AnneeUniversitaire_ordre))).scalar() or o
+
+    annees = pd.RangeIndex(0, derniere - o + 1, name="annee_relative")
+    flux = df.assign(niveau=df["Niveau_ordre"].map(_niveaux()).fillna("?")) \
+             .pivot_table(index="annee_relative", columns="niveau", values="etudiants", aggfunc="sum", fill_value=0) \
+             .reindex(annees, fill_value=0)
+    flux = flux[sorted(flux.columns, key=lambda c: ORDRE.get(c, 99))]
+    flux.columns.name = None
+    flux["inscrits"] = flux.sum(axis=1)
+    flux["non_inscrits"] = taille - flux["inscrits"]
+    for niv in [c for c in flux.columns if c in ORDRE and ORDRE[c] > ORDRE[niveau]]:
+        flux[f"atteint_{niv}"] = _atteint(session, cohorte, o, ORDRE[niv], annees)
+    return flux.reset_index()
+
+
+def _atteint(session, cohorte, o, niveau_ordre, annees) -> list:
+    """Nombre cumulé d'étudiants de la cohorte ayant atteint le niveau à chaque année relative."""
+    t = Trajectoire.__table__
+    premiere = (
+        select(func.min(t.c.AnneeUniversitaire_ordre).label("o"))
+        .where(t.c.Etudiant_id_fk.in_(cohorte), t.c.AnneeUniversitaire_ordre >= o,
+               t.c.Niveau_ordre >= niveau_ordre)
+        .group_by(t.c.Etudiant_id_fk)
+    ).subquery()
+    par_annee = dict(session.execute(select(premiere.c.o - o, func.count()).group_by(premiere.c.o)).all())
+    return pd.Series([par_annee.get(a, 0) for a in annees]).cumsum().tolist()
+
+
+def taux_redoublement(session: Session, annee=None) -> pd.DataFrame:
+    """
+    Par année, parcours et niveau : étudiants réinscrits l'année suivant la précédente
+    (hors entrées et reprises), redoublants et taux de redoublement (%).
+    """
+    t = Trajectoire.__table__
+    redouble = case((t.c.Trajectoire_evenement == "REDOUBLEMENT", 1), else_=0)
+    stmt = (
+        select(AnneeUniversitaire.AnneeUniversitaire_annee, Parcours.Parcours_code, t.c.Niveau_ordre,
+               func.count().label("reinscrits"), func.sum(redouble).label("redoublants"))
+        .join(AnneeUniversitaire, t.c.AnneeUniversitaire_id_fk == AnneeUniversitaire.AnneeUniversitaire_id)
+        .join(Parcours, t.c.Parcours_id_fk == Parcours.Parcours_id)
+        .where(t.c.Trajectoire_evenement.in_(["PASSAGE", "REDOUBLEMENT", "RETROGRADATION"]))
+        .group_by(AnneeUniversitaire.AnneeUniversitaire_annee, t.c.AnneeUniversitaire_ordre,
+                  Parcours.Parcours_code, t.c.Niveau_ordre)
+        .order_by(t.c.AnneeUniversitaire_ordre, Parcours.Parcours_code, t.c.Niveau_ordre)
+    )
+    if annee is not None:
+        stmt = stmt.where(t.c.AnneeUniversitaire_ordre == _ordre_annee(session, annee))
+    df = pd.read_sql(stmt, session.connection())
+    df.insert(2, "niveau", df.pop("Niveau_ordre").map(_niveaux()))
+    df["taux_redoublement"] = (df["redoublants"] / df["reinscrits"] * 100).round(2)
+    return df
+
+
+def sorties(session: Session, annee) -> pd.DataFrame:
+    """
+    Étudiants inscrits l'année `annee` et jamais réinscrits ensuite, par parcours et niveau :
+    sorties en fin de cycle (L3, M2, D3) et abandons. Pour la dernière année connue, personne
+    n'est encore "sorti".
+    """
+    o = _ordre_annee(session, annee)
+    t = Trajectoire.__table__
+    derniere = session.execute(select(func.max(t.c.AnneeUniversitaire_ordre))).scalar()
+    fin_cycle = [ORDRE[n] for n in NIVEAUX_FIN_CYCLE]
+    sorti = and_(t.c.Trajectoire_suivante_annee_ordre.is_(None), literal(o) < derniere)
+    stmt = (
+        select(Parcours.Parcours_code, t.c.Niveau_ordre,
+               func.count().label("inscrits"),
+               func.sum(case((and_(sorti, t.c.Niveau_ordre.in_(fin_cycle)), 1), else_=0)).label("sorties_fin_cycle"),
+               func.sum(case((and_(sorti, t.c.Niveau_ordre.not_in(fin_cycle)), 1), else_=0)).label("abandons"))
+        .join(Parcours, t.c.Parcours_id_fk == Parcours.Parcours_id)
+        .where(t.c.AnneeUniversitaire_ordre == o)
+        .group_by(Parcours.Parcours_code, t.c.Niveau_ordre)
+        .order_by(Parcours.Parcours_code, t.c.Niveau_ordre)
+    )
+    df = pd.read_sql(stmt, session.connection())
+    df.insert(1, "niveau", df.pop("Niveau_ordre").map(_niveaux()))
+    df["taux_abandon"] = (df["abandons"] / df["inscrits"] * 100).round(2)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_setup import get_session
+
+    parser = argparse.ArgumentParser(description="Trajectoires des étudiants")
+    parser.add_argument("--rafraichir", action="store_true")
+    parser.add_argument("--complet", action="store_true", help="Reconstruction complète")
+    parser.add_argument("--cohorte", default=None, help="Année de la cohorte, ex. 2022-2023")
+    parser.add_argument("--niveau", default="L1")
+    parser.add_argument("--parcours", default=None, help="Code parcours")
+    parser.add_argument("--entrants", action="store_true", help="Seulement les primo-inscrits")
+    parser.add_argument("--redoublement", action="store_true")
+    parser.add_argument("--annee", default=None)
+    parser.add_argument("--sorties", default=None, help="Année universitaire")
+    args = parser.parse_args()
+
+    db = get_session()
+    try:
+        if args.rafraichir:
+            rafraichir_trajectoires(db, complet=args.complet)
+        if args.cohorte:
+            print(flux_cohorte(db, args.cohorte, args.niveau, args.parcours, args.entrants).to_string(index=False))
+        if args.redoublement:
+            print(taux_redoublement(db, args.annee).to_string(index=False))
+        if args.sorties:
+            print(sorties(db, args.sorties).to_string(index=False))
+    finally:
+        db.close()
@@ -0,0 +1,343 @@
+# validation_sources.py
+#
+# Contrôle des fichiers sources (institutions, métadonnées, inscriptions) avant toute
+# écriture en base. Les règles sont déclarées par source et par colonne (REGLES) ; chaque
+# contrôle s'applique à la colonne entière (masque pandas), et toutes les anomalies sont
+# rassemblées dans un seul rapport : source, fichier, ligne Excel, colonne, contrôle,
+# gravité, valeur, message.
+#
+# Contrôles disponibles (CONTROLES) :
+#   requis        valeur vide
+#   entier        non numérique / non entier, bornes min / max facultatives
+#   date          date illisible, bornes min / max ("aujourd'hui" accepté, decalage_ans)
+#   codes         valeur hors de la liste autorisée
+#   format        valeur ne respectant pas l'expression régulière
+#   reference     code introuvable dans une colonne d'une autre source (ex. métadonnées)
+#   unique        valeur (ou combinaison de colonnes) présente plusieurs fois
+#   posterieure   date antérieure à celle d'une autre colonne de la même ligne
+# Un classeur illisible est rapporté en ERREUR (contrôle "lecture") : le mode bloquant s'arrête.
+#
+#   python validation_sources.py [--rapport anomalies.xlsx]
+
+import os
+import re
+from datetime import date
+
+import pandas as pd
+
+import config
+from inscriptions_import import lister_sources
+from parcours_niveaux import ORDRE
+
+ERREUR = "ERREUR"
+AVERTISSEMENT = "AVERTISSEMENT"
+
+# Lignes de résumé affichées en console
+RESUME_MAX = 20
+# Au-delà, le rapport est écrit en CSV (même nom, extension .csv) : l'écriture Excel serait trop lente
+RAPPORT_EXCEL_MAX = 50000
+
+REGLES = {
+    "institutions": [
+        {"colonne": "institution_code", "controle": "requis"},
+        {"colonne": "institution_code", "controle": "unique"},
+        {"colonne": "institution_nom", "controle": "requis", "gravite": AVERTISSEMENT},
+    ],
+    "metadata": [
+        {"colonne": "parcours_code", "controle": "requis"},
+        {"colonne": "institution_code", "controle": "reference", "source": "institutions"},
+        {"colonne": "composante_code", "controle": "requis"},
+        {"colonne": "domaine_code", "controle": "requis"},
+        {"colonne": "mention_code", "controle": "requis"},
+        {"colonne": "typeformation_code", "controle": "codes", "valeurs": ["FI", "FC"],
+         "gravite": AVERTISSEMENT},
+        {"colonne": "date_creation", "controle": "date", "min": "1950-01-01", "max": "aujourd'hui",
+         "gravite": AVERTISSEMENT},
+        {"colonne": "date_fin", "controle": "posterieure", "a": "date_creation", "gravite": AVERTISSEMENT},
+        {"colonne": ["parcours_code", "mention_code"], "controle": "unique", "gravite": AVERTISSEMENT},
+    ],
+    "inscriptions": [
+        {"colonne": "inscription_code", "controle": "requis"},
+        {"colonne": "inscription_code", "controle": "unique"},
+        {"colonne": "etudiant_id", "controle": "requis"},
+        {"colonne": "etudiant_nom", "controle": "requis"},
+        {"colonne": "anneeuniversitaire_annee", "controle": "requis"},
+        {"colonne": "anneeuniversitaire_annee", "controle": "format", "motif": r"\d{4}-\d{4}"},
+        {"colonne": "parcours_code", "controle": "requis"},
+        {"colonne": "parcours_code", "controle": "reference", "source": "metadata"},
+        {"colonne": "semestre_numero", "controle": "requis"},
+        {"colonne": "semestre_numero", "controle": "format", "motif": r"S?0?[1-9]|S?1[0-6]"},
+        {"colonne": "niveau_code", "controle": "codes", "valeurs": list(ORDRE), "gravite": AVERTISSEMENT},
+        {"colonne": "modeinscription_label", "controle": "codes", "valeurs": ["CLASSIQUE", "HYBRIDE"],
+         "gravite": AVERTISSEMENT},
+        {"colonne": "institution_code", "controle": "reference", "source": "institutions",
+         "gravite": AVERTISSEMENT},
+        {"colonne": "etudiant_sexe", "controle": "codes", "valeurs": ["M", "F", "MASCULIN", "FEMININ", "A"],
+         "gravite": AVERTISSEMENT},
+        {"colonne": "etudiant_naissance_date", "controle": "date", "min": "1940-01-01", "max": "aujourd'hui",
+         "decalage_ans": 14, "gravite": AVERTISSEMENT},
+        {"colonne": "etudiant_cin_date", "controle": "posterieure", "a": "etudiant_naissance_date",
+         "gravite": AVERTISSEMENT},
+        {"colonne": "etudiant_bacc_annee", "controle": "entier", "min": 1950, "max": date.today().year,
+         "gravite": AVERTISSEMENT},
+    ],
+}
+
+
+# ----------------------------
+# Lecture brute des sources
+# ----------------------------
+def _lire(fichiers, nom=None, echecs=None) -> pd.DataFrame:
+    """
+    Classeurs lus tels quels (colonnes normalisées) + fichier et ligne Excel d'origine.
+    echecs : si fourni, un classeur illisible y est ajouté (ligne de rapport) au lieu de lever.
+    """
+    frames = []
+    for f in fichiers:
+        try:
+            df = pd.read_excel(f)
+        except Exception as e:
+            if echecs is None:
+                raise
+            echecs.append(_echec_lecture(nom, os.path.basename(f), e))
+            continue
+        df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(" ", "_")
+        df["_fichier"] = os.path.basename(f)
+        df["_ligne"] = df.index + 2  # ligne 1 : en-têtes
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _echec_lecture(nom, fichier, e) -> dict:
+    return {"source": nom or "", "fichier": fichier, "ligne": None, "colonne": None,
+            "controle": "lecture", "gravite": ERREUR, "valeur": fichier,
+            "message": f"fichier illisible : {e}"}
+
+
+def charger_sources(echecs=None) -> dict:
+    return {
+        "institutions": _lire([config.INSTITUTION_FILE_PATH], "institutions", echecs),
+        "metadata": _lire([config.METADATA_FILE_PATH], "metadata", echecs),
+        "inscriptions": _lire(lister_sources(config.INSCRIPTION_FILE_PATH), "inscriptions", echecs),
+    }
+
+
+# ----------------------------
+# Contrôles (masque des lignes en anomalie)
+# ----------------------------
+def _texte(s: pd.Series) -> pd.Series:
+    """Valeurs en texte nettoyé ; vide / 'nan' / 'None' -> NA. Un entier lu en float (12.0) redevient '12'."""
+    t = s.astype("string").str.strip().str.replace(r"^(-?\d+)\.0+$", r"\1", regex=True)
+    return t.mask(t.isin(["", "nan", "None", "NaT", "<NA>"]))
+
+
+def _borne(valeur, decalage_ans=0):
+    if valeur == "aujourd'hui":
+        return pd.Timestamp(date.today()) - pd.DateOffset(years=decalage_ans)
+    return pd.Timestamp(valeur)
+
+
+def _dates(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(s.astype(object).where(s.notna()), errors="coerce", dayfirst=True)
+
+
+def _requis(df, col, regle, ctx):
+    return ctx.texte(col).isna()
+
+
+def _entier(df, col, regle, ctx):
+    t = ctx.texte(col)
+    n = pd.to_numeric(t, errors="coerce")
+    ko = t.notna() & (n.isna() | (n % 1 != 0))
+    if "min" in regle:
+        ko |= n < regle["min"]
+    if "max" in regle:
+        ko |= n > regle["max"]
+    return ko
+
+
+def _date(df, col, regle, ctx):
+    d = _dates(df[col])
+    ko = df[col].notna() & ctx.texte(col).notna() & d.isna()
+    if "min" in regle:
+        ko |= d < _borne(regle["min"])
+    if "max" in regle:
+        ko |= d > _borne(regle["max"], regle.get("decalage_ans", 0))
+    return ko
+
+
+def _codes(df, col, regle, ctx):
+    t = ctx.texte(col).str.upper()
+    return t.notna() & ~t.isin([str(v).upper() for v in regle["valeurs"]])
+
+
+def _format(df, col, regle, ctx):
+    t = ctx.texte(col)
+    return t.notna() & ~t.str.fullmatch(regle["motif"], flags=re.IGNORECASE).fillna(False)
+
+
+def _reference(df, col, regle, ctx):
+    ref = ctx.sources.get(regle["source"])
+    ref_col = regle.get("colonne_ref", col)
+    if ref is None or ref_col not in ref.columns:
+        return pd.Series(False, index=df.index)
+    t = ctx.texte(col)
+    return t.notna() & ~t.isin(_texte(ref[ref_col]).dropna().unique())
+
+
+def _unique(df, cols, regle, ctx):
+    cles = pd.DataFrame({c: ctx.texte(c) for c in cols})
+    return cles.notna().all(axis=1) & cles.duplicated(keep=False)
+
+
+def _posterieure(df, col, regle, ctx):
+    if regle["a"] not in df.columns:
+        return pd.Series(False, index=df.index)
+    return _dates(df[col]) < _dates(df[regle["a"]])
+
+
+CONTROLES = {
+    "requis": _requis,
+    "entier": _entier,
+    "date": _date,
+    "codes": _codes,
+    "format": _format,
+    "reference": _reference,
+    "unique": _unique,
+    "posterieure": _posterieure,
+}
+
+
+def _message(regle) -> str:
+    c = regle["controle"]
+    if c == "reference":
+        return f"introuvable dans {regle['source']}"
+    if c == "codes":
+        return f"hors liste {regle['valeurs']}"
+    if c == "format":
+        return f"format attendu {regle['motif']}"
+    if c == "posterieure":
+        return f"antérieure à {regle['a']}"
+    if c in ("entier", "date") and ("min" in regle or "max" in regle):
+        return f"{c} invalide ou hors [{regle.get('min', '')} ; {regle.get('max', '')}]"
+    return {"requis": "valeur manquante", "unique": "doublon", "entier": "entier invalide",
+            "date": "date invalide"}.get(c, c)
+
+
+# ----------------------------
+# Moteur
+# ----------------------------
+class _Contexte:
+    """Sources de référence + textes nettoyés par colonne (calculés une fois par source)."""
+
+    def __init__(self, df, sources):
+        self.df, self.sources, self._textes = df, sources, {}
+
+    def texte(self, col):
+        if col not in self._textes:
+            self._textes[col] = _texte(self.df[col])
+        return self._textes[col]
+
+
+def valider_source(nom, df: pd.DataFrame, regles, sources) -> pd.DataFrame:
+    """Applique les règles d'une source ; une ligne de rapport par (ligne source, règle) en anomalie."""
+    ctx = _Contexte(df, sources)
+    morceaux = []
+    for regle in regles:
+        cols = regle["colonne"] if isinstance(regle["colonne"], list) else [regle["colonne"]]
+        libelle = "+".join(cols)
+        gravite = regle.get("gravite", ERREUR)
+        absentes = [c for c in cols if c not in df.columns]
+        if absentes:
+            if regle["controle"] in ("requis", "unique"):
+                morceaux.append(pd.DataFrame([{
+                    "source": nom, "fichier": None, "ligne": None, "colonne": libelle,
+                    "controle": regle["controle"], "gravite": gravite, "valeur": None,
+                    "message": f"colonne absente : {absentes}",
+                }]))
+            continue
+
+        arg = cols if regle["controle"] == "unique" else cols[0]
+        masque = CONTROLES[regle["controle"]](df, arg, regle, ctx).fillna(False).astype(bool)
+        if not masque.any():
+            continue
+        ko = df.loc[masque]
+        valeurs = ko[cols].astype(str).agg(" | ".join, axis=1) if len(cols) > 1 else ko[cols[0]]
+        morceaux.append(pd.DataFrame({
+            "source": nom, "fichier": ko.get("_fichier"), "ligne": ko.get("_ligne"),
+            "colonne": libelle, "controle": regle["controle"], "gravite": gravite,
+            "valeur": valeurs.astype(object), "message": _message(regle),
+        }))
+    return pd.concat(morceaux, ignore_index=True) if morceaux else pd.DataFrame(
+        columns=["source", "fichier", "ligne", "colonne", "controle", "gravite", "valeur", "message"])
+
+
+def valider(sources: dict, regles=None) -> pd.DataFrame:
+    regles = regles or REGLES
+    rapports = [valider_source(nom, sources[nom], regles[nom], sources)
+                for nom in regles if nom in sources and not sources[nom].empty]
+    return pd.concat(rapports, ignore_index=True) if rapports else valider_source("", pd.DataFrame(), [], {})
+
+
+def _resumer(rapport: pd.DataFrame):
+    if rapport.empty:
+        print("✅ Aucune anomalie dans les fichiers sources.")
+        return
+    resume = rapport.groupby(["source", "colonne", "controle", "gravite"], sort=False, dropna=False) \
+        .agg(lignes=("message", "size"), exemples=("valeur", lambda v: list(pd.unique(v.astype(str)))[:3]))
+    print(resume.head(RESUME_MAX).to_string())
+    n_err = int((rapport["gravite"] == ERREUR).sum())
+    print(f"{'❌' if n_err else '⚠️'} {n_err} erreur(s), {len(rapport) - n_err} avertissement(s).")
+
+
+def valider_sources(rapport_path=None, sources=None) -> pd.DataFrame:
+    """
+    Contrôle les trois sources (lues depuis config si sources n'est pas fourni) et
+    retourne le rapport ; rapport_path : classeur Excel (défaut : config.VALIDATION_REPORT_PATH).
+    Un classeur illisible donne une ligne ERREUR (contrôle "lecture") pour ce fichier.
+    """
+    print("\n--- Contrôle des fichiers sources ---")
+    # Un classeur illisible est une anomalie bloquante, pas un rapport vide
+    echecs = []
+    if sources is None:
+        try:
+            sources = charger_sources(echecs)
+        except Exception as e:
+            print(f"❌ ERREUR lecture des sources : {e}")
+            sources = {}
+            echecs.append(_echec_lecture("", None, e))
+
+    rapport = valider(sources)
+    if echecs:
+        rapport = pd.concat([pd.DataFrame(echecs, columns=rapport.columns), rapport], ignore_index=True)
+    _resumer(rapport)
+
+    rapport_path = rapport_path or config.VALIDATION_REPORT_PATH
+    if rapport_path and not rapport.empty:
+        try:
+            if len(rapport) > RAPPORT_EXCEL_MAX or rapport_path.lower().endswith(".csv"):
+                rapport_path = os.path.splitext(rapport_path)[0] + ".csv"
+                rapport.to_csv(rapport_path, index=False, sep=";", encoding="utf-8-sig")
+            else:
+                rapport.to_excel(rapport_path, index=False)
+            print(f"   📄 Rapport écrit : {rapport_path}")
+        except Exception as e:
+            print(f"⚠️ Rapport non écrit ({rapport_path}) : {e}")
+    return rapport
+
+
+def a_des_erreurs(rapport: pd.DataFrame) -> bool:
+    return bool((rapport["gravite"] == ERREUR).any())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Contrôle des fichiers sources")
+    parser.add_argument("--rapport", default=None, help="Classeur Excel des anomalies")
+    args = parser.parse_args()
+
+    r = valider_sources(args.rapport)
+    raise SystemExit(1 if a_des_erreurs(r) else 0)